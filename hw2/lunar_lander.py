@@ -165,6 +165,11 @@ class LunarLander(gym.Env, EzPickle):
     `wind_power` dictates the maximum magnitude of linear wind applied to the craft. The recommended value for `wind_power` is between 0.0 and 20.0.
     `turbulence_power` dictates the maximum magnitude of rotational wind applied to the craft. The recommended value for `turbulence_power` is between 0.0 and 2.0.
 
+    If `headless=True` is passed, the environment cannot be rendered, and skips the work that is
+    only needed for rendering: in particular, the engine flame particles are not created. They are
+    Box2D bodies of their own that never collide with the lander (and that are only cleaned up by
+    rendering), so the dynamics are the same.
+
     ### Version History
     - v2: Count energy spent and in v0.24, added turbulance with wind power and turbulence_power parameters
     - v1: Legs contact with ground added in state vector; contact with ground
@@ -191,6 +196,7 @@ class LunarLander(gym.Env, EzPickle):
         enable_wind: bool = False,
         wind_power: float = 15.0,
         turbulence_power: float = 1.5,
+        headless: bool = False,
     ):
         EzPickle.__init__(
             self,
@@ -200,6 +206,7 @@ class LunarLander(gym.Env, EzPickle):
             enable_wind,
             wind_power,
             turbulence_power,
+            headless,
         )
 
         assert (
@@ -286,6 +293,10 @@ class LunarLander(gym.Env, EzPickle):
             # Nop, fire left engine, main engine, right engine
             self.action_space = spaces.Discrete(4)
 
+        assert not (
+            headless and render_mode is not None
+        ), "a headless LunarLander cannot be rendered"
+        self.headless = headless
         self.render_mode = render_mode
         self.renderer = Renderer(self.render_mode, self._render)
 
@@ -343,7 +354,8 @@ class LunarLander(gym.Env, EzPickle):
             p1 = (chunk_x[i], smooth_y[i])
             p2 = (chunk_x[i + 1], smooth_y[i + 1])
             self.moon.CreateEdgeFixture(vertices=[p1, p2], density=0, friction=0.1)
-            self.sky_polys.append([p1, p2, (p2[0], H), (p1[0], H)])
+            if not self.headless:
+                self.sky_polys.append([p1, p2, (p2[0], H), (p1[0], H)])
 
         self.moon.color1 = (0.0, 0.0, 0.0)
         self.moon.color2 = (0.0, 0.0, 0.0)
@@ -412,7 +424,8 @@ class LunarLander(gym.Env, EzPickle):
 
         self.drawlist = [self.lander] + self.legs
 
-        self.renderer.reset()
+        if not self.headless:
+            self.renderer.reset()
         if not return_info:
             return self.step(np.array([0, 0]) if self.continuous else 0)[0]
         else:
@@ -501,17 +514,18 @@ class LunarLander(gym.Env, EzPickle):
             ox = tip[0] * (4 / SCALE + 2 * dispersion[0]) + side[0] * dispersion[1]
             oy = -tip[1] * (4 / SCALE + 2 * dispersion[0]) - side[1] * dispersion[1]
             impulse_pos = (self.lander.position[0] + ox, self.lander.position[1] + oy)
-            p = self._create_particle(
-                3.5,  # 3.5 is here to make particle speed adequate
-                impulse_pos[0],
-                impulse_pos[1],
-                m_power,
-            )  # particles are just a decoration
-            p.ApplyLinearImpulse(
-                (float(ox * MAIN_ENGINE_POWER * m_power), float(oy * MAIN_ENGINE_POWER * m_power)),
-                impulse_pos,
-                True,
-            )
+            if not self.headless:
+                p = self._create_particle(
+                    3.5,  # 3.5 is here to make particle speed adequate
+                    impulse_pos[0],
+                    impulse_pos[1],
+                    m_power,
+                )  # particles are just a decoration
+                p.ApplyLinearImpulse(
+                    (float(ox * MAIN_ENGINE_POWER * m_power), float(oy * MAIN_ENGINE_POWER * m_power)),
+                    impulse_pos,
+                    True,
+                )
             self.lander.ApplyLinearImpulse(
                 (float(-ox * MAIN_ENGINE_POWER * m_power), float(-oy * MAIN_ENGINE_POWER * m_power)),
                 impulse_pos,
@@ -540,12 +554,13 @@ class LunarLander(gym.Env, EzPickle):
                 float(self.lander.position[0] + ox - tip[0] * 17 / SCALE),
                 float(self.lander.position[1] + oy + tip[1] * SIDE_ENGINE_HEIGHT / SCALE),
             )
-            p = self._create_particle(0.7, impulse_pos[0], impulse_pos[1], s_power)
-            p.ApplyLinearImpulse(
-                (float(ox * SIDE_ENGINE_POWER * s_power), float(oy * SIDE_ENGINE_POWER * s_power)),
-                impulse_pos,
-                True,
-            )
+            if not self.headless:
+                p = self._create_particle(0.7, impulse_pos[0], impulse_pos[1], s_power)
+                p.ApplyLinearImpulse(
+                    (float(ox * SIDE_ENGINE_POWER * s_power), float(oy * SIDE_ENGINE_POWER * s_power)),
+                    impulse_pos,
+                    True,
+                )
             self.lander.ApplyLinearImpulse(
                 (float(-ox * SIDE_ENGINE_POWER * s_power), float(-oy * SIDE_ENGINE_POWER * s_power)),
                 impulse_pos,
@@ -593,7 +608,8 @@ class LunarLander(gym.Env, EzPickle):
         if not self.lander.awake:
             terminated = True
             reward = +100
-        self.renderer.render_step()
+        if not self.headless:
+            self.renderer.render_step()
         return np.array(state, dtype=np.float32), reward, terminated, False, {}
 
     def render(self, mode="human"):
@@ -0,0 +1,102 @@
+"""
+Compare the continuous action distribution used by MLPPolicy (DiagonalGaussian)
+against the dense MultivariateNormal it replaced.
+
+Example:
+    python rob831/scripts/benchmark_action_distribution.py --batch_sizes 1000 10000 --ac_dims 8 17
+"""
+import argparse
+import time
+
+import torch
+from torch import distributions
+
+from rob831.infrastructure import pytorch_util as ptu
+from rob831.infrastructure.distributions import DiagonalGaussian
+
+
+def make_multivariate_normal(mean, logstd):
+    scale_tril = torch.diag(torch.exp(logstd))
+    batch_scale_tril = scale_tril.repeat(mean.shape[0], 1, 1)
+    return distributions.MultivariateNormal(mean, scale_tril=batch_scale_tril)
+
+
+def make_diagonal_gaussian(mean, logstd):
+    return DiagonalGaussian(mean, logstd)
+
+
+def time_op(fn, n_repeats):
+    fn()  # warmup
+    if ptu.device.type == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        fn()
+    if ptu.device.type == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / n_repeats * 1e3
+
+
+def benchmark(make_dist, batch_size, ac_dim, n_repeats):
+    mean = torch.randn(batch_size, ac_dim, device=ptu.device, requires_grad=True)
+    logstd = torch.zeros(ac_dim, device=ptu.device, requires_grad=True)
+    actions = torch.randn(batch_size, ac_dim, device=ptu.device)
+
+    def log_prob_backward():
+        loss = -make_dist(mean, logstd).log_prob(actions).sum()
+        loss.backward()
+
+    def sample():
+        make_dist(mean, logstd).sample()
+
+    def rsample():
+        make_dist(mean, logstd).rsample()
+
+    def entropy():
+        make_dist(mean, logstd).entropy()
+
+    return {
+        'log_prob+backward': time_op(log_prob_backward, n_repeats),
+        'sample': time_op(sample, n_repeats),
+        'rsample': time_op(rsample, n_repeats),
+        'entropy': time_op(entropy, n_repeats),
+    }
+
+
+def check_equivalence(batch_size, ac_dim):
+    mean = torch.randn(batch_size, ac_dim, device=ptu.device)
+    logstd = torch.randn(ac_dim, device=ptu.device) * 0.5
+    actions = torch.randn(batch_size, ac_dim, device=ptu.device)
+    mvn = make_multivariate_normal(mean, logstd)
+    diag = make_diagonal_gaussian(mean, logstd)
+    assert torch.allclose(mvn.log_prob(actions), diag.log_prob(actions), atol=1e-4)
+    assert torch.allclose(mvn.entropy(), diag.entropy(), atol=1e-4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 1000, 5000, 50000])
+    # HalfCheetah 6, Ant 8, Humanoid 17
+    parser.add_argument('--ac_dims', type=int, nargs='+', default=[6, 8, 17])
+    parser.add_argument('--n_repeats', type=int, default=50)
+    parser.add_argument('--no_gpu', '-ngpu', action='store_true')
+    parser.add_argument('--which_gpu', '-gpu_id', default=0)
+    args = parser.parse_args()
+
+    ptu.init_gpu(use_gpu=not args.no_gpu, gpu_id=args.which_gpu)
+
+    print('{:>8} {:>6} {:>18} {:>12} {:>12} {:>8}'.format(
+        'batch', 'ac_dim', 'op', 'mvn (ms)', 'diag (ms)', 'speedup'))
+    for ac_dim in args.ac_dims:
+        for batch_size in args.batch_sizes:
+            check_equivalence(batch_size, ac_dim)
+            mvn_times = benchmark(make_multivariate_normal, batch_size, ac_dim, args.n_repeats)
+            diag_times = benchmark(make_diagonal_gaussian, batch_size, ac_dim, args.n_repeats)
+            for op in mvn_times:
+                print('{:>8} {:>6} {:>18} {:>12.4f} {:>12.4f} {:>7.1f}x'.format(
+                    batch_size, ac_dim, op, mvn_times[op], diag_times[op],
+                    mvn_times[op] / diag_times[op]))
+
+
+if __name__ == '__main__':
+    main()
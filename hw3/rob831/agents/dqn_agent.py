@@ -26,9 +26,21 @@ class DQNAgent(object):
         self.critic = DQNCritic(agent_params, self.optimizer_spec)
         self.actor = ArgMaxPolicy(self.critic)
 
+        # copies of the env that are stepped together with it (see step_envs)
+        self.envs = [self.env] + agent_params.get('extra_envs', [])
+        self.num_envs = len(self.envs)
+        if self.num_envs > 1:
+            self.last_obs = np.stack([self.last_obs] + [env.reset() for env in self.envs[1:]])
+        # with several envs, the number of updates per env step once learning
+        # has started; by default the one update every learning_freq steps of
+        # a single env
+        self.update_to_data_ratio = (agent_params.get('update_to_data_ratio')
+                                     or 1. / self.learning_freq)
+
         lander = agent_params['env_name'].startswith('LunarLander')
         self.replay_buffer = MemoryOptimizedReplayBuffer(
-            agent_params['replay_buffer_size'], agent_params['frame_history_len'], lander=lander)
+            agent_params['replay_buffer_size'], agent_params['frame_history_len'], lander=lander,
+            num_envs=self.num_envs)
         self.t = 0
         self.num_param_updates = 0
 
@@ -41,7 +53,11 @@ class DQNAgent(object):
             At the end of this block of code, the simulator should have been
             advanced one step, and the replay buffer should contain one more transition.
             Note that self.last_obs must always point to the new latest observation.
-        """        
+
+            With several envs, every env is advanced one step (see step_envs).
+        """
+        if self.num_envs > 1:
+            return self.step_envs()
 
         # TODO store the latest observation ("frame") into the replay buffer
         # HINT: the replay buffer used here is `MemoryOptimizedReplayBuffer`
@@ -82,6 +98,43 @@ class DQNAgent(object):
         if done:
             self.last_obs = self.env.reset()
 
+    def step_envs(self):
+        """
+            Step every env once and store one transition per env. The actions
+            of all the envs that act greedily are chosen with a single batched
+            forward pass of the critic.
+            self.t counts env steps, so it advances by num_envs here rather
+            than in train.
+        """
+        replay_buffer_idxes = self.replay_buffer.store_batch(self.last_obs)
+
+        eps = self.exploration.value(self.t)
+        actions = np.array([env.action_space.sample() for env in self.envs])
+        if self.t >= self.learning_starts:
+            greedy = np.flatnonzero(np.random.random(self.num_envs) >= eps)
+            if len(greedy) > 0:
+                recent_obs = self.replay_buffer.encode_recent_observations(greedy)
+                actions[greedy] = self.actor.get_actions(recent_obs)
+
+        rewards = np.empty(self.num_envs, dtype=np.float32)
+        dones = np.empty(self.num_envs, dtype=bool)
+        for i, env in enumerate(self.envs):
+            obs, rewards[i], dones[i], info = env.step(actions[i])
+            self.last_obs[i] = env.reset() if dones[i] else obs
+
+        self.replay_buffer.store_effect(replay_buffer_idxes, actions, rewards, dones)
+        self.t += self.num_envs
+
+    def num_updates_due(self):
+        """
+            With several envs, the number of updates to make now to keep
+            update_to_data_ratio updates per env step since learning_starts
+        """
+        if self.t <= self.learning_starts or not self.replay_buffer.can_sample(self.batch_size):
+            return 0
+        num_updates = int((self.t - self.learning_starts) * self.update_to_data_ratio)
+        return max(num_updates - self.num_param_updates, 0)
+
     def sample(self, batch_size):
         if self.replay_buffer.can_sample(self.batch_size):
             return self.replay_buffer.sample(batch_size)
@@ -90,10 +143,14 @@ class DQNAgent(object):
 
     def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
         log = {}
-        if (self.t > self.learning_starts
+        if self.num_envs > 1:
+            perform_update = self.num_updates_due() > 0
+        else:
+            perform_update = (self.t > self.learning_starts
                 and self.t % self.learning_freq == 0
                 and self.replay_buffer.can_sample(self.batch_size)
-        ):
+            )
+        if perform_update:
 
             # TODO fill in the call to the update function using the appropriate tensors
             log = self.critic.update(
@@ -107,5 +164,6 @@ class DQNAgent(object):
 
             self.num_param_updates += 1
 
-        self.t += 1
+        if self.num_envs == 1:
+            self.t += 1
         return log
@@ -0,0 +1,71 @@
+import math
+
+import torch
+from torch import distributions
+from torch.distributions import constraints
+
+
+class DiagonalGaussian(distributions.Distribution):
+    """
+        Multivariate normal with a diagonal covariance, parameterized by a
+        batch of means and a (shared or batched) log standard deviation.
+
+        Equivalent to
+            MultivariateNormal(loc, scale_tril=torch.diag(torch.exp(log_std)))
+        but log_prob, entropy and sampling are closed-form elementwise ops,
+        so no (batch_size, ac_dim, ac_dim) scale matrix is ever built and no
+        triangular solve is run.
+
+        arguments:
+            loc: (batch_size, ac_dim) mean of each action dimension
+            log_std: (ac_dim,) or (batch_size, ac_dim) log standard deviation,
+                broadcast against loc
+    """
+    arg_constraints = {'loc': constraints.real_vector}
+    support = constraints.real_vector
+    has_rsample = True
+
+    _half_log_2pi = 0.5 * math.log(2 * math.pi)
+
+    def __init__(self, loc, log_std):
+        self.loc = loc
+        self.log_std = log_std
+        super().__init__(
+            batch_shape=loc.shape[:-1],
+            event_shape=loc.shape[-1:],
+            validate_args=False,
+        )
+
+    @property
+    def mean(self):
+        return self.loc
+
+    @property
+    def mode(self):
+        return self.loc
+
+    @property
+    def stddev(self):
+        return torch.exp(self.log_std).expand_as(self.loc)
+
+    @property
+    def variance(self):
+        return torch.exp(2 * self.log_std).expand_as(self.loc)
+
+    def rsample(self, sample_shape=torch.Size()):
+        shape = self._extended_shape(sample_shape)
+        eps = torch.randn(shape, dtype=self.loc.dtype, device=self.loc.device)
+        return self.loc + eps * torch.exp(self.log_std)
+
+    def sample(self, sample_shape=torch.Size()):
+        with torch.no_grad():
+            return self.rsample(sample_shape)
+
+    def log_prob(self, value):
+        z = (value - self.loc) * torch.exp(-self.log_std)
+        log_prob_per_dim = -0.5 * z.pow(2) - self.log_std - self._half_log_2pi
+        return log_prob_per_dim.sum(-1)
+
+    def entropy(self):
+        entropy_per_dim = 0.5 + self._half_log_2pi + self.log_std
+        return entropy_per_dim.sum(-1).expand(self.batch_shape)
@@ -15,6 +15,7 @@ from rob831.infrastructure.logger import Logger
 
 from rob831.agents.dqn_agent import DQNAgent
 from rob831.infrastructure.dqn_utils import (
+        get_env_make_kwargs,
         get_wrapper_by_name,
         register_custom_envs,
 )
@@ -52,7 +53,8 @@ class RL_Trainer(object):
 
         # Make the gym environment
         register_custom_envs()
-        self.env = gym.make(self.params['env_name'])
+        env_kwargs = get_env_make_kwargs(self.params['env_name'], render=self.params['video_log_freq'] > 0)
+        self.env = gym.make(self.params['env_name'], **env_kwargs)
         if 'env_wrappers' in self.params:
             # These operations are currently only for Atari envs
             self.env = Monitor(
@@ -67,6 +69,13 @@ class RL_Trainer(object):
 
         self.env.seed(seed)
 
+        # extra copies of the env, for DQN agents that step several envs at
+        # once; only self.env is monitored
+        self.params['agent_params']['extra_envs'] = [
+            self.make_extra_env(seed + i)
+            for i in range(1, self.params['agent_params'].get('num_envs', 1))
+        ]
+
         # import plotting (locally if 'obstacles' env)
         if not(self.params['env_name']=='obstacles-rob831-v0'):
             import matplotlib
@@ -109,6 +118,13 @@ class RL_Trainer(object):
         agent_class = self.params['agent_class']
         self.agent = agent_class(self.env, self.params['agent_params'])
 
+    def make_extra_env(self, seed):
+        env = gym.make(self.params['env_name'], **get_env_make_kwargs(self.params['env_name']))
+        if 'env_wrappers' in self.params:
+            env = self.params['env_wrappers'](env)
+        env.seed(seed)
+        return env
+
     def run_training_loop(self, n_iter, collect_policy, eval_policy,
                           initial_expertdata=None, relabel_with_expert=False,
                           start_relabel_with_expert=1, expert_policy=None):
@@ -150,7 +166,7 @@ class RL_Trainer(object):
             if isinstance(self.agent, DQNAgent):
                 # only perform an env step and add to replay buffer for DQN
                 self.agent.step_env()
-                envsteps_this_batch = 1
+                envsteps_this_batch = self.agent.num_envs
                 train_video_paths = None
                 paths = None
             else:
@@ -230,7 +246,11 @@ class RL_Trainer(object):
 
     def train_agent(self):
         all_logs = []
-        for train_step in range(self.params['num_agent_train_steps_per_iter']):
+        num_train_steps = self.params['num_agent_train_steps_per_iter']
+        if isinstance(self.agent, DQNAgent) and self.agent.num_envs > 1:
+            # as many updates as the env steps of this iteration call for
+            num_train_steps = max(self.agent.num_updates_due(), 1)
+        for train_step in range(num_train_steps):
             obs_batch, act_batch, rew_batch, nobs_batch, term_batch = self.agent.sample(self.params['train_batch_size'])
             train_log = self.agent.train(obs_batch, act_batch, rew_batch, nobs_batch, term_batch)
             all_logs.append(train_log)
@@ -9,6 +9,7 @@ import torch
 from torch import distributions
 
 from rob831.infrastructure import pytorch_util as ptu
+from rob831.infrastructure.distributions import DiagonalGaussian
 from rob831.policies.base_policy import BasePolicy
 
 
@@ -110,13 +111,7 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
             return action_distribution
         else:
             batch_mean = self.mean_net(observation)
-            scale_tril = torch.diag(torch.exp(self.logstd))
-            batch_dim = batch_mean.shape[0]
-            batch_scale_tril = scale_tril.repeat(batch_dim, 1, 1)
-            action_distribution = distributions.MultivariateNormal(
-                batch_mean,
-                scale_tril=batch_scale_tril,
-            )
+            action_distribution = DiagonalGaussian(batch_mean, self.logstd)
             return action_distribution
 
 #####################################################
@@ -18,3 +18,9 @@ class ArgMaxPolicy(object):
         action = np.argmax(qa_values, axis=1)
 
         return action.squeeze()
+
+    def get_actions(self, obs):
+        """Batched version of `get_action`: one action for each observation in
+        `obs`, from a single call to the critic"""
+        qa_values = self.critic.qa_values(obs)
+        return np.argmax(qa_values, axis=1)
@@ -30,8 +30,9 @@ class Q_Trainer(object):
         self.rl_trainer = RL_Trainer(self.params)
 
     def run_training_loop(self):
+        # each iteration steps every env once
         self.rl_trainer.run_training_loop(
-            self.agent_params['num_timesteps'],
+            self.agent_params['num_timesteps'] // self.agent_params['num_envs'],
             collect_policy = self.rl_trainer.agent.actor,
             eval_policy = self.rl_trainer.agent.actor,
         )
@@ -55,6 +56,10 @@ def main():
     parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=1)
     parser.add_argument('--num_critic_updates_per_agent_update', type=int, default=1)
     parser.add_argument('--double_q', action='store_true')
+    parser.add_argument('--num_envs', type=int, default=1,
+                        help='number of envs stepped together, with one batched action selection')
+    parser.add_argument('--update_to_data_ratio', type=float, default=None,
+                        help='updates per env step with several envs (default: 1 / learning_freq)')
 
     parser.add_argument('--seed', type=int, default=1)
     parser.add_argument('--no_gpu', '-ngpu', action='store_true')
@@ -1,7 +1,8 @@
 from .base_agent import BaseAgent
-from rob831.hw4_part1.models.ff_model import FFModel
+from rob831.hw4_part1.models.ensemble_ff_model import EnsembleFFModel
 from rob831.hw4_part1.policies.MPC_policy import MPCPolicy
 from rob831.hw4_part1.infrastructure.replay_buffer import ReplayBuffer
+from rob831.hw4_part1.infrastructure.running_moments import RunningMoments
 from rob831.hw4_part1.infrastructure.utils import *
 
 
@@ -13,16 +14,16 @@ class MBAgent(BaseAgent):
         self.agent_params = agent_params
         self.ensemble_size = self.agent_params['ensemble_size']
 
-        self.dyn_models = []
-        for i in range(self.ensemble_size):
-            model = FFModel(
-                self.agent_params['ac_dim'],
-                self.agent_params['ob_dim'],
-                self.agent_params['n_layers'],
-                self.agent_params['size'],
-                self.agent_params['learning_rate'],
-            )
-            self.dyn_models.append(model)
+        # all members of the ensemble are stored in a single batched model,
+        # which can still be indexed like a list of models (self.dyn_models[i])
+        self.dyn_models = EnsembleFFModel(
+            self.agent_params['ac_dim'],
+            self.agent_params['ob_dim'],
+            self.agent_params['n_layers'],
+            self.agent_params['size'],
+            self.ensemble_size,
+            self.agent_params['learning_rate'],
+        )
 
         self.actor = MPCPolicy(
             self.env,
@@ -34,56 +35,79 @@ class MBAgent(BaseAgent):
             cem_iterations=self.agent_params['cem_iterations'],
             cem_num_elites=self.agent_params['cem_num_elites'],
             cem_alpha=self.agent_params['cem_alpha'],
+            cem_warm_start=self.agent_params['cem_warm_start'],
+            mppi_temperature=self.agent_params['mppi_temperature'],
+            mppi_noise_std=self.agent_params['mppi_noise_std'],
+            mppi_noise_beta=self.agent_params['mppi_noise_beta'],
         )
 
         self.replay_buffer = ReplayBuffer()
 
+        # statistics of the data in the replay buffer, updated incrementally
+        self.obs_moments = RunningMoments(self.agent_params['ob_dim'])
+        self.acs_moments = RunningMoments(self.agent_params['ac_dim'])
+        self.delta_moments = RunningMoments(self.agent_params['ob_dim'])
+        self.data_statistics = None
+
     def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
 
         # training a MB agent refers to updating the predictive model using observed state transitions
         # NOTE: each model in the ensemble is trained on a different random batch of size batch_size
-        losses = []
         num_data = ob_no.shape[0]
         num_data_per_ens = int(num_data / self.ensemble_size)
+        num_data_used = num_data_per_ens * self.ensemble_size
 
-        for i in range(self.ensemble_size):
-
-            # select which datapoints to use for this model of the ensemble
-            # you might find the num_data_per_env variable defined above useful
-
-            observations = ob_no[i * num_data_per_ens:(i + 1) * num_data_per_ens]  # TODO(Q1) - done
-            actions = ac_na[i * num_data_per_ens:(i + 1) * num_data_per_ens]  # TODO(Q1) - done
-            next_observations = next_ob_no[i * num_data_per_ens:(i + 1) * num_data_per_ens]  # TODO(Q1) - done
+        # split the batch into one chunk per model of the ensemble,
+        # so that member i is trained on ob_no[i * num_data_per_ens:(i + 1) * num_data_per_ens]
+        observations = ob_no[:num_data_used].reshape(self.ensemble_size, num_data_per_ens, -1)
+        actions = ac_na[:num_data_used].reshape(self.ensemble_size, num_data_per_ens, -1)
+        next_observations = next_ob_no[:num_data_used].reshape(self.ensemble_size, num_data_per_ens, -1)
 
-            # use datapoints to update one of the dyn_models
-            model = self.dyn_models[i]  # TODO(Q1) - done
-            log = model.update(observations, actions, next_observations,
-                                self.data_statistics)
-            loss = log['Training Loss']
-            losses.append(loss)
-
-        avg_loss = np.mean(losses)
+        # update every model of the ensemble in a single batched step, with
+        # the statistics it has cached on the device
+        log = self.dyn_models.update(observations, actions, next_observations)
         return {
-            'Training Loss': avg_loss,
+            'Training Loss': log['Training Loss'],
         }
 
     def add_to_replay_buffer(self, paths, add_sl_noise=False):
 
+        old_obs = self.replay_buffer.obs
+        old_acs = self.replay_buffer.acs
+        old_next_obs = self.replay_buffer.next_obs
+        num_old = 0 if old_obs is None else old_obs.shape[0]
+
         # add data to replay buffer
         self.replay_buffer.add_rollouts(paths, noised=add_sl_noise)
 
-        # get updated mean/std of the data in our replay buffer
+        # update the mean/std of the data in our replay buffer with the new
+        # (possibly noised) transitions only, and with the old ones the buffer
+        # evicted to make room for them
+        num_new = min(sum(get_pathlength(path) for path in paths), self.replay_buffer.max_size)
+        num_evicted = num_old + num_new - self.replay_buffer.obs.shape[0]
+        if num_evicted > 0:
+            self.obs_moments.remove(old_obs[:num_evicted])
+            self.acs_moments.remove(old_acs[:num_evicted])
+            self.delta_moments.remove(old_next_obs[:num_evicted] - old_obs[:num_evicted])
+        first_new = self.replay_buffer.obs.shape[0] - num_new
+        new_obs = self.replay_buffer.obs[first_new:]
+        self.obs_moments.update(new_obs)
+        self.acs_moments.update(self.replay_buffer.acs[first_new:])
+        self.delta_moments.update(self.replay_buffer.next_obs[first_new:] - new_obs)
+
         self.data_statistics = {
-            'obs_mean': np.mean(self.replay_buffer.obs, axis=0),
-            'obs_std': np.std(self.replay_buffer.obs, axis=0),
-            'acs_mean': np.mean(self.replay_buffer.acs, axis=0),
-            'acs_std': np.std(self.replay_buffer.acs, axis=0),
-            'delta_mean': np.mean(
-                self.replay_buffer.next_obs - self.replay_buffer.obs, axis=0),
-            'delta_std': np.std(
-                self.replay_buffer.next_obs - self.replay_buffer.obs, axis=0),
+            'obs_mean': self.obs_moments.mean.astype(np.float32),
+            'obs_std': self.obs_moments.std.astype(np.float32),
+            'acs_mean': self.acs_moments.mean.astype(np.float32),
+            'acs_std': self.acs_moments.std.astype(np.float32),
+            'delta_mean': self.delta_moments.mean.astype(np.float32),
+            'delta_std': self.delta_moments.std.astype(np.float32),
         }
 
+        # cache the statistics on the device once; the ensemble uses them for
+        # training and planning until the next call
+        self.dyn_models.update_statistics(**self.data_statistics)
+
         # update the actor's data_statistics too, so actor.get_action can be calculated correctly
         self.actor.data_statistics = self.data_statistics
 
@@ -1,8 +1,11 @@
 from .base_agent import BaseAgent
 from .sac_agent import SACAgent
 from .mb_agent import MBAgent
-from rob831.hw4_part1.infrastructure.replay_buffer import ReplayBuffer
+from rob831.hw4_part1.infrastructure.replay_buffer import ReplayBuffer, ModelReplayBuffer
 from rob831.hw4_part1.infrastructure.utils import *
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+from rob831.hw4_part1.envs.reward_fns import get_reward_fn
+import torch
 
 class MBPOAgent(BaseAgent):
     def __init__(self, env, agent_params):
@@ -12,6 +15,19 @@ class MBPOAgent(BaseAgent):
         self.env = env
 
         self.actor = self.sac_agent.actor
+        # batched reward function on tensors, for collect_model_rollouts
+        self.reward_fn = get_reward_fn(self.env, backend='torch')
+
+        # model-generated data is kept apart from the real data if a model
+        # buffer size is given, and SAC batches mix the two with a fixed ratio
+        if agent_params['mbpo_model_buffer_size'] > 0:
+            self.model_replay_buffer = ModelReplayBuffer(
+                max_size=agent_params['mbpo_model_buffer_size'],
+                max_age=agent_params['mbpo_model_max_age'],
+            )
+        else:
+            self.model_replay_buffer = None
+        self.real_ratio = agent_params['mbpo_real_ratio']
 
     def train(self, *args):
         return self.mb_agent.train(*args)
@@ -48,7 +64,78 @@ class MBPOAgent(BaseAgent):
             ob = next_ob
         return [Path(obs, image_obs, acs, rewards, next_obs, terminals)]
 
+    def collect_model_rollouts(self, num_rollouts, rollout_length=1):
+        """
+        Batched version of collect_model_trajectory: branches num_rollouts
+        rollouts from start states sampled from self.mb_agent.replay_buffer and
+        steps all of them at once through the SAC actor, the dynamics ensemble
+        and the reward function, keeping everything on the device. Each
+        transition is predicted by a randomly chosen member of the ensemble,
+        and rollouts stop after a transition that the reward function flags
+        as done. The transitions are written directly to the model replay
+        buffer, or to the SAC replay buffer if there is none.
+
+        :return: the number of transitions added
+        """
+        ensemble = self.mb_agent.dyn_models
+        ob, _, _, _, _ = self.mb_agent.replay_buffer.sample_random_data(num_rollouts)
+        ob = ptu.from_numpy(ob)
+        stats = ensemble.get_statistics()
+
+        obs, acs, rewards, next_obs, terminals = [], [], [], [], []
+        with torch.no_grad():
+            for _ in range(rollout_length):
+                n = ob.shape[0]
+                ac = self.actor(ob).sample().clamp(*self.sac_agent.action_range)
+
+                next_ob, _ = ensemble(ob, ac, **stats)
+                members = torch.randint(ensemble.ensemble_size, (n,), device=ob.device)
+                next_ob = next_ob[members, torch.arange(n, device=ob.device)]
+
+                # the env scores a transition from the state it leads to
+                if self.reward_fn is not None:
+                    rew, done = self.reward_fn(next_ob, ac)
+                else:
+                    rew, done = self.env.get_reward(ptu.to_numpy(next_ob), ptu.to_numpy(ac))
+                    rew, done = ptu.from_numpy(rew), ptu.from_numpy(done)
+
+                obs.append(ob)
+                acs.append(ac)
+                rewards.append(rew)
+                next_obs.append(next_ob)
+                terminals.append(done)
+
+                # only keep stepping the rollouts that have not terminated
+                alive = done == 0
+                if not alive.any():
+                    break
+                ob = next_ob[alive]
+
+        if self.model_replay_buffer is not None:
+            replay_buffer = self.model_replay_buffer
+        else:
+            replay_buffer = self.sac_agent.replay_buffer
+        replay_buffer.add_transitions(
+            ptu.to_numpy(torch.cat(obs)),
+            ptu.to_numpy(torch.cat(acs)),
+            ptu.to_numpy(torch.cat(rewards)),
+            ptu.to_numpy(torch.cat(next_obs)),
+            ptu.to_numpy(torch.cat(terminals)),
+        )
+        return sum(ob.shape[0] for ob in obs)
+
+    def advance_model_version(self):
+        # call after every retraining of the dynamics model, to expire the
+        # transitions generated by models that are too old
+        if self.model_replay_buffer is not None:
+            self.model_replay_buffer.advance_model_version()
+
     def add_to_replay_buffer(self, paths, from_model=False, **kwargs):
+        if from_model and self.model_replay_buffer is not None:
+            observations, actions, next_observations, terminals, concatenated_rews, _ = convert_listofrollouts(paths)
+            self.model_replay_buffer.add_transitions(
+                observations, actions, concatenated_rews, next_observations, terminals)
+            return
         self.sac_agent.add_to_replay_buffer(paths)
         # only add rollouts from the real environment to the model training buffer
         if not from_model:
@@ -57,5 +144,17 @@ class MBPOAgent(BaseAgent):
     def sample(self, *args, **kwargs):
         return self.mb_agent.sample(*args, **kwargs)
 
-    def sample_sac(self, *args, **kwargs):
-        return self.sac_agent.sample(*args, **kwargs)
\ No newline at end of file
+    def sample_sac(self, batch_size):
+        if self.model_replay_buffer is None:
+            return self.sac_agent.sample(batch_size)
+
+        # real_ratio of the batch comes from the real data, the rest from the
+        # model data, each sampled in O(batch_size) from its own buffer
+        num_model = 0
+        if len(self.model_replay_buffer) > 0:
+            num_model = int(round(batch_size * (1 - self.real_ratio)))
+        real_batch = self.sac_agent.replay_buffer.sample_random_data(batch_size - num_model, replace=True)
+        if num_model == 0:
+            return real_batch
+        model_batch = self.model_replay_buffer.sample_random_data(num_model)
+        return tuple(np.concatenate([real, model]) for real, model in zip(real_batch, model_batch))
\ No newline at end of file
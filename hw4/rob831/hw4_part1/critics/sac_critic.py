@@ -31,22 +31,17 @@ class SACCritic(nn.Module, BaseCritic):
 
         # critic parameters
         self.gamma = hparams['gamma']
-        self.Q1 = ptu.build_mlp(
+        # the twin Q networks are stored as stacked weights, so both are
+        # evaluated (and backpropagated through) in a single batched pass
+        self.Q = ptu.build_ensemble_mlp(
+            2,
             self.ob_dim + self.ac_dim,
             1,
             n_layers=self.n_layers,
             size=self.size,
             activation='relu'
         )
-        self.Q2 = ptu.build_mlp(
-            self.ob_dim + self.ac_dim,
-            1,
-            n_layers=self.n_layers,
-            size=self.size,
-            activation='relu'
-        )
-        self.Q1.to(ptu.device)
-        self.Q2.to(ptu.device)
+        self.Q.to(ptu.device)
         self.loss = nn.MSELoss()
 
         self.optimizer = optim.Adam(
@@ -55,9 +50,9 @@ class SACCritic(nn.Module, BaseCritic):
         )
 
     def forward(self, obs: torch.Tensor, action: torch.Tensor):
-        # TODO: get this from previous HW
+        """
+        :return: tensor of shape (2, batch_size) with the values of both Q
+            networks, which can be unpacked as `q1, q2 = critic(obs, action)`
+        """
+        values = self.Q(torch.cat([obs, action], dim=-1)).squeeze(-1)
         return values
-
-
-
-        
\ No newline at end of file
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import mujoco
+import numpy as np
+
+from rob831.hw4_part1.envs import reward_fns
+
+
+class BatchedMujocoEnv(object):
+    """
+        N copies of a MuJoCo env stepped together in a single process.
+
+        The copies share the MjModel of a template env, and each one only has
+        its own MjData, so the model is loaded once however many copies there
+        are. A step writes the actions into every `data.ctrl`, calls `mj_step`
+        on each MjData, and writes the observations into a preallocated
+        (num_envs, obs_dim) array, which is scored in one call to the env's
+        batched reward function (see reward_fns.py).
+
+        `mj_step` releases the GIL, so with num_threads > 1 the copies are
+        split into contiguous chunks that are stepped by a thread pool.
+
+        The env class must define `write_obs(data, out)`, which writes the
+        observation of an MjData into `out` without allocating.
+
+        arguments:
+            env: the template env, e.g. gym.make('cheetah-hw4_part1-v0');
+                it is used to reset the copies, and its own state is
+                overwritten by every reset
+            num_envs: number of copies
+            num_threads: number of threads stepping the copies
+    """
+    def __init__(self, env, num_envs, num_threads=1):
+        self.env = env.unwrapped
+        if not hasattr(self.env, 'write_obs'):
+            raise ValueError('{} does not define write_obs'.format(type(self.env).__name__))
+        self.reward_fn = reward_fns.get_reward_fn(self.env)
+        if self.reward_fn is None:
+            raise ValueError('No reward function is registered for {}'.format(type(self.env).__name__))
+
+        self.num_envs = num_envs
+        self.model = self.env.model
+        self.frame_skip = self.env.frame_skip
+        self.datas = [mujoco.MjData(self.model) for _ in range(num_envs)]
+
+        self.observation_space = self.env.observation_space
+        self.action_space = self.env.action_space
+        self.obs_dim = self.observation_space.shape[0]
+        self.ac_dim = self.action_space.shape[0]
+        self.observations = np.zeros((num_envs, self.obs_dim))
+
+        self.num_threads = min(num_threads, num_envs)
+        if self.num_threads > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            self.chunks = [(chunk[0], chunk[-1] + 1)
+                           for chunk in np.array_split(np.arange(num_envs), self.num_threads)]
+        else:
+            self.executor = None
+
+    def reset(self, env_ids=None):
+        """
+            Reset the copies in `env_ids` (default: all of them) exactly as the
+            template env resets, drawing from the template's random generator
+
+            returns:
+                the (num_envs, obs_dim) observation array
+        """
+        if env_ids is None:
+            env_ids = range(self.num_envs)
+        for i in env_ids:
+            self.observations[i] = self.env.reset()
+            mujoco.mj_copyData(self.datas[i], self.model, self.env.data)
+        return self.observations
+
+    def _step_range(self, actions, start, stop):
+        for i in range(start, stop):
+            data = self.datas[i]
+            data.ctrl[:] = actions[i]
+            mujoco.mj_step(self.model, data, nstep=self.frame_skip)
+            self.env.write_obs(data, self.observations[i])
+
+    def step(self, actions):
+        """
+            arguments:
+                actions: (num_envs, ac_dim) array
+
+            returns:
+                observations: the (num_envs, obs_dim) observation array; it is
+                    the same array at every step, so copy it to keep it
+                rewards, dones: (num_envs,) arrays
+        """
+        if self.executor is None:
+            self._step_range(actions, 0, self.num_envs)
+        else:
+            futures = [self.executor.submit(self._step_range, actions, start, stop)
+                       for start, stop in self.chunks]
+            for future in futures:
+                future.result()
+        rewards, dones = self.reward_fn(self.observations, actions)
+        return self.observations, rewards, dones
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -2,6 +2,7 @@ import numpy as np
 from gym import utils
 from gym.envs.mujoco import mujoco_env
 from gym.spaces import Box
+from rob831.hw4_part1.envs import reward_fns
 
 class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
     metadata = {
@@ -15,17 +16,24 @@ class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         "render_fps": 100,
     }
 
-    def __init__(self, **kwargs):
+    def __init__(self, env_info=False, **kwargs):
+        """
+        :param env_info: if True, `step` returns the observation and reward
+            terms and the score in its info dict; otherwise the info dict is
+            empty, and the reward is computed without building them
+        """
         observation_space = Box(low=-np.inf, high=np.inf, shape=(21,), dtype=np.float64)
-        
+        self.env_info = env_info
 
         mujoco_env.MujocoEnv.__init__(self, 'half_cheetah.xml', 1, observation_space=observation_space, **kwargs)
-        utils.EzPickle.__init__(self, **kwargs)
+        utils.EzPickle.__init__(self, env_info=env_info, **kwargs)
 
         self.skip = self.frame_skip
 
         self.action_dim = self.ac_dim = self.action_space.shape[0]
         self.observation_dim = self.obs_dim = self.observation_space.shape[0]
+        self.torso_id = self.model.body('torso').id
+        self._reward_fn = reward_fns.get_reward_fn(self)
 
     def get_reward(self, observations, actions):
 
@@ -99,10 +107,21 @@ class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         #step
         self.do_simulation(action, self.frame_skip)
 
-        #obs/reward/done/score
+        #obs/reward/done
         ob = self._get_obs()
+        if not self.env_info:
+            rew, done = self._reward_fn(ob, action)
+            # numpy scalars, like the rewards[0], dones[0] of get_reward
+            return ob, rew[()], done[()], {}
+
+        #reward terms/score
         rew, done = self.get_reward(ob, action)
         score = self.get_score(ob)
+        self.obs_dict = {
+            'joints_pos': ob[0:9].copy(),
+            'joints_vel': ob[9:18].copy(),
+            'com_torso': ob[18:21].copy(),
+        }
 
         #return
         env_info = {'obs_dict': self.obs_dict,
@@ -111,16 +130,18 @@ class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         return ob, rew, done, env_info
 
     def _get_obs(self):
-        self.obs_dict = {}
-        self.obs_dict['joints_pos'] = self.data.qpos.flat.copy()
-        self.obs_dict['joints_vel'] = self.data.qvel.flat.copy()
-        self.obs_dict['com_torso'] = self.get_body_com("torso").flat.copy()
-
-        return np.concatenate([
-            self.obs_dict['joints_pos'], #9
-            self.obs_dict['joints_vel'], #9
-            self.obs_dict['com_torso'], #3
-        ])
+        # assembled in place; a new array per call, since callers keep the
+        # observations they are returned (e.g. utils.sample_trajectory)
+        ob = np.empty(self.obs_dim)
+        self.write_obs(self.data, ob)
+        return ob
+
+    def write_obs(self, data, out):
+        """Write the observation of `data`, an MjData of this env's model, into `out`"""
+        out[0:9] = data.qpos #joints_pos
+        out[9:18] = data.qvel #joints_vel
+        out[18:21] = data.xpos[self.torso_id] #com_torso
+        return out
 
     ##############################################
 
@@ -142,8 +163,23 @@ class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
 
         #return
         return self._get_obs()
+
+    # --------------------------------
+    # get and set states
+    # --------------------------------
+
+    def get_env_state(self):
+        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy(),
+                    rng=self.np_random.bit_generator.state)
+
+    def set_env_state(self, state):
+        self.np_random.bit_generator.state = state['rng']
+        return self.do_reset(state['qp'].copy(), state['qv'].copy())
     
     def render(self,):
         ren = super().render()
         self.renderer.render_step()
         return ren
+
+
+reward_fns.register_reward_fn(HalfCheetahEnv, reward_fns.cheetah_reward_np, reward_fns.cheetah_reward_torch)
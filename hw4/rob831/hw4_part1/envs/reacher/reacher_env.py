@@ -4,6 +4,7 @@ from gym.envs.mujoco import mujoco_env
 import os
 from gym.spaces import Box
 import mujoco
+from rob831.hw4_part1.envs import reward_fns
 
 class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
     metadata = {
@@ -16,8 +17,13 @@ class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         ],
         "render_fps": 50,
     }
-    def __init__(self, **kwargs):
-
+    def __init__(self, env_info=False, **kwargs):
+        """
+        :param env_info: if True, `step` returns the observation, the reward
+            terms and the score in its info dict; otherwise the info dict is
+            empty, and the reward is computed without building them
+        """
+        self.env_info = env_info
         observation_space = Box(low=-np.inf, high=np.inf, shape=(20,), dtype=np.float64)
         # placeholder
         self.hand_sid = -2
@@ -25,29 +31,45 @@ class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
 
         curr_dir = os.path.dirname(os.path.abspath(__file__))
         mujoco_env.MujocoEnv.__init__(self, curr_dir+'/assets/sawyer.xml', 2, observation_space=observation_space, **kwargs)
-        utils.EzPickle.__init__(self)
+        utils.EzPickle.__init__(self, env_info=env_info, **kwargs)
         self.observation_dim = 20
         self.action_dim = 7
 
         self.hand_sid = mujoco.mj_name2id(self.model, mujoco.mjtObj.mjOBJ_SITE, 'finger')
         self.target_sid = mujoco.mj_name2id(self.model, mujoco.mjtObj.mjOBJ_SITE, 'target')
         self.skip = self.frame_skip
+        self._reward_fn = reward_fns.get_reward_fn(self)
         if self.render_mode == "rgb_array":
             super().render()
             self.renderer.render_step()
 
     def _get_obs(self):
-        return np.concatenate([
-            self.data.qpos.flat, #[7]
-            self.data.qvel.flatten() / 10., #[7]
-            self.data.site_xpos[self.hand_sid], #[3]
-            self.model.site_pos[self.target_sid], #[3]
-        ])
+        # assembled in place; a new array per call, since callers keep the
+        # observations they are returned (e.g. utils.sample_trajectory)
+        ob = np.empty(self.observation_dim)
+        self.write_obs(self.data, ob)
+        return ob
+
+    def write_obs(self, data, out):
+        """
+        Write the observation of `data`, an MjData of this env's model, into `out`.
+        The target is part of the model, so it is shared by every MjData.
+        """
+        out[0:7] = data.qpos #[7]
+        np.divide(data.qvel, 10., out=out[7:14]) #[7]
+        out[14:17] = data.site_xpos[self.hand_sid] #[3]
+        out[17:20] = self.model.site_pos[self.target_sid] #[3]
+        return out
 
     def step(self, a):
 
         self.do_simulation(a, self.frame_skip)
         ob = self._get_obs()
+        if not self.env_info:
+            reward, done = self._reward_fn(ob, a)
+            # numpy scalars, like the rewards[0], dones[0] of get_reward
+            return ob, reward[()], done[()], {}
+
         reward, done = self.get_reward(ob, a)
 
         score = self.get_score(ob)
@@ -138,7 +160,23 @@ class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         #return
         return self._get_obs()
 
+    # --------------------------------
+    # get and set states
+    # --------------------------------
+
+    def get_env_state(self):
+        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy(),
+                    goal=self.model.site_pos[self.target_sid].copy(),
+                    rng=self.np_random.bit_generator.state)
+
+    def set_env_state(self, state):
+        self.np_random.bit_generator.state = state['rng']
+        return self.do_reset(state['qp'].copy(), state['qv'].copy(), state['goal'])
+
     def render(self,):
         ren = super().render()
         self.renderer.render_step()
-        return [ren[0]]
\ No newline at end of file
+        return [ren[0]]
+
+
+reward_fns.register_reward_fn(Reacher7DOFEnv, reward_fns.reacher_reward_np, reward_fns.reacher_reward_torch)
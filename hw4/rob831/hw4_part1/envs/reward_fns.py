@@ -0,0 +1,116 @@
+"""Stateless, batched reward functions for the model-based environments.
+
+Each env's `get_reward` is written for a single batch of NumPy arrays and
+stores its intermediate terms in `self.reward_dict`. The functions here compute
+the same `(rewards, dones)` without touching any env, for observations and
+actions with arbitrary leading batch dimensions (e.g. [ensemble, N, H, dim]),
+in both NumPy and torch, so planners can score candidates on the device.
+
+Envs register their functions with `register_reward_fn`, and callers look
+them up with `get_reward_fn(env, backend)`.
+"""
+import functools
+
+import numpy as np
+import torch
+
+
+_REWARD_FNS = {}
+
+
+def register_reward_fn(env_class, numpy_fn, torch_fn, get_params=None):
+    """
+        Register the batched reward functions of an env class.
+
+        arguments:
+            numpy_fn, torch_fn: functions `(observations, actions, **params) -> (rewards, dones)`
+            get_params: function `env -> dict` of the env attributes the reward
+                depends on, which are bound to the reward function on lookup
+    """
+    _REWARD_FNS[env_class] = {
+        'numpy': numpy_fn,
+        'torch': torch_fn,
+        'get_params': get_params,
+    }
+
+
+def get_reward_fn(env, backend='numpy'):
+    """
+        Look up the batched reward function of `env` (or of the env it wraps).
+
+        returns:
+            a function `(observations, actions) -> (rewards, dones)`, or None if
+            no reward function was registered for this env
+    """
+    env = getattr(env, 'unwrapped', env)
+    for env_class in type(env).__mro__:
+        if env_class in _REWARD_FNS:
+            entry = _REWARD_FNS[env_class]
+            params = entry['get_params'](env) if entry['get_params'] is not None else {}
+            return functools.partial(entry[backend], **params)
+    return None
+
+
+############################################
+############################################
+
+def cheetah_reward_np(observations, actions, leg_range=0.2, shin_range=0., foot_range=0., penalty_factor=10.):
+    xvel = observations[..., 9]
+    penalty = (
+        (observations[..., 6] > leg_range).astype(observations.dtype)
+        + (observations[..., 7] > shin_range)
+        + (observations[..., 8] > foot_range)
+    )
+    rewards = xvel - penalty_factor * penalty
+    return rewards, np.zeros_like(rewards)
+
+
+def cheetah_reward_torch(observations, actions, leg_range=0.2, shin_range=0., foot_range=0., penalty_factor=10.):
+    xvel = observations[..., 9]
+    penalty = (
+        (observations[..., 6] > leg_range).to(observations.dtype)
+        + (observations[..., 7] > shin_range)
+        + (observations[..., 8] > foot_range)
+    )
+    rewards = xvel - penalty_factor * penalty
+    return rewards, torch.zeros_like(rewards)
+
+
+############################################
+############################################
+
+def reacher_reward_np(observations, actions):
+    hand_pos = observations[..., -6:-3]
+    target_pos = observations[..., -3:]
+    diff = hand_pos - target_pos
+    # same as np.linalg.norm(diff, axis=-1), without its overhead on single observations
+    rewards = -10 * np.sqrt((diff * diff).sum(axis=-1))
+    return rewards, np.zeros_like(rewards)
+
+
+def reacher_reward_torch(observations, actions):
+    hand_pos = observations[..., -6:-3]
+    target_pos = observations[..., -3:]
+    rewards = -10 * torch.linalg.norm(hand_pos - target_pos, dim=-1)
+    return rewards, torch.zeros_like(rewards)
+
+
+############################################
+############################################
+
+def obstacles_reward_np(observations, actions, eps=0.1, boundary_min=-0.99, boundary_max=0.99):
+    curr_pos = observations[..., :2]
+    end_pos = observations[..., -2:]
+    dist = np.linalg.norm(curr_pos - end_pos, axis=-1)
+    oob = np.any((curr_pos < boundary_min) | (curr_pos > boundary_max), axis=-1)
+    dones = ((dist < eps) | oob).astype(dist.dtype)
+    return -dist, dones
+
+
+def obstacles_reward_torch(observations, actions, eps=0.1, boundary_min=-0.99, boundary_max=0.99):
+    curr_pos = observations[..., :2]
+    end_pos = observations[..., -2:]
+    dist = torch.linalg.norm(curr_pos - end_pos, dim=-1)
+    oob = torch.any((curr_pos < boundary_min) | (curr_pos > boundary_max), dim=-1)
+    dones = ((dist < eps) | oob).to(dist.dtype)
+    return -dist, dones
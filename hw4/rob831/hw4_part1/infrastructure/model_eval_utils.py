@@ -0,0 +1,162 @@
+"""Ground-truth evaluation of the multi-step predictions of a dynamics ensemble.
+
+Start states are saved with the envs' `get_env_state`. Worker processes
+restore them with `set_env_state` and replay action sequences in the real env,
+while the ensemble predicts the same rollouts for every member at once, with
+one batched forward pass per step (see EnsembleFFModel.rollout).
+
+Unlike `utils.calculate_mean_prediction_error`, which replays one sequence from
+a fresh reset and compares it with the first member only, this reports the
+error of every member at every horizon, averaged over many start states and
+sequences.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import gym
+import numpy as np
+import torch
+
+from rob831.hw4_part1.envs import register_envs
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+
+
+############################################
+############################################
+
+def sample_env_states(env, num_states, max_random_steps=0):
+    """
+        Save `num_states` start states: each one is a reset, followed by a
+        random number (up to `max_random_steps`) of random actions
+
+        returns:
+            a list of the states returned by env.get_env_state
+    """
+    env = env.unwrapped
+    states = []
+    for _ in range(num_states):
+        env.reset()
+        for _ in range(np.random.randint(max_random_steps + 1)):
+            env.step(env.action_space.sample())
+        states.append(env.get_env_state())
+    return states
+
+
+_replay_env = None
+
+
+def _init_replay_worker(env_name):
+    global _replay_env
+    register_envs()
+    _replay_env = gym.make(env_name).unwrapped
+
+
+def _replay_from_state(env, state, action_sequences):
+    """
+        Replay each of the [M, H, ac_dim] `action_sequences` from `state`
+
+        returns:
+            the visited observations, shape [M, H + 1, ob_dim]
+    """
+    M, H, _ = action_sequences.shape
+    true_obs = np.empty((M, H + 1, env.observation_space.shape[0]))
+    for i in range(M):
+        true_obs[i, 0] = env.set_env_state(state)
+        for t in range(H):
+            # episodes are not cut at `done`, since the predictions are not
+            true_obs[i, t + 1] = env.step(action_sequences[i, t])[0]
+    return true_obs
+
+
+def _replay_task(task):
+    return _replay_from_state(_replay_env, *task)
+
+
+def replay_action_sequences(env_name, states, action_sequences, num_workers=1):
+    """
+        Replay action sequences in the real env, from saved start states
+
+        arguments:
+            states: K states returned by env.get_env_state
+            action_sequences: array of shape [K, M, H, ac_dim]; the M
+                sequences action_sequences[k] are replayed from states[k]
+            num_workers: number of worker processes, each with its own env;
+                with a single worker the sequences are replayed in this process
+
+        returns:
+            the visited observations, shape [K, M, H + 1, ob_dim], where
+            [:, :, 0] are the observations of the start states
+    """
+    tasks = list(zip(states, action_sequences))
+    if num_workers <= 1:
+        env = gym.make(env_name).unwrapped
+        results = [_replay_from_state(env, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=mp.get_context('spawn'),
+                initializer=_init_replay_worker,
+                initargs=(env_name,),
+        ) as executor:
+            results = list(executor.map(_replay_task, tasks))
+    return np.stack(results)
+
+
+############################################
+############################################
+
+def multistep_prediction_error(dyn_models, true_obs, action_sequences):
+    """
+        Mean squared error of the open-loop predictions of every ensemble
+        member, at every horizon. Uses the statistics cached by
+        `dyn_models.update_statistics`.
+
+        arguments:
+            dyn_models: an EnsembleFFModel
+            true_obs: observations visited in the real env, shape
+                [..., H + 1, ob_dim], as returned by `replay_action_sequences`
+            action_sequences: the actions taken, shape [..., H, ac_dim]
+
+        returns:
+            errors: array of shape [ensemble_size, H], where errors[i, h - 1]
+                is the error of member i after h steps, averaged over the
+                sequences and the state dimensions
+            pred_obs: the predicted observations, shape
+                [ensemble_size, ..., H + 1, ob_dim]
+    """
+    batch_shape = true_obs.shape[:-2]
+    H = action_sequences.shape[-2]
+    true_obs = true_obs.reshape(-1, H + 1, true_obs.shape[-1])
+    action_sequences = action_sequences.reshape(-1, H, action_sequences.shape[-1])
+
+    # rollout stops before the state after the last action, so give it one
+    # more (never used) action to also predict that state
+    padded_sequences = np.concatenate(
+        [action_sequences, np.zeros_like(action_sequences[:, :1])], axis=1)
+
+    true_obs_t = ptu.from_numpy(true_obs)
+    with torch.no_grad():
+        pred_obs = dyn_models.rollout(true_obs_t[:, 0], ptu.from_numpy(padded_sequences))
+        errors = (pred_obs[:, :, 1:] - true_obs_t[:, 1:]).pow(2).mean(dim=(1, 3))
+
+    pred_obs = ptu.to_numpy(pred_obs).reshape((len(dyn_models),) + batch_shape + true_obs.shape[-2:])
+    return ptu.to_numpy(errors), pred_obs
+
+
+def evaluate_dynamics_model(dyn_models, env_name, states, action_sequences, num_workers=1):
+    """
+        Replay `action_sequences` from `states` in the real env (see
+        `replay_action_sequences`) and score the predictions of every member
+        of `dyn_models` (see `multistep_prediction_error`)
+
+        returns:
+            a dictionary with the per-member, per-horizon 'errors' [E, H], and
+            the 'true_obs' and 'pred_obs' they were computed from
+    """
+    true_obs = replay_action_sequences(env_name, states, action_sequences, num_workers)
+    errors, pred_obs = multistep_prediction_error(dyn_models, true_obs, action_sequences)
+    return {
+        'errors': errors,
+        'true_obs': true_obs,
+        'pred_obs': pred_obs,
+    }
@@ -1,3 +1,5 @@
+from collections import deque
+
 from rob831.hw4_part1.infrastructure.utils import *
 
 
@@ -26,12 +28,19 @@ class ReplayBuffer(object):
             observations = add_noise(observations)
             next_observations = add_noise(next_observations)
 
+        self.add_transitions(observations, actions, concatenated_rews, next_observations, terminals)
+
+    def add_transitions(self, observations, actions, rewards, next_observations, terminals):
+        """
+            Append a batch of transitions that do not come from whole rollouts
+            (e.g. branched model rollouts) directly to the component arrays
+        """
         if self.obs is None:
             self.obs = observations[-self.max_size:]
             self.acs = actions[-self.max_size:]
             self.next_obs = next_observations[-self.max_size:]
             self.terminals = terminals[-self.max_size:]
-            self.concatenated_rews = concatenated_rews[-self.max_size:]
+            self.concatenated_rews = rewards[-self.max_size:]
         else:
             self.obs = np.concatenate([self.obs, observations])[-self.max_size:]
             self.acs = np.concatenate([self.acs, actions])[-self.max_size:]
@@ -42,7 +51,7 @@ class ReplayBuffer(object):
                 [self.terminals, terminals]
             )[-self.max_size:]
             self.concatenated_rews = np.concatenate(
-                [self.concatenated_rews, concatenated_rews]
+                [self.concatenated_rews, rewards]
             )[-self.max_size:]
 
     ########################################
@@ -58,10 +67,14 @@ class ReplayBuffer(object):
     ########################################
     ########################################
 
-    def sample_random_data(self, batch_size):
+    def sample_random_data(self, batch_size, replace=False):
 
         assert self.obs.shape[0] == self.acs.shape[0] == self.concatenated_rews.shape[0] == self.next_obs.shape[0] == self.terminals.shape[0]
-        rand_indices = np.random.permutation(self.obs.shape[0])[:batch_size]
+        if replace:
+            # O(batch_size) instead of a permutation of the whole buffer
+            rand_indices = np.random.randint(self.obs.shape[0], size=batch_size)
+        else:
+            rand_indices = np.random.permutation(self.obs.shape[0])[:batch_size]
         return self.obs[rand_indices], self.acs[rand_indices], self.concatenated_rews[rand_indices], self.next_obs[rand_indices], self.terminals[rand_indices]
 
     def sample_recent_data(self, batch_size=1, concat_rew=True):
@@ -80,3 +93,82 @@ class ReplayBuffer(object):
             rollouts_to_return = self.paths[-num_recent_rollouts_to_return:]
             observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(rollouts_to_return)
             return observations, actions, unconcatenated_rews, next_observations, terminals
+
+
+class ModelReplayBuffer(object):
+    """
+        Fixed-size ring buffer for transitions generated by a learned model.
+
+        Every transition is tagged with the version of the model that generated
+        it, and expires once the model has been retrained max_age times since,
+        so the buffer only holds data from recent models. Since versions only
+        grow, the valid transitions are always the most recent ones, i.e. a
+        contiguous segment of the ring.
+    """
+
+    def __init__(self, max_size=1000000, max_age=1):
+
+        self.max_size = max_size
+        self.max_age = max_age
+        self.model_version = 0
+        self.next_idx = 0
+        self.size = 0
+        # number of valid transitions generated by each model version, oldest first
+        self.version_counts = deque()
+        self.obs = None
+        self.acs = None
+        self.rews = None
+        self.next_obs = None
+        self.terminals = None
+
+    def __len__(self):
+        return self.size
+
+    def advance_model_version(self):
+        """Call after every retraining of the model, to expire old transitions."""
+        self.model_version += 1
+        while self.version_counts \
+                and self.version_counts[0][0] <= self.model_version - self.max_age:
+            _, count = self.version_counts.popleft()
+            self.size -= count
+
+    def add_transitions(self, observations, actions, rewards, next_observations, terminals):
+        if self.obs is None:
+            self.obs = np.empty((self.max_size,) + observations.shape[1:], dtype=np.float32)
+            self.acs = np.empty((self.max_size,) + actions.shape[1:], dtype=np.float32)
+            self.rews = np.empty((self.max_size,), dtype=np.float32)
+            self.next_obs = np.empty((self.max_size,) + next_observations.shape[1:], dtype=np.float32)
+            self.terminals = np.empty((self.max_size,), dtype=np.float32)
+
+        # only the last max_size transitions fit in the buffer
+        n = min(observations.shape[0], self.max_size)
+        data = [x[-n:] for x in (observations, actions, rewards, next_observations, terminals)]
+        buffers = (self.obs, self.acs, self.rews, self.next_obs, self.terminals)
+
+        # write in at most two contiguous chunks, wrapping around the end
+        first = min(n, self.max_size - self.next_idx)
+        for buffer, x in zip(buffers, data):
+            buffer[self.next_idx:self.next_idx + first] = x[:first]
+            buffer[:n - first] = x[first:]
+        self.next_idx = (self.next_idx + n) % self.max_size
+
+        if self.version_counts and self.version_counts[-1][0] == self.model_version:
+            self.version_counts[-1][1] += n
+        else:
+            self.version_counts.append([self.model_version, n])
+        self.size += n
+
+        # forget the oldest transitions that were overwritten
+        overflow = self.size - self.max_size
+        while overflow > 0:
+            dropped = min(overflow, self.version_counts[0][1])
+            self.version_counts[0][1] -= dropped
+            if self.version_counts[0][1] == 0:
+                self.version_counts.popleft()
+            overflow -= dropped
+            self.size -= dropped
+
+    def sample_random_data(self, batch_size):
+        # valid transitions are the last self.size ones written
+        rand_indices = (self.next_idx - 1 - np.random.randint(self.size, size=batch_size)) % self.max_size
+        return self.obs[rand_indices], self.acs[rand_indices], self.rews[rand_indices], self.next_obs[rand_indices], self.terminals[rand_indices]
@@ -58,6 +58,14 @@ class RL_Trainer(object):
             self.env = gym.make(self.params['env_name'], render_mode='rgb_array')
         self.env.seed(seed)
 
+        # copies of the env that are stepped together with it when collecting
+        # rollouts, so that the policy plans the actions of all of them at once
+        self.envs = [self.env]
+        for i in range(1, self.params.get('num_envs', 1)):
+            env = gym.make(self.params['env_name'])
+            env.seed(seed + i)
+            self.envs.append(env)
+
         # import plotting (locally if 'obstacles' env)
         if not(self.params['env_name']=='obstacles-hw4_part1-v0'):
             import matplotlib
@@ -116,6 +124,12 @@ class RL_Trainer(object):
         self.total_envsteps = 0
         self.start_time = time.time()
 
+        if len(self.envs) > 1:
+            for policy in (collect_policy, eval_policy):
+                if not hasattr(policy, 'get_actions'):
+                    raise ValueError('{} cannot plan for several envs at once (num_envs > 1)'.format(
+                        type(policy).__name__))
+
         print_period = 1
 
         for itr in range(n_iter):
@@ -159,8 +173,15 @@ class RL_Trainer(object):
 
             # if doing MBPO, train the model free component
             if isinstance(self.agent, MBPOAgent):
+                self.agent.advance_model_version()
+                if self.params['mbpo_rollout_length'] > 0 and self.params['mbpo_num_rollouts'] > 0:
+                    # branch all the model rollouts of this iteration at once,
+                    # into the age-bounded model buffer when one is enabled,
+                    # otherwise straight into the SAC replay buffer
+                    self.agent.collect_model_rollouts(
+                        self.params['mbpo_num_rollouts'], self.params['mbpo_rollout_length'])
                 for _ in range(self.sac_params['n_iter']):
-                    if self.params['mbpo_rollout_length'] > 0:
+                    if self.params['mbpo_rollout_length'] > 0 and self.params['mbpo_num_rollouts'] == 0:
                         # TODO(Q6): Collect trajectory of length self.params['mbpo_rollout_length'] from the 
                         # learned dynamics model. Add this trajectory to the correct replay buffer.
                         # HINT: Look at collect_model_trajectory and add_to_replay_buffer from MBPOAgent.
@@ -207,8 +228,7 @@ class RL_Trainer(object):
             num_transitions_to_sample = self.params['batch_size']
 
         print("\nCollecting data to be used for training...")
-        paths, envsteps_this_batch = utils.sample_trajectories(
-            self.env, collect_policy, num_transitions_to_sample, self.params['ep_len'])
+        paths, envsteps_this_batch = self.sample_trajectories(collect_policy, num_transitions_to_sample)
 
         train_video_paths = None
         if self.log_video:
@@ -217,6 +237,14 @@ class RL_Trainer(object):
 
         return paths, envsteps_this_batch, train_video_paths
 
+    def sample_trajectories(self, policy, min_timesteps_per_batch, return_unfinished=True):
+        """Collect rollouts with every copy of the env (see utils.sample_trajectories_batched)"""
+        if len(self.envs) > 1:
+            return utils.sample_trajectories_batched(
+                self.envs, policy, min_timesteps_per_batch, self.params['ep_len'], return_unfinished)
+        return utils.sample_trajectories(
+            self.env, policy, min_timesteps_per_batch, self.params['ep_len'])
+
     def train_agent(self):
         # TODO: get this from previous HW - done
         all_logs = []
@@ -244,7 +272,9 @@ class RL_Trainer(object):
 
         # collect eval trajectories, for logging
         print("\nCollecting data for eval...")
-        eval_paths, eval_envsteps_this_batch = utils.sample_trajectories(self.env, eval_policy, self.params['eval_batch_size'], self.params['ep_len'])
+        # only whole episodes, so the eval returns are comparable
+        eval_paths, eval_envsteps_this_batch = self.sample_trajectories(
+            eval_policy, self.params['eval_batch_size'], return_unfinished=False)
 
         # save eval rollouts as videos in tensorboard event file
         if self.log_video and train_video_paths != None:
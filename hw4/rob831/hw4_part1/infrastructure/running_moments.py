@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class RunningMoments(object):
+    """
+        Mean and standard deviation of a stream of data, updated batch by batch
+        with the parallel merge of Chan et al., so that adding data never
+        requires going over the data seen before.
+
+        Data can also be removed (e.g. when it is evicted from a replay
+        buffer), by undoing the merge.
+
+        arguments:
+            shape: shape of a single datapoint
+    """
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=np.float64)
+        # sum of squared differences from the mean
+        self.m2 = np.zeros(shape, dtype=np.float64)
+
+    def update(self, data):
+        """Add a batch of datapoints, of shape (batch_size,) + shape."""
+        batch_count = data.shape[0]
+        if batch_count == 0:
+            return
+        batch_mean = np.mean(data, axis=0, dtype=np.float64)
+        batch_m2 = np.sum(np.square(data - batch_mean), axis=0, dtype=np.float64)
+
+        count = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * batch_count / count
+        self.m2 = self.m2 + batch_m2 + np.square(delta) * self.count * batch_count / count
+        self.count = count
+
+    def remove(self, data):
+        """Remove a batch of datapoints that were previously added."""
+        batch_count = data.shape[0]
+        if batch_count == 0:
+            return
+        if batch_count >= self.count:
+            self.__init__(self.mean.shape)
+            return
+        batch_mean = np.mean(data, axis=0, dtype=np.float64)
+        batch_m2 = np.sum(np.square(data - batch_mean), axis=0, dtype=np.float64)
+
+        count = self.count - batch_count
+        mean = (self.mean * self.count - batch_mean * batch_count) / count
+        delta = batch_mean - mean
+        self.m2 = np.maximum(self.m2 - batch_m2 - np.square(delta) * count * batch_count / self.count, 0)
+        self.mean = mean
+        self.count = count
+
+    @property
+    def var(self):
+        return self.m2 / max(self.count, 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
@@ -1,13 +1,19 @@
 import math
+import torch
 from torch import distributions as dist
 import torch.nn.functional as F
 import torch.nn as nn
 
 
 def soft_update_params(net, target_net, tau):
-    for param, target_param in zip(net.parameters(), target_net.parameters()):
-        target_param.data.copy_(tau * param.data +
-                                (1 - tau) * target_param.data)
+    # one multi-tensor op over all the parameters instead of a python loop
+    params = [param.data for param in net.parameters()]
+    target_params = [target_param.data for target_param in target_net.parameters()]
+    if hasattr(torch, '_foreach_lerp_'):
+        torch._foreach_lerp_(target_params, params, tau)
+    else:
+        torch._foreach_mul_(target_params, 1 - tau)
+        torch._foreach_add_(target_params, params, alpha=tau)
 
 class TanhTransform(dist.transforms.Transform):
     domain = dist.constraints.real
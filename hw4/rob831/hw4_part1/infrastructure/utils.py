@@ -57,6 +57,7 @@ def mean_squared_error(a, b):
 def sample_trajectory(env, policy, max_path_length, render=False):
     # TODO: get this from previous HW - done
     ob = env.reset()
+    policy.reset()
     obs, acs, rewards, next_obs, terminals, image_obs = [], [], [], [], [], []
     steps = 0
     while True:
@@ -111,6 +112,54 @@ def sample_n_trajectories(env, policy, ntraj, max_path_length, render=False):
 
     return paths
 
+def sample_trajectories_batched(envs, policy, min_timesteps_per_batch, max_path_length, return_unfinished=True):
+    """
+        Collect rollouts from several copies of the env at once, choosing the
+        actions of every copy with a single policy.get_actions call per step,
+        until the finished rollouts have min_timesteps_per_batch steps
+
+        With return_unfinished, the rollouts still running in the other
+        copies at that point are returned too, truncated (their last step is
+        marked terminal, as when max_path_length is reached) and counted, so
+        no env step is thrown away and long episodes are not left out of the
+        batch. Without it (e.g. for evaluation, where partial returns would
+        skew the averages), they are dropped, and only the returned paths are
+        counted
+    """
+    paths = []
+    timesteps_this_batch = 0
+    obs = np.stack([env.reset() for env in envs])
+    policy.reset()
+    rollouts = [([], [], [], [], []) for _ in envs]
+    while timesteps_this_batch < min_timesteps_per_batch:
+        acs = policy.get_actions(obs)
+        for i, env in enumerate(envs):
+            path_obs, path_acs, path_rewards, path_next_obs, path_terminals = rollouts[i]
+            path_obs.append(obs[i].copy())
+            path_acs.append(acs[i])
+            ob, rew, done, _ = env.step(acs[i])
+            path_next_obs.append(ob)
+            path_rewards.append(rew)
+            if done or len(path_obs) > max_path_length:
+                path_terminals.append(1)
+                paths.append(Path(path_obs, [], path_acs, path_rewards, path_next_obs, path_terminals))
+                timesteps_this_batch += len(path_obs)
+                rollouts[i] = ([], [], [], [], [])
+                ob = env.reset()
+                policy.reset([i])
+            else:
+                path_terminals.append(0)
+            obs[i] = ob
+        print('At timestep:    ', timesteps_this_batch, '/', min_timesteps_per_batch, end='\r')
+
+    for path_obs, path_acs, path_rewards, path_next_obs, path_terminals in rollouts:
+        if return_unfinished and path_obs:
+            path_terminals[-1] = 1
+            paths.append(Path(path_obs, [], path_acs, path_rewards, path_next_obs, path_terminals))
+            timesteps_this_batch += len(path_obs)
+
+    return paths, timesteps_this_batch
+
 ############################################
 ############################################
 
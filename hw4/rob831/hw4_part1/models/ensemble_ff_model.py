@@ -0,0 +1,288 @@
+from torch import nn
+import torch
+from torch import optim
+from rob831.hw4_part1.models.base_model import BaseModel
+from rob831.hw4_part1.infrastructure.utils import normalize, unnormalize
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+
+
+class EnsembleFFModel(nn.Module, BaseModel):
+    """
+        An ensemble of `ensemble_size` FFModels whose delta networks are stored
+        as stacked weights, so that the forward and backward pass of every
+        member is a single batched matmul per layer, and a single optimizer
+        step updates the whole ensemble.
+
+        Each member still has its own weights and is trained on its own data:
+        `update` takes one batch per member, and the loss is the sum of the
+        per-member mean losses, so every member receives exactly the gradient
+        it would get from training it on its own.
+
+        The ensemble can be indexed and iterated like a list of models
+        (`models[0].get_prediction(...)`, `for model in models`), in which
+        case each element predicts with a single member.
+    """
+
+    def __init__(self, ac_dim, ob_dim, n_layers, size, ensemble_size, learning_rate=0.001):
+        super(EnsembleFFModel, self).__init__()
+
+        self.ac_dim = ac_dim
+        self.ob_dim = ob_dim
+        self.n_layers = n_layers
+        self.size = size
+        self.ensemble_size = ensemble_size
+        self.learning_rate = learning_rate
+        self.delta_network = ptu.build_ensemble_mlp(
+            ensemble_size=self.ensemble_size,
+            input_size=self.ob_dim + self.ac_dim,
+            output_size=self.ob_dim,
+            n_layers=self.n_layers,
+            size=self.size,
+        )
+        self.delta_network.to(ptu.device)
+        # Adam is elementwise, so one optimizer over the stacked weights is the
+        # same as one optimizer per member
+        self.optimizer = optim.Adam(
+            self.delta_network.parameters(),
+            self.learning_rate,
+        )
+        self.obs_mean = None
+        self.obs_std = None
+        self.acs_mean = None
+        self.acs_std = None
+        self.delta_mean = None
+        self.delta_std = None
+
+    def __len__(self):
+        return self.ensemble_size
+
+    def __getitem__(self, member):
+        if not -self.ensemble_size <= member < self.ensemble_size:
+            raise IndexError('ensemble member index out of range')
+        return EnsembleMember(self, member % self.ensemble_size)
+
+    def __iter__(self):
+        return (EnsembleMember(self, i) for i in range(self.ensemble_size))
+
+    def update_statistics(
+            self,
+            obs_mean,
+            obs_std,
+            acs_mean,
+            acs_std,
+            delta_mean,
+            delta_std,
+    ):
+        """
+        Cache the data statistics on the device. They are used by `rollout`,
+        and by `update` and `get_prediction` when no statistics are given.
+        """
+        self.obs_mean = ptu.from_numpy(obs_mean)
+        self.obs_std = ptu.from_numpy(obs_std)
+        self.acs_mean = ptu.from_numpy(acs_mean)
+        self.acs_std = ptu.from_numpy(acs_std)
+        self.delta_mean = ptu.from_numpy(delta_mean)
+        self.delta_std = ptu.from_numpy(delta_std)
+
+    def get_statistics(self, data_statistics=None):
+        """
+        :param data_statistics: A dictionary of numpy arrays, or None to use
+            the statistics cached by `update_statistics`
+        :return: a dictionary with the statistics as tensors on the device
+        """
+        if data_statistics is None:
+            return {
+                'obs_mean': self.obs_mean,
+                'obs_std': self.obs_std,
+                'acs_mean': self.acs_mean,
+                'acs_std': self.acs_std,
+                'delta_mean': self.delta_mean,
+                'delta_std': self.delta_std,
+            }
+        return {k: ptu.from_numpy(v) for k, v in data_statistics.items()}
+
+    def forward(
+            self,
+            obs_unnormalized,
+            acs_unnormalized,
+            obs_mean,
+            obs_std,
+            acs_mean,
+            acs_std,
+            delta_mean,
+            delta_std,
+            member=None,
+    ):
+        """
+        :param obs_unnormalized: Unnormalized observations, shape
+            [ensemble_size, batch_size, ob_dim], or [batch_size, ob_dim] to
+            give every member the same observations
+        :param acs_unnormalized: Unnormalized actions, shape
+            [ensemble_size, batch_size, ac_dim] or [batch_size, ac_dim]
+        :param obs_mean: Mean of observations
+        :param obs_std: Standard deviation of observations
+        :param acs_mean: Mean of actions
+        :param acs_std: Standard deviation of actions
+        :param delta_mean: Mean of state difference `s_t+1 - s_t`.
+        :param delta_std: Standard deviation of state difference `s_t+1 - s_t`.
+        :param member: index of a single member to evaluate, or None for all
+        :return: tuple `(next_obs_pred, delta_pred_normalized)`, each of shape
+            [ensemble_size, batch_size, ob_dim], or [batch_size, ob_dim] for a
+            single member
+        """
+        if member is not None:
+            if obs_unnormalized.dim() == 3:
+                obs_unnormalized = obs_unnormalized[member]
+            if acs_unnormalized.dim() == 3:
+                acs_unnormalized = acs_unnormalized[member]
+            obs_normalized = normalize(obs_unnormalized, obs_mean, obs_std)
+            acs_normalized = normalize(acs_unnormalized, acs_mean, acs_std)
+            concatenated_input = torch.cat([obs_normalized, acs_normalized], dim=-1)
+            delta_pred_normalized = ptu.ensemble_member_forward(
+                self.delta_network, concatenated_input, member)
+            next_obs_pred = obs_unnormalized + unnormalize(delta_pred_normalized, delta_mean, delta_std)
+            return next_obs_pred, delta_pred_normalized
+
+        batch_shape = (self.ensemble_size, obs_unnormalized.shape[-2])
+        obs_unnormalized = obs_unnormalized.expand(batch_shape + (self.ob_dim,))
+        acs_unnormalized = acs_unnormalized.expand(batch_shape + (self.ac_dim,))
+
+        obs_normalized = normalize(obs_unnormalized, obs_mean, obs_std)
+        acs_normalized = normalize(acs_unnormalized, acs_mean, acs_std)
+        concatenated_input = torch.cat([obs_normalized, acs_normalized], dim=-1)
+
+        delta_pred_normalized = self.delta_network(concatenated_input)
+        next_obs_pred = obs_unnormalized + unnormalize(delta_pred_normalized, delta_mean, delta_std)
+        return next_obs_pred, delta_pred_normalized
+
+    def get_prediction(self, obs, acs, data_statistics=None, member=None):
+        """
+        :param obs: numpy array of observations (s_t), shape
+            [ensemble_size, batch_size, ob_dim] or [batch_size, ob_dim]
+        :param acs: numpy array of actions (a_t), shape
+            [ensemble_size, batch_size, ac_dim] or [batch_size, ac_dim]
+        :param data_statistics: A dictionary with the following keys (each with
+        a numpy array as the value):
+             - 'obs_mean'
+             - 'obs_std'
+             - 'acs_mean'
+             - 'acs_std'
+             - 'delta_mean'
+             - 'delta_std'
+            or None to use the statistics cached by `update_statistics`
+        :param member: index of a single member to predict with (only its
+            weights are evaluated), or None for all
+        :return: a numpy array of the predicted next-states (s_t+1) of every
+            member, shape [ensemble_size, batch_size, ob_dim], or of `member`,
+            shape [batch_size, ob_dim]
+        """
+        obs = ptu.from_numpy(obs)
+        acs = ptu.from_numpy(acs)
+        stats = self.get_statistics(data_statistics)
+        with torch.no_grad():
+            next_obs_pred, _ = self(
+                obs,
+                acs,
+                stats['obs_mean'],
+                stats['obs_std'],
+                stats['acs_mean'],
+                stats['acs_std'],
+                stats['delta_mean'],
+                stats['delta_std'],
+                member,
+            )
+        return ptu.to_numpy(next_obs_pred)
+
+    def rollout(self, obs, action_sequences):
+        """
+        Roll out action sequences through every member of the ensemble,
+        keeping all predicted states on the device. Uses the statistics cached
+        by `update_statistics`.
+
+        :param obs: tensor with the initial observation(s), shape [ob_dim] or
+            [N, ob_dim]
+        :param action_sequences: tensor of action sequences, shape [N, H, ac_dim]
+        :return: tensor of the states visited by each member while executing
+            each sequence, shape [ensemble_size, N, H, ob_dim], where
+            [:, :, 0] is `obs` and [:, :, t] is the state the t-th action is
+            taken from
+        """
+        N, H, _ = action_sequences.shape
+        predicted_obs = torch.empty(
+            (self.ensemble_size, N, H, self.ob_dim), device=action_sequences.device)
+        current_obs = obs.expand(self.ensemble_size, N, self.ob_dim)
+        with torch.no_grad():
+            for t in range(H):
+                predicted_obs[:, :, t] = current_obs
+                if t == H - 1:
+                    # the state after the last action is never scored
+                    break
+                current_obs, _ = self(
+                    current_obs,
+                    action_sequences[:, t],
+                    self.obs_mean,
+                    self.obs_std,
+                    self.acs_mean,
+                    self.acs_std,
+                    self.delta_mean,
+                    self.delta_std,
+                )
+        return predicted_obs
+
+    def update(self, observations, actions, next_observations, data_statistics=None):
+        """
+        :param observations: numpy array of observations, shape
+            [ensemble_size, batch_size, ob_dim]; member i is trained on
+            observations[i]
+        :param actions: numpy array of actions, shape
+            [ensemble_size, batch_size, ac_dim]
+        :param next_observations: numpy array of next observations, shape
+            [ensemble_size, batch_size, ob_dim]
+        :param data_statistics: A dictionary with the following keys (each with
+        a numpy array as the value):
+             - 'obs_mean'
+             - 'obs_std'
+             - 'acs_mean'
+             - 'acs_std'
+             - 'delta_mean'
+             - 'delta_std'
+            or None to use the statistics cached by `update_statistics`
+        :return: the training loss, averaged over members
+        """
+        obs = ptu.from_numpy(observations)
+        acs = ptu.from_numpy(actions)
+        next_obs = ptu.from_numpy(next_observations)
+        stats = self.get_statistics(data_statistics)
+        target = normalize(next_obs - obs, stats['delta_mean'], stats['delta_std'])
+
+        _, delta_pred_normalized = self(
+            obs,
+            acs,
+            stats['obs_mean'],
+            stats['obs_std'],
+            stats['acs_mean'],
+            stats['acs_std'],
+            stats['delta_mean'],
+            stats['delta_std'],
+        )
+        member_losses = (delta_pred_normalized - target).pow(2).mean(dim=(1, 2))
+        loss = member_losses.sum()
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        return {
+            'Training Loss': ptu.to_numpy(member_losses.mean()),
+        }
+
+
+class EnsembleMember(BaseModel):
+    """A view of a single member of an EnsembleFFModel."""
+
+    def __init__(self, ensemble, member):
+        self.ensemble = ensemble
+        self.member = member
+
+    def get_prediction(self, obs, acs, data_statistics=None):
+        return self.ensemble.get_prediction(obs, acs, data_statistics, member=self.member)
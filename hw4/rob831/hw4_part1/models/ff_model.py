@@ -44,6 +44,10 @@ class FFModel(nn.Module, BaseModel):
             delta_mean,
             delta_std,
     ):
+        """
+        Cache the data statistics on the device. They are used by `update` and
+        `get_prediction` when no statistics are given.
+        """
         self.obs_mean = ptu.from_numpy(obs_mean)
         self.obs_std = ptu.from_numpy(obs_std)
         self.acs_mean = ptu.from_numpy(acs_mean)
@@ -51,6 +55,23 @@ class FFModel(nn.Module, BaseModel):
         self.delta_mean = ptu.from_numpy(delta_mean)
         self.delta_std = ptu.from_numpy(delta_std)
 
+    def get_statistics(self, data_statistics=None):
+        """
+        :param data_statistics: A dictionary of numpy arrays, or None to use
+            the statistics cached by `update_statistics`
+        :return: a dictionary with the statistics as tensors on the device
+        """
+        if data_statistics is None:
+            return {
+                'obs_mean': self.obs_mean,
+                'obs_std': self.obs_std,
+                'acs_mean': self.acs_mean,
+                'acs_std': self.acs_std,
+                'delta_mean': self.delta_mean,
+                'delta_std': self.delta_std,
+            }
+        return {k: ptu.from_numpy(v) for k, v in data_statistics.items()}
+
     def forward(
             self,
             obs_unnormalized,
@@ -91,7 +112,7 @@ class FFModel(nn.Module, BaseModel):
         next_obs_pred = obs_unnormalized + unnormalize(delta_pred_normalized, delta_mean, delta_std)  # TODO(Q1) - done
         return next_obs_pred, delta_pred_normalized
 
-    def get_prediction(self, obs, acs, data_statistics):
+    def get_prediction(self, obs, acs, data_statistics=None):
         """
         :param obs: numpy array of observations (s_t)
         :param acs: numpy array of actions (a_t)
@@ -103,12 +124,13 @@ class FFModel(nn.Module, BaseModel):
              - 'acs_std'
              - 'delta_mean'
              - 'delta_std'
+            or None to use the statistics cached by `update_statistics`
         :return: a numpy array of the predicted next-states (s_t+1)
         """
         # TODO(Q1) get the predicted next-states (s_t+1) as a numpy array - done
         obs = ptu.from_numpy(obs)
         acs = ptu.from_numpy(acs)
-        stats = {k: ptu.from_numpy(v) for k, v in data_statistics.items()}
+        stats = self.get_statistics(data_statistics)
         next_obs_pred, _ = self(
             obs,
             acs,
@@ -124,7 +146,7 @@ class FFModel(nn.Module, BaseModel):
         # outputs.
         return prediction
 
-    def update(self, observations, actions, next_observations, data_statistics):
+    def update(self, observations, actions, next_observations, data_statistics=None):
         """
         :param observations: numpy array of observations
         :param actions: numpy array of actions
@@ -137,13 +159,14 @@ class FFModel(nn.Module, BaseModel):
              - 'acs_std'
              - 'delta_mean'
              - 'delta_std'
+            or None to use the statistics cached by `update_statistics`
         :return:
         """
         # TODO(Q1) compute the normalized target for the model. - done
         obs = ptu.from_numpy(observations)
         acs = ptu.from_numpy(actions)
         next_obs = ptu.from_numpy(next_observations)
-        stats = {k: ptu.from_numpy(v) for k, v in data_statistics.items()}
+        stats = self.get_statistics(data_statistics)
         delta = next_obs - obs
         target = normalize(delta, stats['delta_mean'], stats['delta_std'])
         # Hint: you should use `data_statistics['delta_mean']` and
@@ -1,6 +1,9 @@
 import numpy as np
 
 from .base_policy import BasePolicy
+from rob831.hw4_part1.models.ensemble_ff_model import EnsembleFFModel
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+from rob831.hw4_part1.envs.reward_fns import get_reward_fn
 
 
 class MPCPolicy(BasePolicy):
@@ -15,6 +18,10 @@ class MPCPolicy(BasePolicy):
                  cem_iterations=4,
                  cem_num_elites=5,
                  cem_alpha=1,
+                 cem_warm_start=False,
+                 mppi_temperature=1.0,
+                 mppi_noise_std=0.5,
+                 mppi_noise_beta=0.6,
                  **kwargs
                  ):
         super().__init__(**kwargs)
@@ -25,6 +32,8 @@ class MPCPolicy(BasePolicy):
         self.horizon = horizon
         self.N = N
         self.data_statistics = None  # NOTE must be updated from elsewhere
+        # batched reward function on tensors, if one is registered for this env
+        self.reward_fn = get_reward_fn(self.env, backend='torch')
 
         self.ob_dim = self.env.observation_space.shape[0]
 
@@ -35,26 +44,92 @@ class MPCPolicy(BasePolicy):
         self.high = self.ac_space.high
 
         # Sampling strategy
-        allowed_sampling = ('random', 'cem')
+        allowed_sampling = ('random', 'cem', 'mppi')
         assert sample_strategy in allowed_sampling, f"sample_strategy must be one of the following: {allowed_sampling}"
         self.sample_strategy = sample_strategy
         self.cem_iterations = cem_iterations
         self.cem_num_elites = cem_num_elites
         self.cem_alpha = cem_alpha
+        self.cem_warm_start = cem_warm_start
+        self.mppi_temperature = mppi_temperature
+        self.mppi_noise_std = mppi_noise_std
+        self.mppi_noise_beta = mppi_noise_beta
+        # receding-horizon plan cache: the plans found at the previous control
+        # step (CEM elite mean or MPPI nominal plan) for each planned
+        # observation, shifted by one step to initialize the next search
+        self.plan_mean = None
+        self.plan_valid = None
 
         print(f"Using action sampling strategy: {self.sample_strategy}")
         if self.sample_strategy == 'cem':
             print(f"CEM params: alpha={self.cem_alpha}, "
-                + f"num_elites={self.cem_num_elites}, iterations={self.cem_iterations}")
+                + f"num_elites={self.cem_num_elites}, iterations={self.cem_iterations}, "
+                + f"warm_start={self.cem_warm_start}")
+        if self.sample_strategy == 'mppi':
+            print(f"MPPI params: temperature={self.mppi_temperature}, "
+                + f"noise_std={self.mppi_noise_std}, noise_beta={self.mppi_noise_beta}")
+
+    def reset(self, indices=None):
+        """
+        Forget the cached plan, which belongs to the previous episode.
+
+        :param indices: when planning for a batch of environments with
+            `get_actions`, only forget the plans of these environments
+        """
+        if indices is None or self.plan_mean is None:
+            self.plan_mean = None
+        else:
+            self.plan_valid[indices] = False
+
+    def shifted_plan(self, batch_size, horizon):
+        """
+        The cached plans advanced by the step that was just executed,
+        repeating their last action.
+
+        :return: tuple `(plans, valid)` of shapes [batch_size, H, D_action] and
+            [batch_size], where `valid` is False for the environments without a
+            cached plan, or None if nothing is cached for this batch and horizon
+        """
+        if self.plan_mean is None \
+                or self.plan_mean.shape != (batch_size, horizon, self.ac_dim):
+            return None
+        plans = np.empty_like(self.plan_mean)
+        plans[:, :-1] = self.plan_mean[:, 1:]
+        plans[:, -1] = self.plan_mean[:, -1]
+        return plans, self.plan_valid
+
+    def cache_plan(self, plans):
+        self.plan_mean = plans
+        self.plan_valid = np.ones(plans.shape[0], dtype=bool)
 
     def sample_action_sequences(self, num_sequences, horizon, obs=None):
-        if self.sample_strategy == 'random' \
-            or (self.sample_strategy == 'cem' and obs is None):
+        """
+        :param obs: numpy array with the current observation. Shape [D_obs]
+        :return: numpy array of candidate action sequences of shape
+            [N, H, D_action], or, for CEM and MPPI, the single planned
+            sequence with shape [1, H, D_action]
+        """
+        if obs is None:
+            return np.random.uniform(
+                self.low, self.high, size=(num_sequences, horizon, self.ac_dim))
+        return self.sample_action_sequences_batch(num_sequences, horizon, obs[None])[0]
+
+    def sample_action_sequences_batch(self, num_sequences, horizon, obs):
+        """
+        Batched version of `sample_action_sequences`, planning for B
+        observations at once.
+
+        :param obs: numpy array of observations. Shape [B, D_obs]
+        :return: numpy array of shape [B, N, H, D_action], or [B, 1, H, D_action]
+            for CEM and MPPI
+        """
+        B = obs.shape[0]
+        if self.sample_strategy == 'random':
             # TODO(Q1) uniformly sample trajectories and return an array of - done
             # dimensions (num_sequences, horizon, self.ac_dim) in the range
             # [self.low, self.high]
             random_action_sequences = np.random.uniform(
-                self.low, self.high, size=(num_sequences, horizon, self.ac_dim)
+                self.low, self.high, size=(B, num_sequences, horizon, self.ac_dim)
             )
             return random_action_sequences
         elif self.sample_strategy == 'cem':
@@ -63,33 +138,79 @@ class MPCPolicy(BasePolicy):
             # iteratively as described in Section 3.3, "Iterative Random-Shooting with Refinement" of
             # https://arxiv.org/pdf/1909.11652.pdf 
 
-            elite_mean = np.zeros((horizon, self.ac_dim))
-            elite_std = np.ones((horizon, self.ac_dim))
+            elite_mean = np.zeros((B, horizon, self.ac_dim))
+            elite_std = np.ones((B, horizon, self.ac_dim))
+            warm_start = np.zeros(B, dtype=bool)
+            cached = self.shifted_plan(B, horizon) if self.cem_warm_start else None
+            if cached is not None:
+                # start from the previous plans, with the spread of the uniform
+                # distribution
+                warm_plans, warm_start = cached
+                elite_mean[warm_start] = warm_plans[warm_start]
+                elite_std[warm_start] = (self.high - self.low) / np.sqrt(12)
             for i in range(self.cem_iterations):
                 # - Sample candidate sequences from a Gaussian with the current 
                 #   elite mean and variance
                 #     (Hint: remember that for the first iteration, we instead sample
                 #      uniformly at random just like we do for random-shooting)
-                if i == 0:
-                    candidate_sequences = np.random.uniform(self.low, self.high, size=(num_sequences, horizon, self.ac_dim))
+                size = (B, num_sequences, horizon, self.ac_dim)
+                if i == 0 and not warm_start.any():
+                    candidate_sequences = np.random.uniform(self.low, self.high, size=size)
                 else:
-                    candidate_sequences = np.random.normal(elite_mean, elite_std, size=(num_sequences, horizon, self.ac_dim))
+                    candidate_sequences = np.random.normal(elite_mean[:, None], elite_std[:, None], size=size)
                     candidate_sequences = np.clip(candidate_sequences, self.low, self.high)
+                    if i == 0 and not warm_start.all():
+                        cold_start = ~warm_start
+                        candidate_sequences[cold_start] = np.random.uniform(
+                            self.low, self.high, size=(cold_start.sum(),) + size[1:])
                 # - Get the top `self.cem_num_elites` elites
                 #     (Hint: what existing function can we use to compute rewards for
                 #      our candidate sequences in order to rank them?)
-                rewards = self.evaluate_candidate_sequences(candidate_sequences, obs)
-                elite_indices = np.argsort(rewards)[-self.cem_num_elites:]
-                elite_sequences = candidate_sequences[elite_indices]
+                rewards = self.evaluate_candidate_sequences_batch(candidate_sequences, obs)
+                # the elites only need to be selected, not sorted
+                elite_indices = np.argpartition(rewards, -self.cem_num_elites, axis=1)[:, -self.cem_num_elites:]
+                elite_sequences = np.take_along_axis(
+                    candidate_sequences, elite_indices[:, :, None, None], axis=1)
 
                 # - Update the elite mean and variance
-                elite_mean = self.cem_alpha * np.mean(elite_sequences, axis=0) + (1 - self.cem_alpha) * elite_mean
-                elite_std = self.cem_alpha * np.std(elite_sequences, axis=0) + (1 - self.cem_alpha) * elite_std
+                elite_mean = self.cem_alpha * np.mean(elite_sequences, axis=1) + (1 - self.cem_alpha) * elite_mean
+                elite_std = self.cem_alpha * np.std(elite_sequences, axis=1) + (1 - self.cem_alpha) * elite_std
 
             # TODO(Q5): Set `cem_action` to the appropriate action chosen by CEM - done
             cem_action = elite_mean
+            if self.cem_warm_start:
+                self.cache_plan(elite_mean)
+
+            return cem_action[:, None]
+        elif self.sample_strategy == 'mppi':
+            # MPPI: perturb a nominal plan with time-correlated noise, and
+            # replace it by the average of all the perturbed sequences, each
+            # weighted by the exponentiated predicted return
+            nominal_plans = np.tile((self.low + self.high) / 2, (B, horizon, 1))
+            cached = self.shifted_plan(B, horizon)
+            if cached is not None:
+                warm_plans, warm_start = cached
+                nominal_plans[warm_start] = warm_plans[warm_start]
 
-            return cem_action[None]
+            # low-pass filtered gaussian noise, so that consecutive actions of a
+            # sequence are correlated
+            white_noise = np.random.normal(
+                0, self.mppi_noise_std, size=(B, num_sequences, horizon, self.ac_dim))
+            noise = np.empty_like(white_noise)
+            noise[:, :, 0] = white_noise[:, :, 0]
+            for t in range(1, horizon):
+                noise[:, :, t] = self.mppi_noise_beta * white_noise[:, :, t] \
+                    + (1 - self.mppi_noise_beta) * noise[:, :, t - 1]
+            candidate_sequences = np.clip(nominal_plans[:, None] + noise, self.low, self.high)
+
+            rewards = self.evaluate_candidate_sequences_batch(candidate_sequences, obs)
+            # subtract the max before exponentiating, for numerical stability
+            weights = np.exp((rewards - np.max(rewards, axis=1, keepdims=True)) / self.mppi_temperature)
+            weights /= np.sum(weights, axis=1, keepdims=True)
+            nominal_plans = np.einsum('bn,bnhd->bhd', weights, candidate_sequences)
+
+            self.cache_plan(nominal_plans)
+            return nominal_plans[:, None]
         else:
             raise Exception(f"Invalid sample_strategy: {self.sample_strategy}")
 
@@ -99,6 +220,12 @@ class MPCPolicy(BasePolicy):
         #
         # Then, return the mean predictions across all ensembles.
         # Hint: the return value should be an array of shape (N,)
+        if isinstance(self.dyn_models, EnsembleFFModel):
+            # every model of the ensemble is evaluated in the same forward pass
+            all_rewards = self.calculate_sum_of_rewards_ensemble(
+                obs, candidate_action_sequences, self.dyn_models)
+            return np.mean(all_rewards, axis=0)
+
         all_rewards = []
         for model in self.dyn_models:
             rewards = self.calculate_sum_of_rewards(obs, candidate_action_sequences, model)
@@ -106,6 +233,29 @@ class MPCPolicy(BasePolicy):
 
         return np.mean(all_rewards, axis=0)
 
+    def evaluate_candidate_sequences_batch(self, candidate_action_sequences, obs):
+        """
+        :param candidate_action_sequences: numpy array of shape [B, N, H, D_action]
+        :param obs: numpy array of observations. Shape [B, D_obs]
+        :return: numpy array with the predicted sum of rewards of each
+            sequence, averaged over the ensemble. Shape [B, N]
+        """
+        B, N, H, _ = candidate_action_sequences.shape
+        if isinstance(self.dyn_models, EnsembleFFModel):
+            # the B x N sequences are rolled out together, each one starting
+            # from the observation it was sampled for
+            all_rewards = self.calculate_sum_of_rewards_ensemble(
+                np.repeat(obs, N, axis=0),
+                candidate_action_sequences.reshape(B * N, H, self.ac_dim),
+                self.dyn_models,
+            )
+            return np.mean(all_rewards, axis=0).reshape(B, N)
+
+        return np.stack([
+            self.evaluate_candidate_sequences(sequences, ob)
+            for sequences, ob in zip(candidate_action_sequences, obs)
+        ])
+
     def get_action(self, obs):
         if self.data_statistics is None:
             return self.sample_action_sequences(num_sequences=1, horizon=1)[0]
@@ -125,6 +275,32 @@ class MPCPolicy(BasePolicy):
             action_to_take = best_action_sequence[0]  # TODO (Q2) - done
             return action_to_take[None]  # Unsqueeze the first index
 
+    def get_actions(self, obs):
+        """
+        Plan for a batch of observations at once, e.g. from several copies of
+        the env. The cached plans of CEM and MPPI are kept per observation, so
+        the batch must keep the same order from one step to the next, and
+        `reset(indices)` must be called for the envs that were reset.
+
+        :param obs: numpy array of observations. Shape [B, D_obs]
+        :return: numpy array with the action to take for each observation.
+            Shape [B, D_action]
+        """
+        B = obs.shape[0]
+        if self.data_statistics is None:
+            return np.random.uniform(self.low, self.high, size=(B, self.ac_dim))
+
+        candidate_action_sequences = self.sample_action_sequences_batch(
+            num_sequences=self.N, horizon=self.horizon, obs=obs)
+
+        if candidate_action_sequences.shape[1] == 1:
+            # CEM / MPPI: a single planned sequence per observation
+            return candidate_action_sequences[:, 0, 0]
+
+        predicted_rewards = self.evaluate_candidate_sequences_batch(candidate_action_sequences, obs)
+        best_action_sequences = candidate_action_sequences[np.arange(B), np.argmax(predicted_rewards, axis=1)]
+        return best_action_sequences[:, 0]
+
     def calculate_sum_of_rewards(self, obs, candidate_action_sequences, model):
         """
 
@@ -163,3 +339,39 @@ class MPCPolicy(BasePolicy):
             current_obs = model.get_prediction(current_obs, actions, self.data_statistics)
 
         return sum_of_rewards
+
+    def calculate_sum_of_rewards_ensemble(self, obs, candidate_action_sequences, ensemble):
+        """
+        Same as `calculate_sum_of_rewards`, but rolls out the candidate action
+        sequences through every member of an EnsembleFFModel at once. The
+        predicted states stay on the device for the whole horizon, and are
+        scored there with the env's batched torch reward function when one is
+        registered; otherwise they are moved back to the host a single time
+        and scored with `env.get_reward`.
+
+        :param obs: numpy array with the current observation. Shape [D_obs],
+        or [N, D_obs] to start each sequence from its own observation
+        :param candidate_action_sequences: numpy array with the candidate action
+        sequences. Shape [N, H, D_action]
+        :param ensemble: The current EnsembleFFModel.
+        :return: numpy array with the sum of rewards for each member and each
+        action sequence. The array should have shape [ensemble_size, N].
+        """
+        N, H, _ = candidate_action_sequences.shape
+        E = ensemble.ensemble_size
+
+        action_sequences = ptu.from_numpy(candidate_action_sequences)
+        predicted_obs = ensemble.rollout(ptu.from_numpy(obs), action_sequences)
+
+        if self.reward_fn is not None:
+            rewards, _ = self.reward_fn(predicted_obs, action_sequences.expand(E, N, H, -1))
+            return ptu.to_numpy(rewards.sum(dim=2))
+
+        predicted_obs = ptu.to_numpy(predicted_obs)
+
+        # score every (member, sequence, timestep) in one call
+        rewards, _ = self.env.get_reward(
+            predicted_obs.reshape(E * N * H, -1),
+            np.tile(candidate_action_sequences.reshape(N * H, -1), (E, 1)),
+        )
+        return rewards.reshape(E, N, H).sum(axis=2)
@@ -6,6 +6,10 @@ class BasePolicy(object, metaclass=abc.ABCMeta):
     def get_action(self, obs: np.ndarray) -> np.ndarray:
         raise NotImplementedError
 
+    def reset(self):
+        """Called at the start of every episode."""
+        pass
+
     def update(self, obs: np.ndarray, acs: np.ndarray, **kwargs) -> dict:
         """Return a dictionary of logging information."""
         raise NotImplementedError
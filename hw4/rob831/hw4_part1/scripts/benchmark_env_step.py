@@ -0,0 +1,60 @@
+"""
+Measure the per-step overhead of the MuJoCo envs on top of the simulation:
+the time of `env.step`, with and without the `env_info` dict, minus the time
+of `do_simulation` alone.
+
+Example:
+    python rob831/hw4_part1/scripts/benchmark_env_step.py --env_name cheetah-hw4_part1-v0
+"""
+import argparse
+import time
+
+import gym
+import numpy as np
+
+from rob831.hw4_part1.envs import register_envs
+
+register_envs()
+
+
+def us_per_step(step, actions, min_time):
+    num_steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for action in actions:
+            step(action)
+        num_steps += len(actions)
+    return (time.perf_counter() - start) / num_steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_name', type=str, nargs='+',
+                        default=['cheetah-hw4_part1-v0', 'reacher-hw4_part1-v0'])
+    parser.add_argument('--num_actions', type=int, default=1000)
+    parser.add_argument('--min_time', type=float, default=2.0,
+                        help='seconds to run each variant for')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print('{:>24} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+        'env', 'sim (us)', 'step (us)', 'overhead', 'info (us)', 'overhead'))
+    for env_name in args.env_name:
+        env = gym.make(env_name).unwrapped
+        env.seed(args.seed)
+        env.reset()
+        rng = np.random.RandomState(args.seed)
+        actions = rng.uniform(env.action_space.low, env.action_space.high,
+                              size=(args.num_actions, env.action_space.shape[0]))
+
+        sim = us_per_step(lambda a: env.do_simulation(a, env.frame_skip), actions, args.min_time)
+        env.env_info = False
+        step = us_per_step(env.step, actions, args.min_time)
+        env.env_info = True
+        step_info = us_per_step(env.step, actions, args.min_time)
+        print('{:>24} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f}'.format(
+            env_name, sim, step, step - sim, step_info, step_info - sim))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Compare MPC planners by planning time per step and episode return.
+
+A dynamics ensemble is first trained on random-policy data (and optionally a
+few rounds of on-policy MPC data), then every planner configuration is
+evaluated with the same model.
+
+Each configuration is `strategy:num_action_sequences:cem_iterations[:warm]`,
+e.g. `cem:1000:4` is the cold-started CEM of the homework and `cem:250:2:warm`
+warm-starts from the previous plan with fewer candidates and iterations.
+MPPI always warm-starts and runs a single update per step, e.g. `mppi:250:0`.
+
+Example:
+    python rob831/hw4_part1/scripts/benchmark_mpc_planning.py --env_name cheetah-hw4_part1-v0 \
+        --configs random:1000:0 cem:1000:4 cem:1000:4:warm cem:250:2:warm
+"""
+import argparse
+import time
+
+import gym
+import numpy as np
+import torch
+
+from rob831.hw4_part1.agents.mb_agent import MBAgent
+from rob831.hw4_part1.envs import register_envs
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+from rob831.hw4_part1.infrastructure import utils
+
+register_envs()
+
+
+def parse_config(config):
+    fields = config.split(':')
+    return {
+        'strategy': fields[0],
+        'N': int(fields[1]),
+        'cem_iterations': int(fields[2]),
+        'cem_warm_start': len(fields) > 3 and fields[3] == 'warm',
+    }
+
+
+def train_agent(env, args):
+    agent_params = {
+        'ensemble_size': args.ensemble_size,
+        'n_layers': args.n_layers,
+        'size': args.size,
+        'learning_rate': args.learning_rate,
+        'num_agent_train_steps_per_iter': args.num_agent_train_steps_per_iter,
+        'mpc_horizon': args.mpc_horizon,
+        'mpc_num_action_sequences': 1000,
+        'mpc_action_sampling_strategy': 'random',
+        'cem_iterations': 4,
+        'cem_num_elites': args.cem_num_elites,
+        'cem_alpha': 1,
+        'cem_warm_start': False,
+        'mppi_temperature': args.mppi_temperature,
+        'mppi_noise_std': args.mppi_noise_std,
+        'mppi_noise_beta': args.mppi_noise_beta,
+        'ob_dim': env.observation_space.shape[0],
+        'ac_dim': env.action_space.shape[0],
+    }
+    agent = MBAgent(env, agent_params)
+    for itr in range(args.n_iter):
+        batch_size = args.batch_size_initial if itr == 0 else args.batch_size
+        paths, _ = utils.sample_trajectories(env, agent.actor, batch_size, args.ep_len)
+        agent.add_to_replay_buffer(paths)
+        for _ in range(args.num_agent_train_steps_per_iter):
+            log = agent.train(*agent.sample(args.train_batch_size))
+        print('\niteration {}: training loss {:.4f}'.format(itr, float(log['Training Loss'])))
+    return agent
+
+
+def evaluate_planner(env, agent, config, args):
+    actor = agent.actor
+    actor.sample_strategy = config['strategy']
+    actor.N = config['N']
+    actor.cem_iterations = config['cem_iterations']
+    actor.cem_warm_start = config['cem_warm_start']
+
+    returns, planning_time, num_steps = [], 0., 0
+    for _ in range(args.n_eval_episodes):
+        ob = env.reset()
+        actor.reset()
+        episode_return = 0.
+        for _ in range(args.ep_len):
+            start = time.perf_counter()
+            ac = actor.get_action(ob)[0]
+            planning_time += time.perf_counter() - start
+            num_steps += 1
+            ob, rew, done, _ = env.step(ac)
+            episode_return += rew
+            if done:
+                break
+        returns.append(episode_return)
+    return planning_time / num_steps * 1e3, np.mean(returns), np.std(returns)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_name', type=str, default='cheetah-hw4_part1-v0')
+    parser.add_argument('--configs', type=str, nargs='+',
+                        default=['random:1000:0', 'cem:1000:4', 'cem:1000:4:warm', 'cem:250:2:warm',
+                                 'mppi:1000:0', 'mppi:250:0'])
+    parser.add_argument('--ep_len', type=int, default=200)
+    parser.add_argument('--n_eval_episodes', type=int, default=2)
+
+    parser.add_argument('--n_iter', '-n', type=int, default=1)
+    parser.add_argument('--batch_size_initial', type=int, default=5000)
+    parser.add_argument('--batch_size', '-b', type=int, default=800)
+    parser.add_argument('--train_batch_size', '-tb', type=int, default=512)
+    parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=500)
+
+    parser.add_argument('--ensemble_size', '-e', type=int, default=3)
+    parser.add_argument('--mpc_horizon', type=int, default=15)
+    parser.add_argument('--cem_num_elites', type=int, default=5)
+    parser.add_argument('--mppi_temperature', type=float, default=1.0)
+    parser.add_argument('--mppi_noise_std', type=float, default=0.5)
+    parser.add_argument('--mppi_noise_beta', type=float, default=0.6)
+    parser.add_argument('--learning_rate', '-lr', type=float, default=0.001)
+    parser.add_argument('--n_layers', '-l', type=int, default=2)
+    parser.add_argument('--size', '-s', type=int, default=250)
+
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no_gpu', '-ngpu', action='store_true')
+    parser.add_argument('--which_gpu', '-gpu_id', default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    ptu.init_gpu(use_gpu=not args.no_gpu, gpu_id=args.which_gpu)
+
+    env = gym.make(args.env_name)
+    env.seed(args.seed)
+    agent = train_agent(env, args)
+
+    print('{:>20} {:>18} {:>12} {:>10}'.format('config', 'plan time (ms)', 'return', 'std'))
+    for config in args.configs:
+        np.random.seed(args.seed)
+        env.seed(args.seed)
+        ms_per_step, mean_return, std_return = evaluate_planner(env, agent, parse_config(config), args)
+        print('{:>20} {:>18.2f} {:>12.2f} {:>10.2f}'.format(config, ms_per_step, mean_return, std_return))
+
+
+if __name__ == '__main__':
+    main()
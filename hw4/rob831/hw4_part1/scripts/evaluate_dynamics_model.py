@@ -0,0 +1,124 @@
+"""
+Measure the multi-step prediction error of every member of a dynamics
+ensemble against the real env.
+
+The ensemble is first trained on random-policy data (and optionally a few
+rounds of on-policy MPC data). Then --num_states start states are saved, and
+--num_sequences random action sequences are replayed from each of them by
+--num_workers worker processes, while the ensemble predicts all of them at
+once. The error of each member is printed for every horizon.
+
+Example:
+    python rob831/hw4_part1/scripts/evaluate_dynamics_model.py --env_name cheetah-hw4_part1-v0 \
+        --num_states 16 --num_sequences 64 --horizon 20 --num_workers 4
+"""
+import argparse
+import time
+
+import gym
+import numpy as np
+import torch
+
+from rob831.hw4_part1.agents.mb_agent import MBAgent
+from rob831.hw4_part1.envs import register_envs
+from rob831.hw4_part1.infrastructure import model_eval_utils
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+from rob831.hw4_part1.infrastructure import utils
+
+register_envs()
+
+
+def train_agent(env, args):
+    agent_params = {
+        'ensemble_size': args.ensemble_size,
+        'n_layers': args.n_layers,
+        'size': args.size,
+        'learning_rate': args.learning_rate,
+        'num_agent_train_steps_per_iter': args.num_agent_train_steps_per_iter,
+        'mpc_horizon': args.mpc_horizon,
+        'mpc_num_action_sequences': args.mpc_num_action_sequences,
+        'mpc_action_sampling_strategy': 'random',
+        'cem_iterations': 4,
+        'cem_num_elites': 5,
+        'cem_alpha': 1,
+        'cem_warm_start': False,
+        'mppi_temperature': 1.0,
+        'mppi_noise_std': 0.5,
+        'mppi_noise_beta': 0.6,
+        'ob_dim': env.observation_space.shape[0],
+        'ac_dim': env.action_space.shape[0],
+    }
+    agent = MBAgent(env, agent_params)
+    for itr in range(args.n_iter):
+        batch_size = args.batch_size_initial if itr == 0 else args.batch_size
+        paths, _ = utils.sample_trajectories(env, agent.actor, batch_size, args.ep_len)
+        agent.add_to_replay_buffer(paths)
+        for _ in range(args.num_agent_train_steps_per_iter):
+            log = agent.train(*agent.sample(args.train_batch_size))
+        print('\niteration {}: training loss {:.4f}'.format(itr, float(log['Training Loss'])))
+    return agent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_name', type=str, default='cheetah-hw4_part1-v0')
+    parser.add_argument('--num_states', type=int, default=16)
+    parser.add_argument('--max_random_steps', type=int, default=100,
+                        help='each start state is reached with up to this many random actions')
+    parser.add_argument('--num_sequences', type=int, default=64,
+                        help='number of action sequences replayed from each start state')
+    parser.add_argument('--horizon', type=int, default=20)
+    parser.add_argument('--num_workers', type=int, default=4)
+    parser.add_argument('--ep_len', type=int, default=200)
+
+    parser.add_argument('--n_iter', '-n', type=int, default=1)
+    parser.add_argument('--batch_size_initial', type=int, default=5000)
+    parser.add_argument('--batch_size', '-b', type=int, default=800)
+    parser.add_argument('--train_batch_size', '-tb', type=int, default=512)
+    parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=500)
+
+    parser.add_argument('--ensemble_size', '-e', type=int, default=3)
+    parser.add_argument('--mpc_horizon', type=int, default=10)
+    parser.add_argument('--mpc_num_action_sequences', type=int, default=1000)
+    parser.add_argument('--learning_rate', '-lr', type=float, default=0.001)
+    parser.add_argument('--n_layers', '-l', type=int, default=2)
+    parser.add_argument('--size', '-s', type=int, default=250)
+
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no_gpu', '-ngpu', action='store_true')
+    parser.add_argument('--which_gpu', '-gpu_id', default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    ptu.init_gpu(use_gpu=not args.no_gpu, gpu_id=args.which_gpu)
+
+    env = gym.make(args.env_name)
+    env.seed(args.seed)
+    agent = train_agent(env, args)
+
+    states = model_eval_utils.sample_env_states(env, args.num_states, args.max_random_steps)
+    action_sequences = np.random.uniform(
+        env.action_space.low, env.action_space.high,
+        size=(args.num_states, args.num_sequences, args.horizon, env.action_space.shape[0]))
+
+    start = time.time()
+    true_obs = model_eval_utils.replay_action_sequences(
+        args.env_name, states, action_sequences, args.num_workers)
+    replay_time = time.time() - start
+    start = time.time()
+    errors, _ = model_eval_utils.multistep_prediction_error(
+        agent.dyn_models, true_obs, action_sequences)
+    predict_time = time.time() - start
+    print('\nReplayed {} sequences in {:.2f}s, predicted them in {:.2f}s\n'.format(
+        args.num_states * args.num_sequences, replay_time, predict_time))
+
+    members = ['member {}'.format(i) for i in range(len(errors))]
+    print('{:>8} '.format('horizon') + ' '.join('{:>12}'.format(m) for m in members + ['mean']))
+    for h in range(args.horizon):
+        row = list(errors[:, h]) + [errors[:, h].mean()]
+        print('{:>8} '.format(h + 1) + ' '.join('{:>12.4f}'.format(e) for e in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,10 @@ class MB_Trainer(object):
             'cem_iterations': params['cem_iterations'],
             'cem_num_elites': params['cem_num_elites'],
             'cem_alpha': params['cem_alpha'],
+            'cem_warm_start': params['cem_warm_start'],
+            'mppi_temperature': params['mppi_temperature'],
+            'mppi_noise_std': params['mppi_noise_std'],
+            'mppi_noise_beta': params['mppi_noise_beta'],
         }
 
         agent_params = {**computation_graph_args, **train_args, **controller_args}
@@ -70,6 +74,10 @@ def main():
     parser.add_argument('--cem_iterations', type=int, default=4)
     parser.add_argument('--cem_num_elites', type=int, default=5)
     parser.add_argument('--cem_alpha', type=float, default=1)
+    parser.add_argument('--cem_warm_start', action='store_true')
+    parser.add_argument('--mppi_temperature', type=float, default=1.0)
+    parser.add_argument('--mppi_noise_std', type=float, default=0.5)
+    parser.add_argument('--mppi_noise_beta', type=float, default=0.6)
 
     parser.add_argument('--add_sl_noise', '-noise', action='store_true')
     parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=1000)
@@ -77,6 +85,9 @@ def main():
     parser.add_argument('--batch_size', '-b', type=int, default=8000) #steps collected per train iteration (put into replay buffer)
     parser.add_argument('--train_batch_size', '-tb', type=int, default=512) ##steps used per gradient step (used for training)
     parser.add_argument('--eval_batch_size', '-eb', type=int, default=400) #steps collected per eval iteration
+    # copies of the env whose actions are planned together, with one batched
+    # MPC call per step; this pays off when planning is launch-bound (GPU), not on CPU
+    parser.add_argument('--num_envs', type=int, default=1)
 
     parser.add_argument('--learning_rate', '-lr', type=float, default=0.001)
     parser.add_argument('--n_layers', '-l', type=int, default=2)
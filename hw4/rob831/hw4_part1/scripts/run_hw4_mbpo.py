@@ -54,11 +54,21 @@ class MBPO_Trainer(object):
             'cem_iterations': params['cem_iterations'],
             'cem_num_elites': params['cem_num_elites'],
             'cem_alpha': params['cem_alpha'],
+            'cem_warm_start': params['cem_warm_start'],
+            'mppi_temperature': params['mppi_temperature'],
+            'mppi_noise_std': params['mppi_noise_std'],
+            'mppi_noise_beta': params['mppi_noise_beta'],
+        }
+
+        mbpo_args = {
+            'mbpo_model_buffer_size': params['mbpo_model_buffer_size'],
+            'mbpo_model_max_age': params['mbpo_model_max_age'],
+            'mbpo_real_ratio': params['mbpo_real_ratio'],
         }
 
         mb_agent_params = {**mb_computation_graph_args, **mb_train_args, **controller_args}
         sac_agent_params = {**sac_computation_graph_args, **estimate_advantage_args, **sac_train_args}
-        agent_params = {**mb_agent_params}
+        agent_params = {**mb_agent_params, **mbpo_args}
         agent_params['sac_params'] = sac_agent_params
 
         self.params = params
@@ -106,6 +116,10 @@ def main():
     parser.add_argument('--cem_iterations', type=int, default=4)
     parser.add_argument('--cem_num_elites', type=int, default=5)
     parser.add_argument('--cem_alpha', type=float, default=1)
+    parser.add_argument('--cem_warm_start', action='store_true')
+    parser.add_argument('--mppi_temperature', type=float, default=1.0)
+    parser.add_argument('--mppi_noise_std', type=float, default=0.5)
+    parser.add_argument('--mppi_noise_beta', type=float, default=0.6)
     parser.add_argument('--add_sl_noise', action='store_true')
     parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=1000)
     parser.add_argument('--batch_size_initial', type=int, default=20000) #(random) steps collected on 1st iteration (put into replay buffer)
@@ -131,6 +145,10 @@ def main():
 
     # MBPO parameters
     parser.add_argument('--mbpo_rollout_length', type=int, default=1)
+    parser.add_argument('--mbpo_num_rollouts', type=int, default=0) #rollouts branched at once per iteration (0 to collect one per SAC iteration)
+    parser.add_argument('--mbpo_model_buffer_size', type=int, default=0) #separate buffer for model data (0 to share the SAC buffer)
+    parser.add_argument('--mbpo_model_max_age', type=int, default=1) #model retrains after which model data expires
+    parser.add_argument('--mbpo_real_ratio', type=float, default=0.05) #fraction of real data in each SAC batch
 
     args = parser.parse_args()
 
@@ -50,31 +50,61 @@ class AWACAgent(DQNAgent):
 
     def get_qvals(self, critic, obs, action):
         # get q-value for a given critic, obs, and action
+        """
+            arguments:
+                obs: tensor of shape (batch_size, ob_dim)
+                action: tensor of shape (batch_size,) for discrete actions, or
+                    (batch_size, ac_dim) for a critic over continuous actions,
+                    whose q_net takes the concatenated [obs, action]
+            returns:
+                the q-value of each pair, shape (batch_size,)
+        """
+        if self.agent_params['discrete']:
+            qa_values = critic.q_net(obs)
+            q_value = torch.gather(qa_values, 1, action.to(torch.long).unsqueeze(1)).squeeze(1)
+        else:
+            q_value = critic.q_net(torch.cat([obs, action], dim=-1)).squeeze(-1)
         return q_value
 
     def estimate_advantage(self, ob_no, ac_na, re_n, next_ob_no, terminal_n, n_actions=10):
-        # TODO: Calculate and return the advantage (n sample estimate) 
-        # TODO convert to torch tensors
-
-        # HINT: store computed values in the provided vals list. You will use the average of this list for calculating the advantage.
-        vals = []
-        # TODO: get action distribution for current obs, you will use this for the value function estimate
-        dist = None
-        # TODO Calculate Value Function Estimate given current observation
-        # HINT: You may find it helpful to utilze get_qvals defined above
-        if self.agent_params['discrete']:
-            for i in range(self.agent_params['ac_dim']):
-                pass
-        else:
-            
-            for _ in range(n_actions):
-                pass
-        v_pi = None
+        # TODO: Calculate and return the advantage (n sample estimate) - done
+        """
+            Estimate A(s, a) = Q(s, a) - V(s), with V(s) the expectation of
+            Q(s, a') over a' ~ pi(.|s): exact over every action when they are
+            discrete, and from `n_actions` policy samples otherwise.
 
-        # TODO Calculate Q-Values
-        q_vals = None
-        # TODO Calculate the Advantage using q_vals and v_pi  
-        return None
+            All Q-values, for the data actions and for the actions V(s) is
+            estimated from, come from a single critic pass over the batch,
+            however many actions are used.
+
+            returns:
+                the advantage of each transition, tensor of shape (batch_size,)
+        """
+        ob_no = ptu.from_numpy(ob_no)
+        ac_na = ptu.from_numpy(ac_na)
+        critic = self.exploitation_critic
+
+        with torch.no_grad():
+            dist = self.awac_actor(ob_no)
+            if self.agent_params['discrete']:
+                # a single pass gives Q(s, .) for every action; V(s) is its
+                # mean weighted by pi(.|s)
+                qa_values = critic.q_net(ob_no)
+                v_pi = (dist.probs * qa_values).sum(dim=1)
+                q_vals = torch.gather(qa_values, 1, ac_na.to(torch.long).unsqueeze(1)).squeeze(1)
+            else:
+                # draw every sample at once, (n_actions, batch_size, ac_dim), and
+                # score them together with the data actions as one batch
+                batch_size = ob_no.shape[0]
+                actions = torch.cat([ac_na[None], dist.rsample((n_actions,))], dim=0)
+                obs = ob_no.expand(n_actions + 1, -1, -1)
+                qa_values = self.get_qvals(
+                    critic, obs.reshape(-1, ob_no.shape[-1]), actions.reshape(-1, actions.shape[-1])
+                ).view(n_actions + 1, batch_size)
+                v_pi = qa_values[1:].mean(dim=0)
+                q_vals = qa_values[0]
+
+        return q_vals - v_pi
 
     def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
         log = {}
@@ -82,6 +112,7 @@ class AWACAgent(DQNAgent):
         if self.t > self.num_exploration_steps:
             # TODO: After exploration is over, set the actor to optimize the extrinsic critic
             #HINT: Look at method ArgMaxPolicy.set_critic
+            self.actor.set_critic(self.exploitation_critic)
 
         if (self.t > self.learning_starts
                 and self.t % self.learning_freq == 0
@@ -27,9 +27,21 @@ class DQNAgent(object):
         self.critic = DQNCritic(agent_params, self.optimizer_spec)
         self.actor = ArgMaxPolicy(self.critic)
 
+        # copies of the env that are stepped together with it
+        self.envs = [self.env] + agent_params.get('extra_envs', [])
+        self.num_envs = len(self.envs)
+        if self.num_envs > 1:
+            self.last_obs = np.stack([self.last_obs] + [env.reset() for env in self.envs[1:]])
+        # with several envs, the number of updates per env step once learning
+        # has started; by default the one update every learning_freq steps of
+        # a single env
+        self.update_to_data_ratio = (agent_params.get('update_to_data_ratio')
+                                     or 1. / self.learning_freq)
+
         lander = agent_params['env_name'].startswith('LunarLander')
         self.replay_buffer = MemoryOptimizedReplayBuffer(
-            agent_params['replay_buffer_size'], agent_params['frame_history_len'], lander=lander)
+            agent_params['replay_buffer_size'], agent_params['frame_history_len'], lander=lander,
+            num_envs=self.num_envs)
         self.t = 0
         self.num_param_updates = 0
 
@@ -46,6 +58,16 @@ class DQNAgent(object):
         raise NotImplementedError
         # Not needed for this homework
 
+    def num_updates_due(self):
+        """
+            With several envs, the number of updates to make now to keep
+            update_to_data_ratio updates per env step since learning_starts
+        """
+        if self.t <= self.learning_starts or not self.replay_buffer.can_sample(self.batch_size):
+            return 0
+        num_updates = int((self.t - self.learning_starts) * self.update_to_data_ratio)
+        return max(num_updates - self.num_param_updates, 0)
+
     ####################################
     ####################################
 
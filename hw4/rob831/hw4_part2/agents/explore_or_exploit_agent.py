@@ -1,6 +1,6 @@
 from collections import OrderedDict
 
-from rob831.hw4_part2.critics.dqn_critic import DQNCritic
+from rob831.hw4_part2.critics.dqn_critic import DQNCritic, MultiHeadDQNCritic
 from rob831.hw4_part2.critics.cql_critic import CQLCritic
 from rob831.hw4_part2.infrastructure.replay_buffer import ReplayBuffer
 from rob831.hw4_part2.infrastructure.utils import *
@@ -15,12 +15,14 @@ class ExplorationOrExploitationAgent(DQNAgent):
     def __init__(self, env, agent_params, normalize_rnd=True, rnd_gamma=0.99):
         super(ExplorationOrExploitationAgent, self).__init__(env, agent_params)
         
-        self.replay_buffer = MemoryOptimizedReplayBuffer(100000, 1, float_obs=True)
+        self.replay_buffer = MemoryOptimizedReplayBuffer(100000, 1, float_obs=True, num_envs=self.num_envs)
         self.num_exploration_steps = agent_params['num_exploration_steps']
         self.offline_exploitation = agent_params['offline_exploitation']
 
-        self.exploitation_critic = DQNCritic(agent_params, self.optimizer_spec)
-        self.exploration_critic = DQNCritic(agent_params, self.optimizer_spec)
+        # head 0 is trained on the mixed reward, head 1 on the environment reward
+        self.critics = MultiHeadDQNCritic(agent_params, self.optimizer_spec, num_heads=2)
+        self.exploration_critic = self.critics[0]
+        self.exploitation_critic = self.critics[1]
         
         self.exploration_model = RNDModel(agent_params, self.optimizer_spec)
         self.explore_weight_schedule = agent_params['explore_weight_schedule']
@@ -36,7 +38,14 @@ class ExplorationOrExploitationAgent(DQNAgent):
         self.normalize_rnd = normalize_rnd
         self.rnd_gamma = rnd_gamma
 
-    def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
+    def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n, offline=False):
+        """
+            offline: the batch comes from a fixed dataset rather than from the
+                replay buffer, so every call is an update, regardless of
+                learning_starts, learning_freq and the buffer size. Only the
+                exploitation critic is trained, and the exploration model is
+                not run, since exploration is over
+        """
         log = {}
 
         if self.t > self.num_exploration_steps:
@@ -44,10 +53,27 @@ class ExplorationOrExploitationAgent(DQNAgent):
             #HINT: Look at method ArgMaxPolicy.set_critic
             self.actor.set_critic(self.exploitation_critic)
 
-        if (self.t > self.learning_starts
+        if self.num_envs > 1:
+            perform_update = self.num_updates_due() > 0
+        else:
+            perform_update = (self.t > self.learning_starts
                 and self.t % self.learning_freq == 0
                 and self.replay_buffer.can_sample(self.batch_size)
-        ):
+            )
+        if offline:
+            env_reward = (re_n + self.exploit_rew_shift) * self.exploit_rew_scale
+            critic_loss = self.critics.update(
+                ob_no, ac_na, next_ob_no, env_reward[None], terminal_n,
+                heads=[self.exploitation_critic.head])
+
+            if self.num_param_updates % self.target_update_freq == 0:
+                self.critics.update_target_network()
+
+            log['Exploitation Critic Loss'] = critic_loss['Training Loss'][0]
+
+            self.num_param_updates += 1
+
+        elif perform_update:
 
             # Get Reward Weights
             # TODO: Get the current explore reward weight and exploit reward weight - done
@@ -61,7 +87,9 @@ class ExplorationOrExploitationAgent(DQNAgent):
             # HINT: Normalize the exploration bonus, as RND values vary highly in magnitude.
             # HINT: Normalize using self.running_rnd_rew_std, and keep an exponential moving average
             # of self.running_rnd_rew_std using self.rnd_gamma.
-            expl_bonus = self.exploration_model.forward_np(next_ob_no)
+            # the bonus and the exploration model update come from the same pass
+            # TODO 1): Update the exploration model (based off s') - done
+            expl_bonus, expl_model_loss = self.exploration_model.forward_and_update(next_ob_no)
 
             if self.normalize_rnd:
                 self.running_rnd_rew_std = self.rnd_gamma * self.running_rnd_rew_std + (1 - self.rnd_gamma) * expl_bonus.std()
@@ -80,27 +108,27 @@ class ExplorationOrExploitationAgent(DQNAgent):
 
             # Update Critics And Exploration Model #
 
-            # TODO 1): Update the exploration model (based off s') - done
             # TODO 2): Update the exploration critic (based off mixed_reward) - done
             # TODO 3): Update the exploitation critic (based off env_reward) - done
-            expl_model_loss = self.exploration_model.update(next_ob_no)
-            exploration_critic_loss = self.exploration_critic.update(ob_no, ac_na, next_ob_no, mixed_reward, terminal_n)
-            exploitation_critic_loss = self.exploitation_critic.update(ob_no, ac_na, next_ob_no, env_reward, terminal_n)
+            # both critics are updated together, in one pass per network
+            critic_loss = self.critics.update(
+                ob_no, ac_na, next_ob_no, np.stack([mixed_reward, env_reward]), terminal_n)
 
             # Target Networks #
             if self.num_param_updates % self.target_update_freq == 0:
                 # TODO: Update the exploitation and exploration target networks - done
-                self.exploitation_critic.update_target_network()
-                self.exploration_critic.update_target_network()
+                self.critics.update_target_network()
 
             # Logging #
-            log['Exploitation Critic Loss'] = exploitation_critic_loss['Training Loss']
-            log['Exploration Critic Loss'] = exploration_critic_loss['Training Loss']
+            log['Exploitation Critic Loss'] = critic_loss['Training Loss'][1]
+            log['Exploration Critic Loss'] = critic_loss['Training Loss'][0]
             log['Exploration Model Loss'] = expl_model_loss
 
             self.num_param_updates += 1
 
-        self.t += 1
+        # with several envs, step_envs counts the env steps
+        if offline or self.num_envs == 1:
+            self.t += 1
         return log
 
 
@@ -110,7 +138,12 @@ class ExplorationOrExploitationAgent(DQNAgent):
             At the end of this block of code, the simulator should have been
             advanced one step, and the replay buffer should contain one more transition.
             Note that self.last_obs must always point to the new latest observation.
+
+            With several envs, every env is advanced one step (see step_envs).
         """
+        if self.num_envs > 1:
+            return self.step_envs()
+
         if (not self.offline_exploitation) or (self.t <= self.num_exploration_steps):
             self.replay_buffer_idx = self.replay_buffer.store_frame(self.last_obs)
 
@@ -130,3 +163,33 @@ class ExplorationOrExploitationAgent(DQNAgent):
 
         if done:
             self.last_obs = self.env.reset()
+
+    def step_envs(self):
+        """
+            Step every env once and store one transition per env. The actions
+            of all the envs that act greedily are chosen with a single batched
+            forward pass of the critic.
+            self.t counts env steps, so it advances by num_envs here rather
+            than in train.
+        """
+        store_transitions = (not self.offline_exploitation) or (self.t <= self.num_exploration_steps)
+        if store_transitions:
+            replay_buffer_idxes = self.replay_buffer.store_batch(self.last_obs)
+
+        actions = np.array([env.action_space.sample() for env in self.envs])
+        if self.t >= self.learning_starts:
+            greedy = np.flatnonzero(np.random.random(self.num_envs) >= self.eps)
+            if len(greedy) > 0:
+                # the buffer keeps a single frame per observation, so the
+                # observations are the latest frames themselves
+                actions[greedy] = self.actor.get_actions(self.last_obs[greedy])
+
+        rewards = np.empty(self.num_envs, dtype=np.float32)
+        dones = np.empty(self.num_envs, dtype=bool)
+        for i, env in enumerate(self.envs):
+            next_obs, rewards[i], dones[i], info = env.step(actions[i])
+            self.last_obs[i] = env.reset() if dones[i] else next_obs
+
+        if store_transitions:
+            self.replay_buffer.store_effect(replay_buffer_idxes, actions, rewards, dones)
+        self.t += self.num_envs
@@ -99,3 +99,139 @@ class DQNCritic(BaseCritic):
         obs = ptu.from_numpy(obs)
         qa_values = self.q_net(obs)
         return ptu.to_numpy(qa_values)
+
+
+class MultiHeadDQNCritic(BaseCritic):
+    """
+        `num_heads` DQN critics that share their inputs but not their weights,
+        e.g. one critic per reward stream. The Q-networks of all heads are
+        stacked (see `ptu.build_ensemble_mlp`), so the online and target
+        Q-values of every head are computed in one batched pass per network.
+
+        Each head is trained on its own rewards: the loss is the sum of the
+        per-head losses, so every head gets the gradient it would get from a
+        separate DQNCritic, and Adam and gradient-value clipping act
+        elementwise, so one optimizer over the stacked weights is the same as
+        one optimizer per head.
+
+        Indexing the critic gives a view of a single head (`critic[0]`), which
+        can be used wherever a DQNCritic is expected, e.g. by ArgMaxPolicy.
+    """
+
+    def __init__(self, hparams, optimizer_spec, num_heads, **kwargs):
+        super().__init__(**kwargs)
+        self.env_name = hparams['env_name']
+        self.ob_dim = hparams['ob_dim']
+
+        if isinstance(self.ob_dim, int):
+            self.input_shape = (self.ob_dim,)
+        else:
+            self.input_shape = hparams['input_shape']
+
+        self.ac_dim = hparams['ac_dim']
+        self.double_q = hparams['double_q']
+        self.grad_norm_clipping = hparams['grad_norm_clipping']
+        self.gamma = hparams['gamma']
+        self.num_heads = num_heads
+
+        self.optimizer_spec = optimizer_spec
+        network_initializer = hparams['ensemble_q_func']
+        self.q_net = network_initializer(self.ob_dim, self.ac_dim, self.num_heads)
+        self.q_net_target = network_initializer(self.ob_dim, self.ac_dim, self.num_heads)
+        self.optimizer = self.optimizer_spec.constructor(
+            self.q_net.parameters(),
+            **self.optimizer_spec.optim_kwargs
+        )
+        self.learning_rate_scheduler = optim.lr_scheduler.LambdaLR(
+            self.optimizer,
+            self.optimizer_spec.learning_rate_schedule,
+        )
+        self.loss = nn.SmoothL1Loss(reduction='none')  # AKA Huber loss
+        self.q_net.to(ptu.device)
+        self.q_net_target.to(ptu.device)
+
+    def __len__(self):
+        return self.num_heads
+
+    def __getitem__(self, head):
+        if not -self.num_heads <= head < self.num_heads:
+            raise IndexError('critic head index out of range')
+        return DQNCriticHead(self, head % self.num_heads)
+
+    def update(self, ob_no, ac_na, next_ob_no, reward_hn, terminal_n, heads=None):
+        """
+            Update the parameters of every head, or only of `heads`.
+            arguments:
+                ob_no: shape: (batch_size, ob_dim)
+                ac_na: length: batch_size
+                next_ob_no: shape: (batch_size, ob_dim)
+                reward_hn: shape: (num_heads, batch_size), or (len(heads), batch_size).
+                    Head i (or heads[i]) is trained on reward_hn[i]
+                terminal_n: length: batch_size
+                heads: indices of the heads to train, default all of them. The
+                    other heads are left out of the loss, so they get no gradient
+            returns:
+                a dictionary whose 'Training Loss' is an array with the loss of each trained head
+        """
+        ob_no = ptu.from_numpy(ob_no)
+        ac_na = ptu.from_numpy(ac_na).to(torch.long)
+        next_ob_no = ptu.from_numpy(next_ob_no)
+        reward_hn = ptu.from_numpy(reward_hn)
+        terminal_n = ptu.from_numpy(terminal_n)
+        batch_size = ob_no.shape[0]
+        if heads is None:
+            heads = slice(None)
+
+        if self.double_q:
+            # the online values of s and s' come from a single pass
+            qa_values = self.q_net(torch.cat([ob_no, next_ob_no], dim=0))
+            qa_t_values, qa_tp1_online = qa_values[:, :batch_size], qa_values[:, batch_size:]
+        else:
+            qa_t_values = self.q_net(ob_no)
+        q_t_values = qa_t_values.gather(
+            2, ac_na.view(1, -1, 1).expand(self.num_heads, -1, 1)).squeeze(2)[heads]
+
+        with torch.no_grad():
+            qa_tp1_values = self.q_net_target(next_ob_no)
+            if self.double_q:
+                next_actions = qa_tp1_online.argmax(dim=2, keepdim=True)
+                q_tp1 = qa_tp1_values.gather(2, next_actions).squeeze(2)
+            else:
+                q_tp1, _ = qa_tp1_values.max(dim=2)
+            target = reward_hn + self.gamma * q_tp1[heads] * (1 - terminal_n)
+
+        head_losses = self.loss(q_t_values, target).mean(dim=1)
+        loss = head_losses.sum()
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        utils.clip_grad_value_(self.q_net.parameters(), self.grad_norm_clipping)
+        self.optimizer.step()
+
+        self.learning_rate_scheduler.step()
+
+        return {'Training Loss': ptu.to_numpy(head_losses)}
+
+    def update_target_network(self):
+        for target_param, param in zip(
+                self.q_net_target.parameters(), self.q_net.parameters()
+        ):
+            target_param.data.copy_(param.data)
+
+    def qa_values(self, obs):
+        """Q-values of every head, shape (num_heads, batch_size, ac_dim)"""
+        obs = ptu.from_numpy(obs)
+        with torch.no_grad():
+            qa_values = self.q_net(obs)
+        return ptu.to_numpy(qa_values)
+
+
+class DQNCriticHead(object):
+    """A view of a single head of a MultiHeadDQNCritic."""
+
+    def __init__(self, critic, head):
+        self.critic = critic
+        self.head = head
+
+    def qa_values(self, obs):
+        return self.critic.qa_values(obs)[self.head]
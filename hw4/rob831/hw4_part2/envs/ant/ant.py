@@ -15,6 +15,7 @@
 import numpy as np
 from gym import utils
 from gym.envs.mujoco import mujoco_env
+from rob831.hw4_part2.envs import reward_fns
 
 _FLOAT_EPS = np.finfo(np.float64).eps
 _EPS4 = _FLOAT_EPS * 4.0
@@ -254,16 +255,32 @@ class AntEnv(mujoco_env.MujocoEnv, utils.EzPickle):
     # --------------------------------
 
     def get_env_state(self):
-        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy())
+        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy(),
+                    rng=self.np_random.bit_generator.state)
 
     def set_env_state(self, state):
         qp = state['qp'].copy()
         qv = state['qv'].copy()
-        self.do_reset(qp, qv)
+        if 'rng' in state:
+            self.np_random.bit_generator.state = state['rng']
+        return self.do_reset(qp, qv)
 
     # --------------------------------
     # utility functions
     # --------------------------------
 
     def get_env_infos(self):
-        return dict(state=self.get_env_state())
\ No newline at end of file
+        return dict(state=self.get_env_state())
+
+
+reward_fns.register_reward_fn(
+    AntEnv,
+    reward_fns.ant_reward_np,
+    reward_fns.ant_reward_torch,
+    get_params=lambda env: dict(
+        healthy_reward=env._healthy_reward,
+        min_z=env.min_z,
+        max_z=env.max_z,
+        terminate_when_unhealthy=env._terminate_when_unhealthy,
+    ),
+)
@@ -1,6 +1,7 @@
 import numpy as np
 from gym import utils
 from gym.envs.mujoco import mujoco_env
+from rob831.hw4_part2.envs import reward_fns
 
 class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
 
@@ -130,3 +131,18 @@ class HalfCheetahEnv(mujoco_env.MujocoEnv, utils.EzPickle):
 
         #return
         return self._get_obs()
+
+    # --------------------------------
+    # get and set states
+    # --------------------------------
+
+    def get_env_state(self):
+        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy(),
+                    rng=self.np_random.bit_generator.state)
+
+    def set_env_state(self, state):
+        self.np_random.bit_generator.state = state['rng']
+        return self.do_reset(state['qp'].copy(), state['qv'].copy())
+
+
+reward_fns.register_reward_fn(HalfCheetahEnv, reward_fns.cheetah_reward_np, reward_fns.cheetah_reward_torch)
@@ -1,12 +1,15 @@
 import gym
 import numpy as np
 from gym import spaces
+from rob831.hw4_part2.envs import reward_fns
+from rob831.hw4_part2.envs import rasterizer
 
 class Obstacles(gym.Env):
     def __init__(self, start=[-0.5, 0.75], end=[0.7, -0.8], random_starts=True):
 
-        import matplotlib.pyplot as plt #inside, so doesnt get imported when not using this env
-        self.plt = plt
+        self._rasterizer = None
+        self._background = None
+        self._frame = None
 
         self.action_dim = self.ac_dim = 2
         self.observation_dim = self.obs_dim = 4
@@ -36,9 +39,16 @@ class Obstacles(gym.Env):
         self.obstacles.append([0.6, -0.1, 0.12, 0.4])
         self.obstacles.append([-0.1, 0.2, 0.15, 0.4])
         self.obstacles.append([0.1, -0.7, 0.3, 0.15])
+        # the same rectangles as (x min, x max, y min, y max) rows, for batched checks
+        obstacles = np.array(self.obstacles)
+        self.obstacle_bounds = np.stack([
+            obstacles[:, 0],
+            obstacles[:, 0] + obstacles[:, 2],
+            obstacles[:, 1] - obstacles[:, 3],
+            obstacles[:, 1],
+        ], axis=1)
 
         self.eps = 0.1
-        self.fig = self.plt.figure()
 
     def seed(self, seed):
         np.random.seed(seed)
@@ -46,13 +56,23 @@ class Obstacles(gym.Env):
     #########################################
 
     def pick_start_pos(self):
-        if self.random_starts:
-            temp = np.random.uniform([self.boundary_min, self.boundary_min+1.25], [self.boundary_max-0.4, self.boundary_max], (self.action_dim,))
-            if not self.is_valid(temp[None, :]):
-                temp = self.pick_start_pos()
-        else:
-            temp = self.start
-        return temp
+        return self.pick_start_positions(1)[0]
+
+    def pick_start_positions(self, num_positions, candidates_per_draw=16):
+        """Sample valid start positions, by rejection sampling candidates in bulk"""
+        if not self.random_starts:
+            return np.tile(self.start, (num_positions, 1))
+        positions = []
+        num_valid = 0
+        while num_valid < num_positions:
+            candidates = np.random.uniform(
+                [self.boundary_min, self.boundary_min+1.25],
+                [self.boundary_max-0.4, self.boundary_max],
+                (max(candidates_per_draw, 2 * (num_positions - num_valid)), self.action_dim))
+            valid = candidates[self.is_valid(candidates)]
+            positions.append(valid)
+            num_valid += len(valid)
+        return np.concatenate(positions)[:num_positions]
 
     #########################################
 
@@ -72,11 +92,25 @@ class Obstacles(gym.Env):
 
         #clear
         self.counter = 0
-        self.plt.clf()
+        self._frame = None
 
         #return
         return self._get_obs()
 
+    # --------------------------------
+    # get and set states
+    # --------------------------------
+
+    def get_env_state(self):
+        # the point has no velocity, and stepping draws no random numbers, so
+        # the caller's global np.random state is left alone
+        return dict(qp=self.current.copy(), goal=self.end.copy(), counter=self.counter)
+
+    def set_env_state(self, state):
+        ob = self.do_reset(state['qp'], state['goal'])
+        self.counter = state['counter']
+        return ob
+
     #########################################
 
     def _get_obs(self):
@@ -143,7 +177,7 @@ class Obstacles(gym.Env):
 
         # move, only if its a valid move (else, keep it there because it cant move)
         temp = self.current + action
-        if self.is_valid(temp[None, :]):
+        if self.is_valid(temp[None, :])[0]:
             self.current = temp
 
         ob = self._get_obs()
@@ -155,73 +189,81 @@ class Obstacles(gym.Env):
 
         return ob, reward, done, env_info
 
+    def step_batch(self, observations, actions):
+        """
+        Take a step from each of a batch of observations, without changing the env,
+        e.g. for vectorized rollouts or to check model predictions against the true dynamics.
+
+        Args:
+            observations: (batchsize, obs_dim)
+            actions: (batchsize, ac_dim)
+
+        Return:
+            next_observations: (batchsize, obs_dim)
+            rewards: (batchsize,)
+            dones: (batchsize,)
+        """
+        actions = np.clip(actions, -1, 1) / 10.
+        next_observations = np.array(observations, dtype=np.float64)
+        temp = next_observations[:, :2] + actions
+        valid = self.is_valid(temp)
+        next_observations[valid, :2] = temp[valid]
+        rewards, dones = reward_fns.obstacles_reward_np(
+            next_observations, actions, eps=self.eps, boundary_min=self.boundary_min, boundary_max=self.boundary_max)
+        return next_observations, rewards, dones
+
     ########################################
     # utility functions
     ########################################
 
-    def render(self, mode=None):
-
+    def _draw_background(self):
+        margin = 0.05
+        self._rasterizer = rasterizer.Rasterizer(
+            (self.boundary_min - margin, self.boundary_max + margin),
+            (self.boundary_min - margin, self.boundary_max + margin))
+        self._background = self._rasterizer.new_image()
         # boundaries
-        self.plt.plot([self.boundary_min, self.boundary_min], [self.boundary_min, self.boundary_max], 'k')
-        self.plt.plot([self.boundary_max, self.boundary_max], [self.boundary_min, self.boundary_max], 'k')
-        self.plt.plot([self.boundary_min, self.boundary_max], [self.boundary_min, self.boundary_min], 'k')
-        self.plt.plot([self.boundary_min, self.boundary_max], [self.boundary_max, self.boundary_max], 'k')
-
+        self._rasterizer.outline_rect(self._background, self.boundary_min, self.boundary_max,
+                                      self.boundary_min, self.boundary_max, rasterizer.BLACK)
         # obstacles
-        for obstacle in self.obstacles:
-            tl_x = obstacle[0]
-            tl_y = obstacle[1]
-            tr_x = tl_x + obstacle[2]
-            tr_y = tl_y
-            bl_x = tl_x
-            bl_y = tl_y - obstacle[3]
-            br_x = tr_x
-            br_y = bl_y
-            self.plt.plot([bl_x, br_x], [bl_y, br_y], 'r')
-            self.plt.plot([tl_x, tr_x], [tl_y, tr_y], 'r')
-            self.plt.plot([bl_x, bl_x], [bl_y, tl_y], 'r')
-            self.plt.plot([br_x, br_x], [br_y, tr_y], 'r')
-
-        # current and end
-        self.plt.plot(self.end[0], self.end[1], 'go')
-        self.plt.plot(self.current[0], self.current[1], 'ko')
-        self.plt.pause(0.1)
-
-        img = np.frombuffer(self.fig.canvas.tostring_rgb(), dtype=np.uint8)
-        img = img.reshape(self.fig.canvas.get_width_height()[::-1] + (3,))
+        for x_min, x_max, y_min, y_max in self.obstacle_bounds:
+            self._rasterizer.outline_rect(self._background, x_min, x_max, y_min, y_max, rasterizer.RED)
+
+    def render(self, mode=None):
+        if self._background is None:
+            self._draw_background()
+        # the positions of the agent accumulate over the episode, the goal is drawn on top
+        if self._frame is None:
+            self._frame = self._background.copy()
+        self._rasterizer.stamp_disk(self._frame, self.current[0], self.current[1], rasterizer.BLACK)
+        img = self._frame.copy()
+        self._rasterizer.stamp_disk(img, self.end[0], self.end[1], rasterizer.GREEN)
         return img
 
     def is_valid(self, dat):
+        """
+        Args:
+            dat: (batchsize, 2) positions
 
+        Return:
+            (batchsize,) whether each position is in bounds and outside of every obstacle
+        """
         oob_mask = np.any(self.oob(dat), axis=1)
 
-        # old way
-        self.a = self.boundary_min + (self.boundary_max-self.boundary_min)/3.0
-        self.b = self.boundary_min + 2*(self.boundary_max-self.boundary_min)/3.0
-        data_mask = (dat[:, 0] < self.a) | (dat[:, 0] > self.b) | \
-                    (dat[:, 1] < self.a) | (dat[:, 1] > self.b)
-
-        #
-        in_obstacle = False
-        for obstacle in self.obstacles:
-            tl_x = obstacle[0]
-            tl_y = obstacle[1]
-            tr_x = tl_x + obstacle[2]
-            tr_y = tl_y
-            bl_x = tl_x
-            bl_y = tl_y - obstacle[3]
-            br_x = tr_x
-            br_y = bl_y
-
-            if dat[:, 0]>tl_x and dat[:, 0]<tr_x and dat[:, 1]>bl_y and dat[:, 1]<tl_y:
-                in_obstacle = True
-                return False
-
-        # not in obstacle, so return whether or not its in bounds
-        return (not oob_mask)
+        x = dat[:, 0, None]
+        y = dat[:, 1, None]
+        x_min, x_max, y_min, y_max = self.obstacle_bounds.T
+        in_obstacle = np.any((x > x_min) & (x < x_max) & (y > y_min) & (y < y_max), axis=1)
 
+        return ~(oob_mask | in_obstacle)
 
     def oob(self, x):
         return (x <= self.boundary_min) | (x >= self.boundary_max)
 
 
+reward_fns.register_reward_fn(
+    Obstacles,
+    reward_fns.obstacles_reward_np,
+    reward_fns.obstacles_reward_torch,
+    get_params=lambda env: dict(eps=env.eps, boundary_min=env.boundary_min, boundary_max=env.boundary_max),
+)
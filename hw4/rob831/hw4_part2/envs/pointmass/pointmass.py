@@ -1,8 +1,14 @@
-import networkx as nx
+import importlib.util
+
+import scipy.sparse
 import scipy.sparse.csgraph
 import numpy as np
 import gym
-import pickle
+
+from rob831.hw4_part2.envs import rasterizer
+
+# matplotlib is optional, it is only used to plot the trajectory of the last episode
+HAS_MATPLOTLIB = importlib.util.find_spec('matplotlib') is not None
 
 WALLS = {
     'Small':
@@ -260,6 +266,7 @@ class Pointmass(gym.Env):
   def __init__(self,
                difficulty=0,
                dense_reward=False,
+               headless=False,
                ):
     """Initialize the point environment.
 
@@ -268,12 +275,14 @@ class Pointmass(gym.Env):
       resize_factor: (int) Scale the map by this factor.
       action_noise: (float) Standard deviation of noise to add to actions. Use 0
         to add no noise.
+      headless: (bool) Never plot the trajectory of the last episode on reset,
+        so matplotlib is never used.
     """
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    self.plt = plt
-    self.fig = self.plt.figure()
+    self.headless = headless
+    self._plt = None
+    self._rasterizer = None
+    self._background = None
+    self._frame = None
     
     self.action_dim = self.ac_dim = 2
     self.observation_dim = self.obs_dim = 2
@@ -314,10 +323,12 @@ class Pointmass(gym.Env):
     else:
       self._walls = WALLS[walls]
     (height, width) = self._walls.shape
-    self._apsp = self._compute_apsp(self._walls)
-
     self._height = height
     self._width = width
+    self._index_free_cells(self._walls)
+    # shortest path distances to each goal cell, computed on first use
+    self._distance_maps = {}
+
     self.action_space = gym.spaces.Discrete(5)
     self.observation_space = gym.spaces.Box(
         low=np.array([0,0]),
@@ -339,13 +350,25 @@ class Pointmass(gym.Env):
   def seed(self, seed):
     np.random.seed(seed)
     
+  @property
+  def plt(self):
+    # matplotlib is only imported once something is plotted
+    if self._plt is None:
+      import matplotlib
+      matplotlib.use('Agg')
+      import matplotlib.pyplot as plt
+      self._plt = plt
+      plt.figure()
+    return self._plt
+
   def reset(self, seed=None):
     if seed: self.seed(seed)
         
-    if len(self.obs_vec) > 0:
+    if (len(self.obs_vec) > 0 and not self.headless and HAS_MATPLOTLIB
+        and hasattr(self, 'traj_filepath')):
       self.last_trajectory = self.plot_trajectory()
+    self._frame = None
     
-    self.plt.clf()
     self.timesteps_left = self.max_episode_steps
     
     self.obs_vec = [self._normalize_obs(self.fixed_start.copy())]
@@ -361,34 +384,85 @@ class Pointmass(gym.Env):
     
     Note: This distance is *not* used for training."""
     (i1, j1) = self._discretize_state(obs.copy())
-    (i2, j2) = self._discretize_state(goal.copy())
-    return self._apsp[i1, j1, i2, j2]
+    return self._get_distance_map(goal)[i1, j1]
+
+  def _get_distance_map(self, goal):
+    """Shortest path distance from every cell to the cell of `goal`.
+
+    Walls and cells that can't reach the goal are at distance inf."""
+    goal_cell = self._discretize_state(np.asarray(goal, dtype=np.float64))
+    if goal_cell not in self._distance_maps:
+      distance_map = np.full((self._height, self._width), np.inf)
+      goal_index = self._free_cell_index[goal_cell]
+      if goal_index >= 0:
+        # the graph is undirected, so the distances from the goal are the
+        # distances to the goal
+        distances = scipy.sparse.csgraph.shortest_path(
+            self._graph, directed=False, unweighted=True, indices=goal_index)
+        distance_map[self._free_cells[:, 0], self._free_cells[:, 1]] = distances
+      self._distance_maps[goal_cell] = distance_map
+    return self._distance_maps[goal_cell]
 
   def simulate_step(self, state, action):
+    # a single state is stepped with Python floats, which is faster than
+    # NumPy on arrays of 2 elements and gives the same results
     num_substeps = 10
     dt = 1.0 / num_substeps
-    num_axis = len(action)
-    for _ in np.linspace(0, 1, num_substeps):
-      for axis in range(num_axis):
-        new_state = state.copy()
+    state = [float(x) for x in state]
+    action = [float(a) for a in action]
+    for _ in range(num_substeps):
+      for axis in range(len(action)):
+        new_state = list(state)
         new_state[axis] += dt * action[axis]
 
-        if not self._is_blocked(new_state):
+        if not self._is_blocked_xy(*new_state):
           state = new_state
-    return state
+    return np.array(state)
+
+  def simulate_step_batch(self, states, actions):
+    """simulate_step for a batch of (unnormalized) states and actions, of
+    shape (batch_size, 2). The substeps of every state are taken together."""
+    num_substeps = 10
+    dt = 1.0 / num_substeps
+    num_axis = actions.shape[1]
+    states = np.array(states, dtype=np.float64)
+    for _ in range(num_substeps):
+      for axis in range(num_axis):
+        new_states = states.copy()
+        new_states[:, axis] += dt * actions[:, axis]
+        moved = ~self._is_blocked_batch(new_states)
+        states[moved] = new_states[moved]
+    return states
 
   def get_optimal_action(self, state):
-    state = self._unnormalize_obs(state)
-    best_action = 0
-    best_dist = np.inf
-    for i in range(self.num_actions):
-      action = np.array(ACT_DICT[i])
-      s_prime = self.simulate_step(state, action)
-      dist = self._get_distance(s_prime, self.fixed_goal)
-      if dist < best_dist:
-        best_dist = dist
-        best_action = i
-    return best_action
+    return int(self.get_optimal_actions(state[None])[0])
+
+  def get_optimal_actions(self, states, goals=None):
+    """The action that gets each of a batch of (normalized) states closest
+    to its goal, with all the candidate actions simulated as one batch.
+
+    Args:
+      states: (batch_size, 2) normalized observations.
+      goals: (batch_size, 2) unnormalized goal positions, or None to use
+        self.fixed_goal for every state."""
+    states = states * [float(self._height), float(self._width)]
+    batch_size = len(states)
+    actions = np.array([ACT_DICT[i] for i in range(self.num_actions)])
+    s_primes = self.simulate_step_batch(
+        np.repeat(states, self.num_actions, axis=0), np.tile(actions, (batch_size, 1)))
+    (i, j) = self._discretize_states(s_primes)
+
+    if goals is None:
+      dists = self._get_distance_map(self.fixed_goal)[i, j]
+    else:
+      goal_cells = np.stack(self._discretize_states(np.asarray(goals, dtype=np.float64)), axis=1)
+      goal_cells = np.repeat(goal_cells, self.num_actions, axis=0)
+      dists = np.empty(len(s_primes))
+      for goal_cell in np.unique(goal_cells, axis=0):
+        same_goal = np.all(goal_cells == goal_cell, axis=1)
+        dists[same_goal] = self._get_distance_map(goal_cell + 0.5)[i[same_goal], j[same_goal]]
+    # the first of the closest actions, or 0 if the goal can't be reached
+    return np.argmin(dists.reshape(batch_size, self.num_actions), axis=1)
 
   def _discretize_state(self, state, resolution=1.0):
     (i, j) = np.floor(resolution * state).astype(np.int32)
@@ -399,6 +473,12 @@ class Pointmass(gym.Env):
       j -= 1
     return (i, j)
 
+  def _discretize_states(self, states):
+    """_discretize_state for a batch of states, returned as (rows, cols)"""
+    cells = np.floor(states).astype(np.int32)
+    np.minimum(cells, [self._height - 1, self._width - 1], out=cells)
+    return cells[:, 0], cells[:, 1]
+
   def _normalize_obs(self, obs):
     return np.array([
       obs[0] / float(self._height),
@@ -412,10 +492,20 @@ class Pointmass(gym.Env):
     ])
   
   def _is_blocked(self, state):
-    if not self.observation_space.contains(state):
+    return bool(self._is_blocked_batch(np.asarray(state, dtype=np.float64)[None])[0])
+
+  def _is_blocked_xy(self, x, y):
+    if not (0 <= x <= self._height and 0 <= y <= self._width):
       return True
-    (i, j) = self._discretize_state(state)
-    return (self._walls[i, j] == 1)
+    return self._walls[min(int(x), self._height - 1), min(int(y), self._width - 1)] == 1
+
+  def _is_blocked_batch(self, states):
+    """Whether each state is outside of the observation space or in a wall"""
+    in_bounds = np.all((states >= 0) & (states <= [self._height, self._width]), axis=1)
+    blocked = ~in_bounds
+    (i, j) = self._discretize_states(states[in_bounds])
+    blocked[in_bounds] = self._walls[i, j] == 1
+    return blocked
 
   def step(self, action):
     self.timesteps_left -= 1
@@ -439,6 +529,25 @@ class Pointmass(gym.Env):
     
     return ns, reward, done, {}
 
+  def step_batch(self, states, actions):
+    """Take the step of a batch of (unnormalized) states with the given
+    discrete actions, without changing the env.
+
+    Returns:
+      (next_states, rewards, reached), where `reached` is whether the goal was
+      reached. Episode time limits are left to the caller."""
+    actions = np.array([ACT_DICT[a] for a in range(self.num_actions)])[actions]
+    actions = np.random.normal(actions, self.action_noise)
+    next_states = self.simulate_step_batch(states, actions)
+
+    dists = np.linalg.norm(next_states - self.fixed_goal, axis=1)
+    reached = dists < self.epsilon
+    if self.dense_reward:
+      rewards = -dists
+    else:
+      rewards = reached.astype(np.int64) - 1
+    return next_states, rewards, reached
+
   @property
   def walls(self):
     return self._walls
@@ -447,45 +556,53 @@ class Pointmass(gym.Env):
   def goal(self):
     return self._normalize_obs(self.fixed_goal.copy())
 
-  def _compute_apsp(self, walls):
+  def _index_free_cells(self, walls):
+    """Index the free cells, and connect each of them to its (up to 8)
+    free neighbours in a sparse graph."""
     (height, width) = walls.shape
-    g = nx.Graph()
-    # Add all the nodes
-    for i in range(height):
-      for j in range(width):
-        if walls[i, j] == 0:
-          g.add_node((i, j))
-
-    # Add all the edges
-    for i in range(height):
-      for j in range(width):
-        for di in [-1, 0, 1]:
-          for dj in [-1, 0, 1]:
-            if di == dj == 0: continue  # Don't add self loops
-            if i + di < 0 or i + di > height - 1: continue  # No cell here
-            if j + dj < 0 or j + dj > width - 1: continue  # No cell here
-            if walls[i, j] == 1: continue  # Don't add edges to walls
-            if walls[i + di, j + dj] == 1: continue  # Don't add edges to walls
-            g.add_edge((i, j), (i + di, j + dj))
-
-    # dist[i, j, k, l] is path from (i, j) -> (k, l)
-    dist = np.full((height, width, height, width), np.inf)
-    for ((i1, j1), dist_dict) in nx.shortest_path_length(g):
-      for ((i2, j2), d) in dist_dict.items():
-        dist[i1, j1, i2, j2] = d
-
-    return dist
+    # (num_free_cells, 2) array of the (i, j) of every free cell
+    self._free_cells = np.argwhere(walls == 0)
+    # index of each cell in self._free_cells, -1 for walls
+    self._free_cell_index = np.full((height, width), -1, dtype=np.int64)
+    self._free_cell_index[self._free_cells[:, 0], self._free_cells[:, 1]] = np.arange(len(self._free_cells))
+
+    rows, cols = [], []
+    for di in [-1, 0, 1]:
+      for dj in [-1, 0, 1]:
+        if di == dj == 0: continue  # Don't add self loops
+        neighbours = self._free_cells + [di, dj]
+        inside = ((neighbours[:, 0] >= 0) & (neighbours[:, 0] < height)
+                  & (neighbours[:, 1] >= 0) & (neighbours[:, 1] < width))
+        neighbour_index = np.full(len(neighbours), -1)
+        neighbour_index[inside] = self._free_cell_index[neighbours[inside, 0], neighbours[inside, 1]]
+        connected = neighbour_index >= 0  # Don't add edges to walls
+        rows.append(np.flatnonzero(connected))
+        cols.append(neighbour_index[connected])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    self._graph = scipy.sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(self._free_cells),) * 2)
+
+  def _draw_background(self):
+    self._rasterizer = rasterizer.Rasterizer((0, 1), (0, 1))
+    self._background = self._rasterizer.new_image()
+    # the wall cell (i, j) covers [i, i+1] x [j, j+1], normalized like the observations
+    for (i, j) in zip(*np.where(self._walls)):
+      self._rasterizer.fill_rect(
+          self._background,
+          i / float(self._height), (i + 1) / float(self._height),
+          j / float(self._width), (j + 1) / float(self._width),
+          rasterizer.GREY)
 
   def render(self, mode=None):
-    self.plot_walls()
-
-    # current and end
-    self.plt.plot(self.fixed_goal[0], self.fixed_goal[1], 'go')
-    self.plt.plot(self.state[0], self.state[1], 'ko')
-    self.plt.pause(0.1)
-
-    img = np.frombuffer(self.fig.canvas.tostring_rgb(), dtype=np.uint8)
-    img = img.reshape(self.fig.canvas.get_width_height()[::-1] + (3,))
+    if self._background is None:
+      self._draw_background()
+    # the positions of the agent accumulate over the episode, the goal is drawn on top
+    if self._frame is None:
+      self._frame = self._background.copy()
+    current, goal = self._normalize_obs(self.state), self.goal
+    self._rasterizer.stamp_disk(self._frame, current[0], current[1], rasterizer.BLACK)
+    img = self._frame.copy()
+    self._rasterizer.stamp_disk(img, goal[0], goal[1], rasterizer.GREEN)
     return img
 
   def plot_trajectory(self):
@@ -525,67 +642,15 @@ class Pointmass(gym.Env):
     return self._normalize_obs(s)
   
   def _sample_empty_state(self):
-    candidate_states = np.where(self._walls == 0)
-    num_candidate_states = len(candidate_states[0])
+    num_candidate_states = len(self._free_cells)
     state_index = np.random.choice(num_candidate_states)
-    state = np.array([candidate_states[0][state_index],
-                      candidate_states[1][state_index]],
-                     dtype=np.float)
+    state = self._free_cells[state_index].astype(np.float64)
     state += np.random.uniform(size=2)
     assert not self._is_blocked(state)
     return state
 
-def refresh_path():
-  path = dict()
-  path['observations'] = []
-  path['actions'] = []
-  path['next_observations'] = []
-  path['terminals'] = []
-  path['rewards'] = []
-  return path
-
-if __name__ == '__main__':
-  env = Pointmass(difficulty=0, dense_reward=False)
-  num_samples = 50000
-  total_samples = 0
-  path = refresh_path()
-  all_paths = []
-  num_positive_rewards = 0
-  
-  while total_samples < num_samples:
-    path = refresh_path()
-    start_state = env._sample_empty_state()
-    bern = (np.random.rand() > 0.5)
-    if bern:
-      goal_state = env._sample_empty_state()
-    else:
-      goal_state = env.fixed_goal
-
-    print ('Start: ', start_state, ' Goal state: ', goal_state, total_samples)
-    # curr_state = start_state
-    curr_state = env.reset(start_state)
-    done = False
-    for i in range(env.max_episode_steps):
-      action = env.get_optimal_action(goal_state)
-      temp_bern = (np.random.rand() < 0.2)
-      if temp_bern:
-        action = np.random.randint(5)
-      
-      next_state, reward, done, _ = env.step(action)
-      if reward >= 0:
-        num_positive_rewards += 1
-      path['observations'].append(curr_state)
-      path['actions'].append(action)
-      path['next_observations'].append(next_state)
-      path['terminals'].append(done)
-      path['rewards'].append(reward)
-
-      if done == True:
-        total_samples += i
-        break
-
-    all_paths.append(path)
-    print ('Num Positive Rewards: ', num_positive_rewards)
-
-  with open('buffer_debug_final' + str(env.difficulty) +'.pkl', 'wb') as f:
-    pickle.dump(all_paths, f)
+  def _sample_empty_states(self, num_states):
+    state_indices = np.random.choice(len(self._free_cells), size=num_states)
+    states = self._free_cells[state_indices].astype(np.float64)
+    states += np.random.uniform(size=(num_states, 2))
+    return states
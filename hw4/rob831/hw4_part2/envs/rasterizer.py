@@ -0,0 +1,77 @@
+import numpy as np
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
+RED = (255, 0, 0)
+GREEN = (0, 128, 0)
+
+
+class Rasterizer(object):
+    """
+        Draws 2D scenes into RGB images with numpy, for rendering the simple
+        2D envs without matplotlib.
+
+        The static part of a scene (walls, obstacles) is drawn once into a
+        background image with `fill_rect`/`outline_rect`; each frame is then a
+        copy of that background with the moving parts stamped on with
+        `stamp_disk`.
+
+        arguments:
+            xlim, ylim: (min, max) of the region of the plane shown in the image
+            height, width: size of the image, in pixels
+    """
+    def __init__(self, xlim, ylim, height=480, width=480):
+        self.xlim = xlim
+        self.ylim = ylim
+        self.height = height
+        self.width = width
+        self._disks = {}
+
+    def new_image(self, color=WHITE):
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[...] = color
+        return image
+
+    def to_pixels(self, x, y):
+        """Pixel column and row of the point(s) (x, y); y points up, rows go down"""
+        col = (np.asarray(x) - self.xlim[0]) / (self.xlim[1] - self.xlim[0]) * self.width
+        row = (self.ylim[1] - np.asarray(y)) / (self.ylim[1] - self.ylim[0]) * self.height
+        return np.floor(col).astype(int), np.floor(row).astype(int)
+
+    def _pixel_box(self, x_min, x_max, y_min, y_max):
+        """Half-open pixel ranges [row_min, row_max), [col_min, col_max) covered by a box"""
+        col_min = (x_min - self.xlim[0]) / (self.xlim[1] - self.xlim[0]) * self.width
+        col_max = (x_max - self.xlim[0]) / (self.xlim[1] - self.xlim[0]) * self.width
+        row_min = (self.ylim[1] - y_max) / (self.ylim[1] - self.ylim[0]) * self.height
+        row_max = (self.ylim[1] - y_min) / (self.ylim[1] - self.ylim[0]) * self.height
+        row_min, row_max = np.clip(np.rint([row_min, row_max]).astype(int), 0, self.height)
+        col_min, col_max = np.clip(np.rint([col_min, col_max]).astype(int), 0, self.width)
+        return row_min, row_max, col_min, col_max
+
+    def fill_rect(self, image, x_min, x_max, y_min, y_max, color):
+        row_min, row_max, col_min, col_max = self._pixel_box(x_min, x_max, y_min, y_max)
+        image[row_min:row_max, col_min:col_max] = color
+
+    def outline_rect(self, image, x_min, x_max, y_min, y_max, color, thickness=2):
+        row_min, row_max, col_min, col_max = self._pixel_box(x_min, x_max, y_min, y_max)
+        image[row_min:row_min + thickness, col_min:col_max] = color
+        image[max(row_max - thickness, row_min):row_max, col_min:col_max] = color
+        image[row_min:row_max, col_min:col_min + thickness] = color
+        image[row_min:row_max, max(col_max - thickness, col_min):col_max] = color
+
+    def _disk_offsets(self, radius):
+        if radius not in self._disks:
+            rows, cols = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+            inside = rows ** 2 + cols ** 2 <= radius ** 2
+            self._disks[radius] = (rows[inside], cols[inside])
+        return self._disks[radius]
+
+    def stamp_disk(self, image, x, y, color, radius=6):
+        """Draw a disk of `radius` pixels centered at (x, y), clipped to the image"""
+        col, row = self.to_pixels(x, y)
+        rows, cols = self._disk_offsets(radius)
+        rows = rows + row
+        cols = cols + col
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        image[rows[inside], cols[inside]] = color
@@ -2,6 +2,7 @@ import numpy as np
 from gym import utils
 from gym.envs.mujoco import mujoco_env
 import os
+from rob831.hw4_part2.envs import reward_fns
 
 class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
     def __init__(self):
@@ -122,4 +123,20 @@ class Reacher7DOFEnv(mujoco_env.MujocoEnv, utils.EzPickle):
         self.sim.forward()
 
         #return
-        return self._get_obs()
\ No newline at end of file
+        return self._get_obs()
+
+    # --------------------------------
+    # get and set states
+    # --------------------------------
+
+    def get_env_state(self):
+        return dict(qp=self.data.qpos.copy(), qv=self.data.qvel.copy(),
+                    goal=self.model.site_pos[self.target_sid].copy(),
+                    rng=self.np_random.bit_generator.state)
+
+    def set_env_state(self, state):
+        self.np_random.bit_generator.state = state['rng']
+        return self.do_reset(state['qp'].copy(), state['qv'].copy(), state['goal'])
+
+
+reward_fns.register_reward_fn(Reacher7DOFEnv, reward_fns.reacher_reward_np, reward_fns.reacher_reward_torch)
@@ -66,6 +66,18 @@ class RNDModel(nn.Module, BaseExplorationModel):
     def update(self, ob_no):
         # <TODO>: Update f_hat using ob_no - done
         # Hint: Take the mean prediction error across the batch
+        _, loss = self.forward_and_update(ob_no)
+        return loss
+
+    def forward_and_update(self, ob_no):
+        """
+            Get the prediction error for ob_no and update f_hat on it, with a
+            single forward pass. The error is the one before the update, i.e.
+            the same as forward_np(ob_no) followed by update(ob_no).
+
+            returns:
+                the prediction error of each observation, and the loss
+        """
         ob_no = ptu.from_numpy(ob_no)
 
         error = self.forward(ob_no)
@@ -75,4 +87,4 @@ class RNDModel(nn.Module, BaseExplorationModel):
         loss.backward()
         self.optimizer.step()
 
-        return ptu.to_numpy(loss)
+        return ptu.to_numpy(error), ptu.to_numpy(loss)
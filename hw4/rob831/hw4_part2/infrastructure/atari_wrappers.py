@@ -98,8 +98,9 @@ class MaxAndSkipEnv(gym.Wrapper):
     def __init__(self, env, skip=4):
         """Return only every `skip`-th frame"""
         gym.Wrapper.__init__(self, env)
-        # most recent raw observations (for max pooling across time steps)
-        self._obs_buffer = np.zeros((2,)+env.observation_space.shape, dtype=np.uint8)
+        # most recent raw observations (for max pooling across time steps).
+        # the env returns a new array every step, so keeping references is enough
+        self._obs_buffer = [np.zeros(env.observation_space.shape, dtype=np.uint8)] * 2
         self._skip       = skip
 
     def step(self, action):
@@ -115,7 +116,7 @@ class MaxAndSkipEnv(gym.Wrapper):
                 break
         # Note that the observation on the done=True frame
         # doesn't matter
-        max_frame = self._obs_buffer.max(axis=0)
+        max_frame = np.maximum(self._obs_buffer[0], self._obs_buffer[1])
 
         return max_frame, total_reward, done, info
 
@@ -133,17 +134,69 @@ def _process_frame84(frame):
     return x_t.astype(np.uint8)
 
 
+class FrameProcessor84(object):
+    """
+        The preprocessing of _process_frame84 for `num_frames` frames at once,
+        e.g. the frames of `num_frames` envs, staying in uint8 throughout:
+
+        - the grayscale conversion is a single cv2.cvtColor call on all the
+          frames stacked on top of each other, which uses the same weights as
+          _process_frame84 in 14-bit fixed point
+        - the resize to 110x84 and the crop of rows 18:102 are fused into a
+          single cv2.remap call on the stacked frames, which only computes the
+          84x84 pixels that are kept, and writes them into a preallocated array
+
+        The result can differ from _process_frame84 by a few gray levels at
+        sharp edges, since the grayscale image is rounded to uint8 before
+        resizing and the interpolation weights are in fixed point (and by one
+        gray level elsewhere, since the result is rounded instead of truncated).
+    """
+    def __init__(self, num_frames=1):
+        import cv2
+        self._cv2 = cv2
+        self.num_frames = num_frames
+        self._gray = np.empty((num_frames * 210, 160), dtype=np.uint8)
+
+        # source coordinates of each output pixel, with the pixel-center
+        # alignment of cv2.resize; the frames are 210 rows apart
+        scale_x, scale_y = 160 / 84., 210 / 110.
+        map_x = (np.arange(84, dtype=np.float32) + 0.5) * scale_x - 0.5
+        map_y = (np.arange(18, 102, dtype=np.float32) + 0.5) * scale_y - 0.5
+        map_y = (map_y[None] + 210 * np.arange(num_frames, dtype=np.float32)[:, None]).reshape(-1)
+        map_x, map_y = np.meshgrid(map_x, map_y)
+        self._map1, self._map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def __call__(self, frames, out=None):
+        """
+            arguments:
+                frames: uint8 array of shape (num_frames, 210, 160, 3)
+                out: uint8 array of shape (num_frames, 84, 84, 1) to write the
+                    processed frames into, or None to allocate a new one
+
+            returns:
+                the processed frames, of shape (num_frames, 84, 84, 1)
+        """
+        cv2 = self._cv2
+        if out is None:
+            out = np.empty((self.num_frames, 84, 84, 1), dtype=np.uint8)
+        cv2.cvtColor(np.reshape(frames, [-1, 160, 3]), cv2.COLOR_RGB2GRAY, dst=self._gray)
+        cv2.remap(self._gray, self._map1, self._map2, cv2.INTER_LINEAR,
+                  dst=out.reshape(self.num_frames * 84, 84))
+        return out
+
+
 class ProcessFrame84(gym.Wrapper):
     def __init__(self, env=None):
         super(ProcessFrame84, self).__init__(env)
         self.observation_space = spaces.Box(low=0, high=255, shape=(84, 84, 1))
+        self._process_frame = FrameProcessor84()
 
     def step(self, action):
         obs, reward, done, info = self.env.step(action)
-        return _process_frame84(obs), reward, done, info
+        return self._process_frame(obs)[0], reward, done, info
 
     def reset(self):
-        return _process_frame84(self.env.reset())
+        return self._process_frame(self.env.reset())[0]
 
 
 class ClipRewardEnv(gym.RewardWrapper):
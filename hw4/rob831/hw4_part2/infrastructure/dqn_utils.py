@@ -14,6 +14,8 @@ from gym.envs.registration import register
 
 import torch
 
+from rob831.hw4_part2.infrastructure import pytorch_util as ptu
+
 
 class Flatten(torch.nn.Module):
     def forward(self, x):
@@ -61,6 +63,18 @@ def register_custom_envs():
         )
 
 
+def get_env_make_kwargs(env_name, render=False):
+    """
+        Keyword arguments for gym.make(env_name): the custom LunarLander and
+        the Pointmass envs are made headless, which skips their rendering-only
+        work (for Pointmass, plotting the last trajectory on every reset),
+        unless they will be rendered
+    """
+    if (env_name == 'LunarLander-v3' or env_name.startswith('Pointmass')) and not render:
+        return {'headless': True}
+    return {}
+
+
 def get_env_kwargs(env_name):
     if env_name in ['MsPacman-v0', 'PongNoFrameskip-v4']:
         kwargs = {
@@ -85,6 +99,7 @@ def get_env_kwargs(env_name):
         kwargs = {
             'optimizer_spec': lander_optimizer(),
             'q_func': create_lander_q_network,
+            'ensemble_q_func': create_lander_ensemble_q_network,
             'replay_buffer_size': 50000,
             'batch_size': 32,
             'gamma': 1.00,
@@ -106,6 +121,7 @@ def get_env_kwargs(env_name):
         kwargs = {
             'optimizer_spec': pointmass_optimizer(),
             'q_func': create_lander_q_network,
+            'ensemble_q_func': create_lander_ensemble_q_network,
             'replay_buffer_size': int(1e5),
             'gamma': 0.95,
             'learning_freq': 1,
@@ -132,6 +148,17 @@ def create_lander_q_network(ob_dim, num_actions):
         nn.Linear(64, num_actions),
     )
 
+def create_lander_ensemble_q_network(ob_dim, num_actions, ensemble_size):
+    # `ensemble_size` copies of the lander network, evaluated in one batched pass
+    return ptu.build_ensemble_mlp(
+        ensemble_size=ensemble_size,
+        input_size=ob_dim,
+        output_size=num_actions,
+        n_layers=2,
+        size=64,
+        activation='relu',
+    )
+
 class Ipdb(nn.Module):
     def __init__(self):
         super().__init__()
@@ -391,7 +418,7 @@ def get_wrapper_by_name(env, classname):
             raise ValueError("Couldn't find wrapper named %s"%classname)
 
 class MemoryOptimizedReplayBuffer(object):
-    def __init__(self, size, frame_history_len, lander=False, float_obs=False):
+    def __init__(self, size, frame_history_len, lander=False, float_obs=False, num_envs=1):
         """This is a memory efficient implementation of the replay buffer.
 
         The sepecific memory optimizations use here are:
@@ -416,10 +443,16 @@ class MemoryOptimizedReplayBuffer(object):
             overflows the old memories are dropped.
         frame_history_len: int
             Number of memories to be retried for each observation.
+        num_envs: int
+            Number of envs stepped together (see `store_batch`). The frames
+            of the envs are interleaved, so the frame history of an env is
+            made of every `num_envs`-th slot, and `size` is rounded down to a
+            multiple of `num_envs`.
         """
         self.float_obs = lander or float_obs
 
-        self.size = size
+        self.num_envs = num_envs
+        self.size = size - size % num_envs
         self.frame_history_len = frame_history_len
 
         self.next_idx      = 0
@@ -432,13 +465,13 @@ class MemoryOptimizedReplayBuffer(object):
 
     def can_sample(self, batch_size):
         """Returns true if `batch_size` different transitions can be sampled from the buffer."""
-        return batch_size + 1 <= self.num_in_buffer
+        return batch_size + self.num_envs <= self.num_in_buffer
 
     def _encode_sample(self, idxes):
         obs_batch      = np.concatenate([self._encode_observation(idx)[None] for idx in idxes], 0)
         act_batch      = self.action[idxes]
         rew_batch      = self.reward[idxes]
-        next_obs_batch = np.concatenate([self._encode_observation(idx + 1)[None] for idx in idxes], 0)
+        next_obs_batch = np.concatenate([self._encode_observation(idx + self.num_envs)[None] for idx in idxes], 0)
         done_mask      = np.array([1.0 if self.done[idx] else 0.0 for idx in idxes], dtype=np.float32)
 
         return obs_batch, act_batch, rew_batch, next_obs_batch, done_mask
@@ -478,7 +511,7 @@ class MemoryOptimizedReplayBuffer(object):
             Array of shape (batch_size,) and dtype np.float32
         """
         assert self.can_sample(batch_size)
-        idxes = sample_n_unique(lambda: random.randint(0, self.num_in_buffer - 2), batch_size)
+        idxes = sample_n_unique(lambda: random.randint(0, self.num_in_buffer - 1 - self.num_envs), batch_size)
         return self._encode_sample(idxes)
 
     def encode_recent_observation(self):
@@ -494,31 +527,60 @@ class MemoryOptimizedReplayBuffer(object):
         assert self.num_in_buffer > 0
         return self._encode_observation((self.next_idx - 1) % self.size)
 
+    def encode_recent_observations(self, env_ids=None):
+        """Return the most recent `frame_history_len` frames of every env, i.e.
+        `encode_recent_observation` for each env, after their latest frames
+        were stored with `store_batch`.
+
+        Parameters
+        ----------
+        env_ids: np.array or None
+            Envs to encode the observations of (default: all of them).
+
+        Returns
+        -------
+        observations: np.array
+            Array of shape (len(env_ids), img_h, img_w, img_c * frame_history_len)
+        """
+        assert self.num_in_buffer > 0
+        if env_ids is None:
+            env_ids = range(self.num_envs)
+        start = (self.next_idx - self.num_envs) % self.size
+        return np.stack([self._encode_observation(start + i) for i in env_ids])
+
     def _encode_observation(self, idx):
-        end_idx   = idx + 1 # make noninclusive
-        start_idx = end_idx - self.frame_history_len
+        # the previous frames of an env are `num_envs` slots apart
+        stride    = self.num_envs
+        end_idx   = idx + stride # make noninclusive
+        start_idx = end_idx - self.frame_history_len * stride
         # this checks if we are using low-dimensional observations, such as RAM
         # state, in which case we just directly return the latest RAM.
         if len(self.obs.shape) == 2:
-            return self.obs[end_idx-1]
+            return self.obs[idx]
         # if there weren't enough frames ever in the buffer for context
         if start_idx < 0 and self.num_in_buffer != self.size:
-            start_idx = 0
-        for idx in range(start_idx, end_idx - 1):
+            start_idx = idx % stride
+        for idx in range(start_idx, end_idx - stride, stride):
             if self.done[idx % self.size]:
-                start_idx = idx + 1
-        missing_context = self.frame_history_len - (end_idx - start_idx)
+                start_idx = idx + stride
+        missing_context = self.frame_history_len - (end_idx - start_idx) // stride
         # if zero padding is needed for missing context
         # or we are on the boundry of the buffer
         if start_idx < 0 or missing_context > 0:
             frames = [np.zeros_like(self.obs[0]) for _ in range(missing_context)]
-            for idx in range(start_idx, end_idx):
+            for idx in range(start_idx, end_idx, stride):
                 frames.append(self.obs[idx % self.size])
             return np.concatenate(frames, 2)
         else:
             # this optimization has potential to saves about 30% compute time \o/
             img_h, img_w = self.obs.shape[1], self.obs.shape[2]
-            return self.obs[start_idx:end_idx].transpose(1, 2, 0, 3).reshape(img_h, img_w, -1)
+            return self.obs[start_idx:end_idx:stride].transpose(1, 2, 0, 3).reshape(img_h, img_w, -1)
+
+    def _allocate(self, frame_shape):
+        self.obs      = np.empty([self.size] + list(frame_shape), dtype=np.float32 if self.float_obs else np.uint8)
+        self.action   = np.empty([self.size],                     dtype=np.int32)
+        self.reward   = np.empty([self.size],                     dtype=np.float32)
+        self.done     = np.empty([self.size],                     dtype=np.bool_)
 
     def store_frame(self, frame):
         """Store a single frame in the buffer at the next available index, overwriting
@@ -536,10 +598,7 @@ class MemoryOptimizedReplayBuffer(object):
             Index at which the frame is stored. To be used for `store_effect` later.
         """
         if self.obs is None:
-            self.obs      = np.empty([self.size] + list(frame.shape), dtype=np.float32 if self.float_obs else np.uint8)
-            self.action   = np.empty([self.size],                     dtype=np.int32)
-            self.reward   = np.empty([self.size],                     dtype=np.float32)
-            self.done     = np.empty([self.size],                     dtype=np.bool_)
+            self._allocate(frame.shape)
         self.obs[self.next_idx] = frame
 
         ret = self.next_idx
@@ -556,8 +615,9 @@ class MemoryOptimizedReplayBuffer(object):
 
         Paramters
         ---------
-        idx: int
-            Index in buffer of recently observed frame (returned by `store_frame`).
+        idx: int or np.array
+            Index in buffer of recently observed frame (returned by `store_frame`),
+            or indices of several of them (returned by `store_batch`).
         action: int
             Action that was performed upon observing this frame.
         reward: float
@@ -568,3 +628,57 @@ class MemoryOptimizedReplayBuffer(object):
         self.action[idx] = action
         self.reward[idx] = reward
         self.done[idx]   = done
+
+    def store_batch(self, frames, actions=None, rewards=None, dones=None):
+        """Store a sequence of consecutive transitions at once. Equivalent to
+        calling `store_frame` and `store_effect` on each transition in turn,
+        but each array is written with at most two slice copies (two when
+        the sequence wraps around the end of the buffer).
+
+        The effects can be left out to only store the frames, like
+        `store_frame`, and stored later by passing the returned indices to
+        `store_effect`. This is how the envs stepped together store their
+        latest frames, one per env, before choosing their actions.
+
+        With `num_envs` > 1, the transitions are in storage order: blocks of
+        one transition per env, and `n` must be a multiple of `num_envs`.
+
+        Parameters
+        ----------
+        frames: np.array
+            Array of shape (n, img_h, img_w, img_c), the frames observed
+            one after the other
+        actions: np.array or None
+            Array of shape (n,), the actions performed upon observing them
+        rewards: np.array or None
+            Array of shape (n,), the rewards received
+        dones: np.array or None
+            Array of shape (n,), True where the episode was finished by the action
+
+        Returns
+        -------
+        idxes: np.array
+            Indices at which the transitions are stored.
+        """
+        n = len(frames)
+        assert n % self.num_envs == 0
+        if self.obs is None:
+            self._allocate(frames.shape[1:])
+
+        # only the last `size` transitions would survive the overwriting
+        skip = max(n - self.size, 0)
+        start = (self.next_idx + skip) % self.size
+        num_stored = n - skip
+        num_before_end = min(num_stored, self.size - start)
+        for buffer, values in ((self.obs, frames), (self.action, actions),
+                               (self.reward, rewards), (self.done, dones)):
+            if values is None:
+                continue
+            values = values[skip:]
+            buffer[start:start + num_before_end] = values[:num_before_end]
+            buffer[:num_stored - num_before_end] = values[num_before_end:]
+
+        self.next_idx = (self.next_idx + n) % self.size
+        self.num_in_buffer = min(self.size, self.num_in_buffer + n)
+
+        return (start + np.arange(num_stored)) % self.size
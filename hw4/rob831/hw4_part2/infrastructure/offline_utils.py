@@ -0,0 +1,262 @@
+"""Utilities for training DQN-style critics offline, on a fixed dataset.
+
+An offline dataset is a dictionary of aligned arrays
+
+    'observations', 'actions', 'rewards', 'next_observations', 'terminals'
+
+saved with `save_offline_dataset` as a single `.npz` file, or as a directory of
+`.npz` shards that are concatenated on load. Datasets are trained on from the
+agents' MemoryOptimizedReplayBuffer (see `replay_buffer_from_offline_dataset`).
+"""
+import copy
+import glob
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import gym
+import numpy as np
+import torch
+
+from rob831.hw4_part2.infrastructure import pytorch_util as ptu
+from rob831.hw4_part2.infrastructure import utils
+from rob831.hw4_part2.infrastructure.dqn_utils import (
+        MemoryOptimizedReplayBuffer,
+        get_env_make_kwargs,
+        register_custom_envs,
+)
+from rob831.hw4_part2.policies.argmax_policy import ArgMaxPolicy
+
+OFFLINE_DATASET_KEYS = ('observations', 'actions', 'rewards', 'next_observations', 'terminals')
+
+
+############################################
+############################################
+
+def save_offline_dataset(path, observations, actions, rewards, next_observations, terminals):
+    np.savez(
+        path,
+        observations=observations,
+        actions=actions,
+        rewards=rewards,
+        next_observations=next_observations,
+        terminals=terminals,
+    )
+
+
+def load_offline_dataset(path):
+    """
+        Load an offline dataset from an `.npz` file, or from every `.npz` shard
+        in a directory (in sorted order)
+
+        returns:
+            a dictionary with the arrays in OFFLINE_DATASET_KEYS
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, '*.npz')))
+        if not files:
+            raise ValueError('No .npz shards found in {}'.format(path))
+    else:
+        files = [path]
+    shards = []
+    for f in files:
+        with np.load(f) as shard:
+            shards.append({key: shard[key] for key in OFFLINE_DATASET_KEYS})
+    return {key: np.concatenate([shard[key] for shard in shards]) for key in OFFLINE_DATASET_KEYS}
+
+
+def replay_buffer_from_offline_dataset(dataset):
+    """
+        Store an offline dataset in a MemoryOptimizedReplayBuffer of its own
+        size, with a single `store_batch`
+
+        The buffer stores each observation once, and the next observation of a
+        transition is the one stored after it, so the dataset should list the
+        transitions of each episode one after the other, as written by
+        scripts/generate_pointmass_dataset.py. A non-terminal transition whose
+        next observation is not the observation of the following transition
+        (e.g. where a shard ends mid-episode) is stored as terminal, the way
+        the buffer stores an episode cut by a time limit.
+    """
+    observations = dataset['observations']
+    next_observations = dataset['next_observations']
+    terminals = dataset['terminals'].astype(bool)
+    n = len(observations)
+
+    linked = (next_observations[:-1] == observations[1:]).reshape(n - 1, -1).all(axis=1)
+    cut = np.append(~linked & ~terminals[:-1], False)
+    if cut.any():
+        print('{} of the {} transitions are stored as terminal: their next observation '
+              'is not the one that follows them'.format(cut.sum(), n))
+    # the last next observation is stored as one more frame, whose effects are never sampled
+    frames = np.concatenate([observations, next_observations[-1:]])
+    replay_buffer = MemoryOptimizedReplayBuffer(n + 1, 1, float_obs=True)
+    replay_buffer.store_batch(
+        frames,
+        np.append(dataset['actions'], 0),
+        np.append(dataset['rewards'], 0),
+        np.append(terminals | cut, True),
+    )
+    return replay_buffer
+
+
+def dataset_from_replay_buffer(replay_buffer):
+    """Every transition that can be sampled from a MemoryOptimizedReplayBuffer"""
+    idxes = np.arange(replay_buffer.num_in_buffer - replay_buffer.num_envs)
+    obs, acs, rews, next_obs, terminals = replay_buffer._encode_sample(idxes)
+    return {
+        'observations': obs,
+        'actions': acs,
+        'rewards': rews,
+        'next_observations': next_obs,
+        'terminals': terminals,
+    }
+
+
+############################################
+############################################
+
+class PrefetchingBatchLoader(object):
+    """
+        Iterate over a fixed dataset in shuffled minibatches, one epoch at a
+        time. The batches are gathered by a background thread and queued up to
+        `prefetch` batches ahead, so indexing the dataset overlaps with the
+        updates that consume the batches.
+
+        Each batch is the tuple
+            (ob_batch, ac_batch, re_batch, next_ob_batch, terminal_batch)
+        accepted by agent.train.
+    """
+    def __init__(self, dataset, batch_size, prefetch=4):
+        self.arrays = [dataset[key] for key in OFFLINE_DATASET_KEYS]
+        self.size = len(self.arrays[0])
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        if self.size < batch_size:
+            raise ValueError('The dataset has fewer transitions ({}) than a batch ({})'.format(
+                self.size, batch_size))
+
+    def __len__(self):
+        """Number of batches per epoch (the last incomplete batch is dropped)"""
+        return self.size // self.batch_size
+
+    def _fill(self, batches, stop):
+        permutation = np.random.permutation(self.size)
+        for i in range(len(self)):
+            idxes = permutation[i * self.batch_size:(i + 1) * self.batch_size]
+            batch = tuple(array[idxes] for array in self.arrays)
+            while not stop.is_set():
+                try:
+                    batches.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set():
+                return
+
+    def __iter__(self):
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        worker = threading.Thread(target=self._fill, args=(batches, stop), daemon=True)
+        worker.start()
+        try:
+            for _ in range(len(self)):
+                yield batches.get()
+        finally:
+            # also stops the worker if the epoch is abandoned early
+            stop.set()
+            worker.join()
+
+
+############################################
+############################################
+
+def _init_eval_worker():
+    ptu.init_gpu(use_gpu=False)
+
+
+class _CriticSnapshot(object):
+    """Frozen copy of the Q-network of a (multi-head) critic, for evaluation"""
+    def __init__(self, q_net, head):
+        self.q_net = q_net
+        self.head = head
+
+    def qa_values(self, obs):
+        with torch.no_grad():
+            qa_values = self.q_net(ptu.from_numpy(obs))
+        if self.head is not None:
+            qa_values = qa_values[self.head]
+        return ptu.to_numpy(qa_values)
+
+
+def _evaluate_critic_snapshot(eval_args, q_net, head):
+    register_custom_envs()
+    env = gym.make(eval_args['env_name'], **get_env_make_kwargs(eval_args['env_name']))
+    if eval_args['logdir'] is not None:
+        env.set_logdir(eval_args['logdir'])
+    env.seed(eval_args['seed'])
+
+    policy = ArgMaxPolicy(_CriticSnapshot(q_net, head))
+    eval_paths, _ = utils.sample_trajectories(
+        env, policy, eval_args['eval_batch_size'], eval_args['ep_len'])
+
+    eval_returns = [eval_path["reward"].sum() for eval_path in eval_paths]
+    eval_ep_lens = [len(eval_path["reward"]) for eval_path in eval_paths]
+    return {
+        "Eval_AverageReturn": np.mean(eval_returns),
+        "Eval_StdReturn": np.std(eval_returns),
+        "Eval_MaxReturn": np.max(eval_returns),
+        "Eval_MinReturn": np.min(eval_returns),
+        "Eval_AverageEpLen": np.mean(eval_ep_lens),
+    }
+
+
+class PolicyEvaluator(object):
+    """
+        Evaluate the ArgMaxPolicy of a critic in a separate worker process,
+        so training does not stop while the eval rollouts run.
+
+        `submit` sends a CPU copy of the critic's Q-network to the worker and
+        returns immediately; `collect` returns the results of the evaluations
+        that have finished, as (step, logs) pairs in submission order.
+
+        arguments:
+            env_name, seed, ep_len, eval_batch_size: as in the trainer params
+            logdir: prefix passed to env.set_logdir in the worker, or None
+    """
+    def __init__(self, env_name, seed, ep_len, eval_batch_size, logdir=None):
+        self.eval_args = {
+            'env_name': env_name,
+            'seed': seed,
+            'ep_len': ep_len,
+            'eval_batch_size': eval_batch_size,
+            'logdir': logdir,
+        }
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_eval_worker,
+        )
+        self.pending = []
+
+    def submit(self, step, q_net, head=None):
+        """
+            arguments:
+                q_net: the network whose greedy policy is evaluated
+                head: for a multi-head critic, the head to act with
+        """
+        q_net = copy.deepcopy(q_net).cpu()
+        future = self.executor.submit(_evaluate_critic_snapshot, self.eval_args, q_net, head)
+        self.pending.append((step, future))
+
+    def collect(self, wait=False):
+        finished = []
+        while self.pending and (wait or self.pending[0][1].done()):
+            step, future = self.pending.pop(0)
+            finished.append((step, future.result()))
+        return finished
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -1,3 +1,4 @@
+import math
 from typing import Union
 
 import torch
@@ -64,6 +65,69 @@ def build_mlp(
     return nn.Sequential(*layers)
 
 
+class EnsembleLinear(nn.Module):
+    """
+        `ensemble_size` independent linear layers stored as stacked weights,
+        evaluated with a single batched matmul.
+
+        Input is (ensemble_size, batch_size, in_features), or
+        (batch_size, in_features) to feed the same batch to every member.
+        Output is (ensemble_size, batch_size, out_features).
+    """
+    def __init__(self, ensemble_size: int, in_features: int, out_features: int):
+        super().__init__()
+        self.ensemble_size = ensemble_size
+        self.in_features = in_features
+        self.out_features = out_features
+        self.weight = nn.Parameter(torch.empty(ensemble_size, in_features, out_features))
+        self.bias = nn.Parameter(torch.empty(ensemble_size, 1, out_features))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        # same distribution as the default nn.Linear initialization
+        bound = 1. / math.sqrt(self.in_features)
+        nn.init.uniform_(self.weight, -bound, bound)
+        nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, x):
+        if x.dim() == 2:
+            x = x.expand(self.ensemble_size, -1, -1)
+        return torch.baddbmm(self.bias, x, self.weight)
+
+
+def build_ensemble_mlp(
+        ensemble_size: int,
+        input_size: int,
+        output_size: int,
+        n_layers: int,
+        size: int,
+        activation: Activation = 'tanh',
+        output_activation: Activation = 'identity',
+):
+    """
+        Builds `ensemble_size` feedforward networks with the same architecture
+        as `build_mlp`, whose weights are stacked so that every member is
+        evaluated in one batched forward pass
+
+        returns:
+            an nn.Sequential mapping (ensemble_size, batch_size, input_size)
+            or (batch_size, input_size) to (ensemble_size, batch_size, output_size)
+    """
+    if isinstance(activation, str):
+        activation = _str_to_activation[activation]
+    if isinstance(output_activation, str):
+        output_activation = _str_to_activation[output_activation]
+    layers = []
+    in_size = input_size
+    for _ in range(n_layers):
+        layers.append(EnsembleLinear(ensemble_size, in_size, size))
+        layers.append(activation)
+        in_size = size
+    layers.append(EnsembleLinear(ensemble_size, in_size, output_size))
+    layers.append(output_activation)
+    return nn.Sequential(*layers)
+
+
 device = None
 
 
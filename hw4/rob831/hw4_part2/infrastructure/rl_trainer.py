@@ -7,16 +7,19 @@ import pdb
 
 import gym
 from gym import wrappers
+import math
 import numpy as np
 import torch
 from rob831.hw4_part2.infrastructure import pytorch_util as ptu
 from rob831.hw4_part2.infrastructure.atari_wrappers import ReturnWrapper
 
 from rob831.hw4_part2.infrastructure import utils
+from rob831.hw4_part2.infrastructure import offline_utils
 from rob831.hw4_part2.infrastructure.logger import Logger
 
 from rob831.hw4_part2.agents.explore_or_exploit_agent import ExplorationOrExploitationAgent
 from rob831.hw4_part2.infrastructure.dqn_utils import (
+        get_env_make_kwargs,
         get_wrapper_by_name,
         register_custom_envs,
 )
@@ -56,8 +59,9 @@ class RL_Trainer(object):
 
         # Make the gym environment
         register_custom_envs()
-        self.env = gym.make(self.params['env_name'])
-        self.eval_env = gym.make(self.params['env_name'])
+        env_kwargs = get_env_make_kwargs(self.params['env_name'], render=self.params['video_log_freq'] > 0)
+        self.env = gym.make(self.params['env_name'], **env_kwargs)
+        self.eval_env = gym.make(self.params['env_name'], **env_kwargs)
         if not ('pointmass' in self.params['env_name']):
             import matplotlib
             matplotlib.use('Agg')
@@ -92,6 +96,13 @@ class RL_Trainer(object):
         self.env.seed(seed)
         self.eval_env.seed(seed)
 
+        # extra copies of the env, for agents that step several envs at once;
+        # only self.env logs its episodes
+        self.params['agent_params']['extra_envs'] = [
+            self.make_extra_env(seed + i)
+            for i in range(1, self.params['agent_params'].get('num_envs', 1))
+        ]
+
         # Maximum length for episodes
         self.params['ep_len'] = self.params['ep_len'] or self.env.spec.max_episode_steps
         global MAX_VIDEO_LEN
@@ -129,6 +140,13 @@ class RL_Trainer(object):
         agent_class = self.params['agent_class']
         self.agent = agent_class(self.env, self.params['agent_params'])
 
+    def make_extra_env(self, seed):
+        env = gym.make(self.params['env_name'], **get_env_make_kwargs(self.params['env_name']))
+        if 'env_wrappers' in self.params:
+            env = self.params['env_wrappers'](env)
+        env.seed(seed)
+        return env
+
     def run_training_loop(self, n_iter, collect_policy, eval_policy,
                           buffer_name=None,
                           initial_expertdata=None, relabel_with_expert=False,
@@ -150,6 +168,11 @@ class RL_Trainer(object):
         print_period = 1000 if isinstance(self.agent, ExplorationOrExploitationAgent) else 1
 
         for itr in range(n_iter):
+            if self.use_offline_training():
+                # the remaining iterations are offline updates, which don't need the env
+                self.run_offline_training_loop(n_iter - itr)
+                break
+
             if itr % print_period == 0:
                 print("\n\n********** Iteration %i ************"%itr)
 
@@ -170,7 +193,7 @@ class RL_Trainer(object):
             # collect trajectories, to be used for training
             if isinstance(self.agent, ExplorationOrExploitationAgent):
                 self.agent.step_env()
-                envsteps_this_batch = 1
+                envsteps_this_batch = self.agent.num_envs
                 train_video_paths = None
                 paths = None
             else:
@@ -219,6 +242,94 @@ class RL_Trainer(object):
     ####################################
     ####################################
 
+    def use_offline_training(self):
+        """Whether the agent is only trained on a fixed dataset from now on"""
+        if not (isinstance(self.agent, ExplorationOrExploitationAgent) and self.params.get('offline_training')):
+            return False
+        return self.params.get('offline_dataset') is not None or (
+            self.agent.offline_exploitation and self.agent.t > self.agent.num_exploration_steps)
+
+    def run_offline_training_loop(self, num_updates):
+        """
+        Train the agent on a fixed dataset, without stepping the env: either
+        the dataset in params['offline_dataset'], which replaces the agent's
+        replay buffer, or the replay buffer as it was at the end of
+        exploration. The dataset is loaded once, and iterated over in
+        shuffled epochs of prefetched batches.
+
+        The eval policy is evaluated every params['offline_eval_freq'] updates
+        by a separate worker process, while training continues.
+
+        :param num_updates: number of updates, used when params['offline_num_epochs'] is not set
+        """
+        if self.params.get('offline_dataset') is not None:
+            print('\nLoading offline dataset from {}...'.format(self.params['offline_dataset']))
+            self.agent.replay_buffer = offline_utils.replay_buffer_from_offline_dataset(
+                offline_utils.load_offline_dataset(self.params['offline_dataset']))
+        dataset = offline_utils.dataset_from_replay_buffer(self.agent.replay_buffer)
+        loader = offline_utils.PrefetchingBatchLoader(dataset, self.params['train_batch_size'])
+
+        num_epochs = self.params.get('offline_num_epochs')
+        if num_epochs is None:
+            num_epochs = math.ceil(num_updates / len(loader))
+        else:
+            num_updates = num_epochs * len(loader)
+        eval_freq = self.params.get('offline_eval_freq') or self.params['scalar_log_freq']
+        print('\nOffline training on {} transitions: {} epochs of {} batches'.format(
+            loader.size, num_epochs, len(loader)))
+
+        critic = self.agent.exploitation_critic
+        evaluator = offline_utils.PolicyEvaluator(
+            self.params['env_name'],
+            self.params['seed'],
+            self.params['ep_len'],
+            self.params['eval_batch_size'],
+            logdir=self.params['logdir'] + '/eval_',
+        )
+        train_logs = {}
+        num_updates_done = 0
+        updates_start_time = time.time()
+        for epoch in range(num_epochs):
+            for batch in loader:
+                train_log = self.agent.train(*batch, offline=True)
+                num_updates_done += 1
+
+                if num_updates_done % eval_freq == 0 or num_updates_done == num_updates:
+                    train_log = OrderedDict(train_log)
+                    train_log['Offline_Epoch'] = epoch
+                    train_log['Offline_UpdatesPerSecond'] = num_updates_done / (time.time() - updates_start_time)
+                    train_logs[self.agent.t] = train_log
+                    evaluator.submit(self.agent.t, critic.critic.q_net, head=critic.head)
+                    self.perform_offline_logging(evaluator.collect(), train_logs)
+                    if self.params['save_params']:
+                        self.agent.save('{}/agent_itr_{}.pt'.format(self.params['logdir'], self.agent.t))
+                if num_updates_done == num_updates:
+                    break
+            if num_updates_done == num_updates:
+                break
+
+        self.perform_offline_logging(evaluator.collect(wait=True), train_logs)
+        evaluator.close()
+
+    def perform_offline_logging(self, eval_results, train_logs):
+        for step, eval_log in eval_results:
+            logs = OrderedDict()
+            logs["Train_EnvstepsSoFar"] = self.total_envsteps
+            logs["TimeSinceStart"] = time.time() - self.start_time
+            logs.update(train_logs.pop(step))
+            logs.update(eval_log)
+            logs['Buffer size'] = self.agent.replay_buffer.num_in_buffer
+
+            print("Timestep %d" % (step,))
+            for key, value in logs.items():
+                print('{} : {}'.format(key, value))
+                self.logger.log_scalar(value, key, step)
+            print('Done logging...\n\n')
+        self.logger.flush()
+
+    ####################################
+    ####################################
+
     def collect_training_trajectories(self, itr, initial_expertdata, collect_policy, num_transitions_to_sample, save_expert_data_to_disk=False):
         """
         :param itr:
@@ -255,7 +366,11 @@ class RL_Trainer(object):
 
     def train_agent(self):
         all_logs = []
-        for train_step in range(self.params['num_agent_train_steps_per_iter']):
+        num_train_steps = self.params['num_agent_train_steps_per_iter']
+        if isinstance(self.agent, ExplorationOrExploitationAgent) and self.agent.num_envs > 1:
+            # as many updates as the env steps of this iteration call for
+            num_train_steps = max(self.agent.num_updates_due(), 1)
+        for train_step in range(num_train_steps):
             ob_batch, ac_batch, re_batch, next_ob_batch, terminal_batch = self.agent.sample(self.params['train_batch_size'])
             train_log = self.agent.train(ob_batch, ac_batch, re_batch, next_ob_batch, terminal_batch)
             all_logs.append(train_log)
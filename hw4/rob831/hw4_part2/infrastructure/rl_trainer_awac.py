@@ -18,6 +18,7 @@ from rob831.hw4_part2.infrastructure.logger import Logger
 from rob831.hw4_part2.agents.awac_agent import AWACAgent
 from rob831.hw4_part2.agents.iql_agent import IQLAgent
 from rob831.hw4_part2.infrastructure.dqn_utils import (
+        get_env_make_kwargs,
         get_wrapper_by_name,
         register_custom_envs,
 )
@@ -57,8 +58,9 @@ class RL_Trainer(object):
 
         # Make the gym environment
         register_custom_envs()
-        self.env = gym.make(self.params['env_name'])
-        self.eval_env = gym.make(self.params['env_name'])
+        env_kwargs = get_env_make_kwargs(self.params['env_name'], render=self.params['video_log_freq'] > 0)
+        self.env = gym.make(self.params['env_name'], **env_kwargs)
+        self.eval_env = gym.make(self.params['env_name'], **env_kwargs)
         if not ('pointmass' in self.params['env_name']):
             import matplotlib
             matplotlib.use('Agg')
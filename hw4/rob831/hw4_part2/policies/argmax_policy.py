@@ -30,6 +30,16 @@ class ArgMaxPolicy(object):
 
         return action[0]
 
+    def get_actions(self, obs):
+        """Batched version of `get_action`: one action for each observation in
+        `obs`, from a single call to the critic"""
+        q_values = self.critic.qa_values(obs)
+
+        if self.use_boltzmann:
+            distribution = np.exp(q_values) / np.sum(np.exp(q_values), axis=1, keepdims=True)
+            return self.sample_discrete(distribution)
+        return q_values.argmax(-1)
+
     def sample_discrete(self, p):
         # https://stackoverflow.com/questions/40474436/how-to-apply-numpy-random-choice-to-a-matrix-of-probability-values-vectorized-s
         c = p.cumsum(axis=1)
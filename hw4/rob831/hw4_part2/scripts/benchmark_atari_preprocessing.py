@@ -0,0 +1,71 @@
+"""
+Measure the throughput, in frames/sec, of the Atari frame preprocessing of
+wrap_deepmind: the per-frame float32 reference `_process_frame84`, and
+`FrameProcessor84` on single frames and on the frames of --num_envs envs at
+once.
+
+The frames are synthetic (blocks of flat color, like Atari screens), so the
+benchmark does not need the Atari ROMs.
+
+Example:
+    python rob831/hw4_part2/scripts/benchmark_atari_preprocessing.py --num_envs 8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rob831.hw4_part2.infrastructure.atari_wrappers import _process_frame84, FrameProcessor84
+
+
+def synthetic_frames(num_frames, seed=0):
+    rng = np.random.RandomState(seed)
+    blocks = rng.randint(0, 256, size=(num_frames, 21, 16, 3)).astype(np.uint8)
+    return blocks.repeat(10, axis=1).repeat(10, axis=2)
+
+
+def frames_per_sec(process, frames, batch_size, min_time):
+    num_frames = 0
+    start = time.time()
+    while time.time() - start < min_time:
+        for i in range(0, len(frames), batch_size):
+            process(frames[i:i + batch_size])
+        num_frames += len(frames)
+    return num_frames / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_envs', type=int, default=8)
+    parser.add_argument('--num_frames', type=int, default=512)
+    parser.add_argument('--min_time', type=float, default=2.0,
+                        help='seconds to run each variant for')
+    args = parser.parse_args()
+
+    num_frames = args.num_frames - args.num_frames % args.num_envs
+    frames = synthetic_frames(num_frames)
+
+    single = FrameProcessor84()
+    batched = FrameProcessor84(args.num_envs)
+    out = np.empty((args.num_envs, 84, 84, 1), dtype=np.uint8)
+
+    reference = np.stack([_process_frame84(frame) for frame in frames])
+    processed = np.concatenate([batched(frames[i:i + args.num_envs])
+                                for i in range(0, num_frames, args.num_envs)])
+    max_diff = np.abs(processed.astype(np.int32) - reference).max()
+    print('Max difference from _process_frame84: {} gray levels'.format(max_diff))
+
+    variants = [
+        ('_process_frame84', lambda f: _process_frame84(f[0]), 1),
+        ('FrameProcessor84', single, 1),
+        ('FrameProcessor84 x{}'.format(args.num_envs), batched, args.num_envs),
+        ('FrameProcessor84 x{}, preallocated'.format(args.num_envs),
+         lambda f: batched(f, out), args.num_envs),
+    ]
+    for name, process, batch_size in variants:
+        fps = frames_per_sec(process, frames, batch_size, args.min_time)
+        print('{:<40s} {:>10.0f} frames/sec'.format(name, fps))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Generate an offline dataset of Pointmass transitions from a noisy expert.
+
+Each episode starts from a random empty state and follows the shortest-path
+action towards either the env's goal or a random empty state, with a random
+action taken with probability --random_action_prob. Rewards and terminals are
+always those of the env's own goal.
+
+The work is split into shards, generated in parallel by a process pool. Each
+worker runs --num_envs episodes at once, choosing the actions of all of them
+with a single batched shortest-path lookup, and writes its shard as a
+columnar .npz file (see infrastructure/offline_utils.py), so the output
+directory can be passed as-is to `run_hw4_expl.py --offline_dataset`.
+
+The transitions of each of the --num_envs episode streams are written one
+after the other, so that they load into the agents' replay buffer, which
+stores each observation once, with a single cut per stream (see
+offline_utils.replay_buffer_from_offline_dataset).
+
+Example:
+    python rob831/hw4_part2/scripts/generate_pointmass_dataset.py --env_name PointmassEasy-v0 \
+        --num_samples 50000 --num_workers 4 --output_dir data/pointmass_easy_expert
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rob831.hw4_part2.envs.pointmass.pointmass import Pointmass
+from rob831.hw4_part2.infrastructure import offline_utils
+
+DIFFICULTIES = {
+    'PointmassEasy-v0': 0,
+    'PointmassMedium-v0': 1,
+    'PointmassHard-v0': 2,
+    'PointmassVeryHard-v0': 3,
+}
+
+
+def generate_shard(shard_args):
+    """
+        Generate `num_transitions` transitions with `num_envs` episodes running
+        at once, and save them to `path`
+    """
+    np.random.seed(shard_args['seed'])
+    env = Pointmass(shard_args['difficulty'], dense_reward=shard_args['dense_reward'], headless=True)
+    num_transitions = shard_args['num_transitions']
+    num_envs = min(shard_args['num_envs'], num_transitions)
+    scale = np.array([float(env._height), float(env._width)])
+
+    observations = np.empty((num_transitions, 2), dtype=np.float32)
+    actions = np.empty(num_transitions, dtype=np.int32)
+    rewards = np.empty(num_transitions, dtype=np.float32)
+    next_observations = np.empty((num_transitions, 2), dtype=np.float32)
+    terminals = np.empty(num_transitions, dtype=np.float32)
+    streams = np.empty(num_transitions, dtype=np.int64)
+
+    def sample_goals(n):
+        goals = np.tile(env.fixed_goal, (n, 1))
+        random_goal = np.random.rand(n) < shard_args['random_goal_prob']
+        goals[random_goal] = env._sample_empty_states(random_goal.sum())
+        return goals
+
+    states = env._sample_empty_states(num_envs)
+    goals = sample_goals(num_envs)
+    timesteps_left = np.full(num_envs, env.max_episode_steps)
+    num_episodes = 0
+
+    n = 0
+    while n < num_transitions:
+        obs = states / scale
+        acs = env.get_optimal_actions(obs, goals)
+        random_action = np.random.rand(num_envs) < shard_args['random_action_prob']
+        acs[random_action] = np.random.randint(env.num_actions, size=random_action.sum())
+
+        next_states, rews, reached = env.step_batch(states, acs)
+        timesteps_left -= 1
+        dones = reached | (timesteps_left == 0)
+
+        k = min(num_envs, num_transitions - n)
+        observations[n:n + k] = obs[:k]
+        actions[n:n + k] = acs[:k]
+        rewards[n:n + k] = rews[:k]
+        next_observations[n:n + k] = next_states[:k] / scale
+        terminals[n:n + k] = dones[:k]
+        streams[n:n + k] = np.arange(k)
+        n += k
+
+        # start new episodes in place of the finished ones
+        num_done = dones.sum()
+        states = next_states
+        states[dones] = env._sample_empty_states(num_done)
+        goals[dones] = sample_goals(num_done)
+        timesteps_left[dones] = env.max_episode_steps
+        num_episodes += int(num_done)
+
+    # the transitions were generated one step of every stream at a time
+    order = np.argsort(streams, kind='stable')
+    offline_utils.save_offline_dataset(
+        shard_args['path'],
+        observations=observations[order],
+        actions=actions[order],
+        rewards=rewards[order],
+        next_observations=next_observations[order],
+        terminals=terminals[order],
+    )
+    return {
+        'path': shard_args['path'],
+        'num_transitions': num_transitions,
+        'num_episodes': num_episodes,
+        'num_positive_rewards': int((rewards >= 0).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_name', default='PointmassEasy-v0', choices=tuple(DIFFICULTIES))
+    parser.add_argument('--output_dir', type=str, required=True)
+    parser.add_argument('--num_samples', type=int, default=50000)
+    parser.add_argument('--num_shards', type=int, default=None,
+                        help='defaults to --num_workers')
+    parser.add_argument('--num_workers', type=int, default=os.cpu_count())
+    parser.add_argument('--num_envs', type=int, default=64,
+                        help='number of episodes each worker runs at once')
+    parser.add_argument('--random_action_prob', type=float, default=0.2)
+    parser.add_argument('--random_goal_prob', type=float, default=0.5)
+    parser.add_argument('--dense_reward', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    num_shards = args.num_shards or args.num_workers
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # split the samples as evenly as possible between the shards
+    shard_sizes = np.full(num_shards, args.num_samples // num_shards)
+    shard_sizes[:args.num_samples % num_shards] += 1
+    shards = [{
+        'difficulty': DIFFICULTIES[args.env_name],
+        'dense_reward': args.dense_reward,
+        'num_transitions': int(shard_size),
+        'num_envs': args.num_envs,
+        'random_action_prob': args.random_action_prob,
+        'random_goal_prob': args.random_goal_prob,
+        'seed': args.seed * num_shards + i,
+        'path': os.path.join(args.output_dir, 'shard_{:04d}.npz'.format(i)),
+    } for i, shard_size in enumerate(shard_sizes)]
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+        results = list(executor.map(generate_shard, shards))
+    elapsed = time.time() - start
+
+    for result in results:
+        print('{path}: {num_transitions} transitions, {num_episodes} episodes, '
+              '{num_positive_rewards} positive rewards'.format(**result))
+    print('Generated {} transitions in {:.2f}s ({:.0f} transitions/s)'.format(
+        args.num_samples, elapsed, args.num_samples / elapsed))
+
+
+if __name__ == '__main__':
+    main()
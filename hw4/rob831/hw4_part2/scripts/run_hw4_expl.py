@@ -31,8 +31,9 @@ class Q_Trainer(object):
         self.rl_trainer = RL_Trainer(self.params)
 
     def run_training_loop(self):
+        # each iteration steps every env once
         self.rl_trainer.run_training_loop(
-            self.agent_params['num_timesteps'],
+            self.agent_params['num_timesteps'] // self.agent_params['num_envs'],
             collect_policy = self.rl_trainer.agent.actor,
             eval_policy = self.rl_trainer.agent.actor,
             )
@@ -58,6 +59,13 @@ def main():
 
     parser.add_argument('--offline_exploitation', action='store_true')
     parser.add_argument('--cql_alpha', type=float, default=0.0)
+    # train offline on a fixed dataset (the buffer at the end of exploration, or --offline_dataset)
+    # without stepping the env, evaluating in a separate worker every --offline_eval_freq updates
+    parser.add_argument('--offline_training', action='store_true')
+    parser.add_argument('--offline_dataset', type=str, default=None,
+                        help='.npz file, or directory of .npz shards, to train on instead of exploring')
+    parser.add_argument('--offline_num_epochs', type=int, default=None)
+    parser.add_argument('--offline_eval_freq', type=int, default=None)
 
     parser.add_argument('--exploit_rew_shift', type=float, default=0.0)
     parser.add_argument('--exploit_rew_scale', type=float, default=1.0)
@@ -73,6 +81,10 @@ def main():
     parser.add_argument('--save_params', action='store_true')
 
     parser.add_argument('--use_boltzmann', action='store_true')
+    parser.add_argument('--num_envs', type=int, default=1,
+                        help='number of envs stepped together, with one batched action selection')
+    parser.add_argument('--update_to_data_ratio', type=float, default=None,
+                        help='updates per env step with several envs (default: 1 / learning_freq)')
 
     args = parser.parse_args()
 
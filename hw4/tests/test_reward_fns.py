@@ -0,0 +1,95 @@
+import gym
+import numpy as np
+import pytest
+import torch
+
+from rob831.hw4_part1.envs import register_envs
+from rob831.hw4_part1.envs import reward_fns as reward_fns_part1
+from rob831.hw4_part2.envs import reward_fns as reward_fns_part2
+
+
+register_envs()
+
+BATCH_SIZE = 64
+
+
+def make_ant():
+    pytest.importorskip('mujoco_py')
+    import rob831.hw4_part2.envs  # noqa: F401, registers the part 2 envs
+    return gym.make('ant-hw4_part2-v0')
+
+
+ENVS = {
+    'cheetah': (lambda: gym.make('cheetah-hw4_part1-v0'), reward_fns_part1),
+    'reacher': (lambda: gym.make('reacher-hw4_part1-v0'), reward_fns_part1),
+    'obstacles': (lambda: gym.make('obstacles-hw4_part1-v0'), reward_fns_part1),
+    'ant': (make_ant, reward_fns_part2),
+}
+
+
+@pytest.fixture(params=sorted(ENVS))
+def env_and_fns(request):
+    make_env, reward_fns = ENVS[request.param]
+    env = make_env()
+    yield env.unwrapped, reward_fns
+    env.close()
+
+
+def random_batch(env, batch_shape):
+    rng = np.random.RandomState(0)
+    ob_dim = env.observation_space.shape[0]
+    ac_dim = env.action_space.shape[0]
+    observations = rng.uniform(-1, 1, batch_shape + (ob_dim,))
+    actions = rng.uniform(-1, 1, batch_shape + (ac_dim,))
+    return observations, actions
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'torch'])
+def test_matches_env_get_reward(env_and_fns, backend):
+    env, reward_fns = env_and_fns
+    observations, actions = random_batch(env, (BATCH_SIZE,))
+    expected_rewards, expected_dones = env.get_reward(observations, actions)
+
+    reward_fn = reward_fns.get_reward_fn(env, backend)
+    if backend == 'torch':
+        rewards, dones = reward_fn(torch.from_numpy(observations), torch.from_numpy(actions))
+        rewards, dones = rewards.numpy(), dones.numpy()
+    else:
+        rewards, dones = reward_fn(observations, actions)
+
+    np.testing.assert_allclose(rewards, np.reshape(expected_rewards, rewards.shape))
+    np.testing.assert_array_equal(dones, np.reshape(expected_dones, dones.shape))
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'torch'])
+def test_leading_batch_dims(env_and_fns, backend):
+    env, reward_fns = env_and_fns
+    observations, actions = random_batch(env, (2, 3, BATCH_SIZE))
+
+    reward_fn = reward_fns.get_reward_fn(env, backend)
+    if backend == 'torch':
+        observations, actions = torch.from_numpy(observations), torch.from_numpy(actions)
+    rewards, dones = reward_fn(observations, actions)
+    flat_rewards, flat_dones = reward_fn(
+        observations.reshape(-1, observations.shape[-1]), actions.reshape(-1, actions.shape[-1]))
+
+    assert tuple(rewards.shape) == (2, 3, BATCH_SIZE)
+    assert tuple(dones.shape) == (2, 3, BATCH_SIZE)
+    np.testing.assert_array_equal(np.asarray(rewards).reshape(-1), np.asarray(flat_rewards))
+    np.testing.assert_array_equal(np.asarray(dones).reshape(-1), np.asarray(flat_dones))
+
+
+def test_leaves_env_reward_dict_alone(env_and_fns):
+    env, reward_fns = env_and_fns
+    observations, actions = random_batch(env, (BATCH_SIZE,))
+    env.get_reward(observations[:1], actions[:1])
+    reward_dict = env.reward_dict
+    saved = {k: np.copy(v) for k, v in reward_dict.items()}
+
+    reward_fns.get_reward_fn(env, 'numpy')(observations, actions)
+    reward_fns.get_reward_fn(env, 'torch')(torch.from_numpy(observations), torch.from_numpy(actions))
+
+    assert env.reward_dict is reward_dict
+    assert reward_dict.keys() == saved.keys()
+    for k, v in saved.items():
+        np.testing.assert_array_equal(reward_dict[k], v)